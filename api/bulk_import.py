@@ -0,0 +1,350 @@
+"""
+Importación masiva de medicamentos programados (NDJSON o CSV)
+
+Pensada para cuidadores y clínicas que dan de alta a muchos pacientes:
+las filas se validan por columnas con numpy, se reservan en el almacén
+local en lotes de una transacción (las que ya existían no se reenvían) y
+las nuevas se programan en Node en grupos concurrentes sobre una sesión
+HTTP con keep-alive; si Node rechaza una fila se deshace su reserva. El progreso y
+los errores por fila se consultan por id de trabajo; el estado se guarda
+en el SQLite del almacén tras cada lote, así que cualquier worker lo sirve.
+"""
+import io
+import os
+import csv
+import json
+import uuid
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from api.medication_store import get_medication_store
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_NODE_CONCURRENCY = int(os.getenv("BULK_NODE_CONCURRENCY", "16"))
+BULK_MAX_JOBS = int(os.getenv("BULK_MAX_JOBS", "100"))
+BULK_MAX_ERRORS = 1000
+
+# Columnas aceptadas (mismos nombres que /api/medication/add)
+FIELDS = ["user_id", "medicamento_id", "nombre", "dosis", "frecuencia", "hora", "fecha_inicio", "fecha_fin"]
+REQUIRED_FIELDS = ["user_id", "nombre", "hora"]
+DEFAULTS = {"dosis": "1 tableta", "frecuencia": "Diario"}
+DEFAULT_DURATION_DAYS = 7
+
+class BulkImportError(ValueError):
+    """Archivo ilegible o fuera de límites (no errores de fila)"""
+
+# ========== LECTURA ==========
+def parse_rows(body: bytes, fmt: str) -> List[Dict[str, str]]:
+    """Decodificar NDJSON (un objeto por línea) o CSV con encabezado"""
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkImportError("El archivo debe estar en UTF-8")
+
+    if fmt == "csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+    elif fmt == "ndjson":
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BulkImportError(f"Línea {line_number}: JSON inválido ({e.msg})")
+            if not isinstance(row, dict):
+                raise BulkImportError(f"Línea {line_number}: se esperaba un objeto")
+            rows.append(row)
+    else:
+        raise BulkImportError(f"Formato no soportado: {fmt}")
+
+    if not rows:
+        raise BulkImportError("El archivo no contiene filas")
+    if len(rows) > BULK_MAX_ROWS:
+        raise BulkImportError(f"Máximo {BULK_MAX_ROWS} filas por importación")
+    return rows
+
+# ========== VALIDACIÓN VECTORIZADA ==========
+def _column(rows: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.array([str(row.get(field) or "").strip() for row in rows], dtype=str)
+
+def _codepoints(column: np.ndarray, width: int) -> np.ndarray:
+    """Matriz (n, width) de códigos Unicode; las cadenas cortas se rellenan con 0"""
+    return column.astype(f"U{width}").view(np.uint32).reshape(len(column), width)
+
+def _digits(codes: np.ndarray) -> np.ndarray:
+    return (codes >= ord("0")) & (codes <= ord("9"))
+
+def _number(codes: np.ndarray) -> np.ndarray:
+    """Valor entero de columnas de dígitos ya validadas"""
+    value = np.zeros(len(codes), dtype=np.int64)
+    for i in range(codes.shape[1]):
+        value = value * 10 + (codes[:, i].astype(np.int64) - ord("0"))
+    return value
+
+def _valid_hours(column: np.ndarray) -> np.ndarray:
+    """'HH:MM' con 00 <= HH <= 23 y 00 <= MM <= 59"""
+    codes = _codepoints(column, 6)
+    shape_ok = (
+        (np.char.str_len(column) == 5)
+        & _digits(codes[:, [0, 1, 3, 4]]).all(axis=1)
+        & (codes[:, 2] == ord(":"))
+    )
+    hours = np.where(shape_ok, _number(codes[:, 0:2]), 99)
+    minutes = np.where(shape_ok, _number(codes[:, 3:5]), 99)
+    return shape_ok & (hours <= 23) & (minutes <= 59)
+
+def _valid_dates(column: np.ndarray) -> np.ndarray:
+    """Prefijo ISO 'AAAA-MM-DD' (admite hora detrás) que exista en el calendario"""
+    codes = _codepoints(column, 10)
+    shape_ok = (
+        _digits(codes[:, [0, 1, 2, 3, 5, 6, 8, 9]]).all(axis=1)
+        & (codes[:, 4] == ord("-"))
+        & (codes[:, 7] == ord("-"))
+    )
+    years = np.where(shape_ok, _number(codes[:, 0:4]), 1970)
+    months = np.where(shape_ok, _number(codes[:, 5:7]), 0)
+    days = np.where(shape_ok, _number(codes[:, 8:10]), 0)
+    month_ok = shape_ok & (months >= 1) & (months <= 12)
+
+    # Días de cada mes (bisiestos incluidos): inicio del mes siguiente - inicio del mes
+    month_start = ((years - 1970) * 12 + np.where(month_ok, months - 1, 0)).astype("datetime64[M]")
+    month_days = ((month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")).astype(np.int64)
+    return month_ok & (days >= 1) & (days <= month_days)
+
+def validate_rows(rows: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Validar todas las filas por columnas
+
+    Returns:
+        (filas válidas como (user_id, payload para Node), errores por fila)
+    """
+    columns = {field: _column(rows, field) for field in FIELDS}
+    n = len(rows)
+    problems: List[List[str]] = [[] for _ in range(n)]
+
+    def flag(mask: np.ndarray, message: str):
+        for i in np.flatnonzero(mask):
+            problems[i].append(message)
+
+    for field in REQUIRED_FIELDS:
+        flag(columns[field] == "", f"{field} es obligatorio")
+
+    present_hours = columns["hora"] != ""
+    flag(present_hours & ~_valid_hours(columns["hora"]), "hora debe tener formato HH:MM")
+
+    for field in ("fecha_inicio", "fecha_fin"):
+        present = columns[field] != ""
+        flag(present & ~_valid_dates(columns[field]), f"{field} debe ser una fecha válida AAAA-MM-DD")
+
+    # fecha_fin >= fecha_inicio (solo donde ambas son válidas)
+    both = (
+        (columns["fecha_inicio"] != "") & (columns["fecha_fin"] != "")
+        & _valid_dates(columns["fecha_inicio"]) & _valid_dates(columns["fecha_fin"])
+    )
+    if both.any():
+        starts = columns["fecha_inicio"][both].astype("U10").astype("datetime64[D]")
+        ends = columns["fecha_fin"][both].astype("U10").astype("datetime64[D]")
+        reversed_mask = np.zeros(n, dtype=bool)
+        reversed_mask[np.flatnonzero(both)[ends < starts]] = True
+        flag(reversed_mask, "fecha_fin es anterior a fecha_inicio")
+
+    # Duplicados (user_id, medicamento_id) dentro del mismo archivo
+    with_id = np.flatnonzero(columns["medicamento_id"] != "")
+    if len(with_id):
+        keys = np.char.add(np.char.add(columns["user_id"][with_id], "\x1f"), columns["medicamento_id"][with_id])
+        _, first = np.unique(keys, return_index=True)
+        duplicated = np.ones(len(with_id), dtype=bool)
+        duplicated[first] = False
+        mask = np.zeros(n, dtype=bool)
+        mask[with_id[duplicated]] = True
+        flag(mask, "medicamento_id repetido para el mismo usuario")
+
+    valid, errors = [], []
+    now = datetime.now()
+    batch_prefix = f"bulk_{uuid.uuid4().hex}"  # único aunque coincidan dos importaciones en el mismo segundo
+    for i in range(n):
+        if problems[i]:
+            errors.append({"row": i + 1, "errors": problems[i]})
+            continue
+        start = columns["fecha_inicio"][i] or now.isoformat()
+        end = columns["fecha_fin"][i] or (now + timedelta(days=DEFAULT_DURATION_DAYS)).isoformat()
+        valid.append((columns["user_id"][i], {
+            "userId": columns["user_id"][i],
+            "medicamentoId": columns["medicamento_id"][i] or f"{batch_prefix}_{i}",
+            "nombre": columns["nombre"][i],
+            "dosis": columns["dosis"][i] or DEFAULTS["dosis"],
+            "frecuencia": columns["frecuencia"][i] or DEFAULTS["frecuencia"],
+            "hora": columns["hora"][i],
+            "fechaInicio": start,
+            "fechaFin": end,
+            "_row": i + 1
+        }))
+    return valid, errors
+
+# ========== TRABAJOS ==========
+class BulkImportJob:
+    """Estado de una importación: contadores y errores por fila"""
+
+    def __init__(self, total: int):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.status = "pending"
+        self.validated = 0
+        self.forwarded = 0
+        self.stored = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_errors(self, errors: List[Dict[str, Any]]):
+        with self._lock:
+            self.failed += len(errors)
+            room = BULK_MAX_ERRORS - len(self.errors)
+            if room > 0:
+                self.errors.extend(errors[:room])
+
+    def to_dict(self) -> Dict[str, Any]:
+        processed = self.stored + self.failed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "validated": self.validated,
+            "forwarded": self.forwarded,
+            "stored": self.stored,
+            "failed": self.failed,
+            "progress": processed / self.total if self.total else 1.0,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "duration_seconds": (self.finished_at or time.time()) - self.started_at
+        }
+
+class BulkImporter:
+    """Ejecuta importaciones reenviando a Node con una sesión compartida"""
+
+    def __init__(self, node_url: str, concurrency: int = BULK_NODE_CONCURRENCY):
+        self.node_url = node_url
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-node")
+        self._jobs: "OrderedDict[str, BulkImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_job(self, total: int) -> BulkImportJob:
+        job = BulkImportJob(total)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > BULK_MAX_JOBS:
+                self._jobs.popitem(last=False)
+        get_medication_store().save_import(job.id, job.to_dict(), keep=BULK_MAX_JOBS)
+        return job
+
+    def _save(self, job: BulkImportJob):
+        try:
+            get_medication_store().save_import(job.id, job.to_dict())
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar el estado de la importación {job.id}: {e}")
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de una importación: en memoria si corre en este worker, si no desde el almacén"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return get_medication_store().load_import(job_id)
+
+    def _forward(self, medication: Dict[str, Any]) -> Optional[str]:
+        """Programar en Node; devuelve el error o None si fue aceptado"""
+        payload = {k: v for k, v in medication.items() if not k.startswith("_")}
+        try:
+            response = self.session.post(
+                f"{self.node_url}/schedule-multiple-notifications",
+                json=payload,
+                timeout=10
+            )
+        except requests.RequestException as e:
+            return f"Error de conexión con Node.js: {e}"
+        if response.status_code != 200:
+            return f"Error en servidor Node.js: {response.status_code}"
+        return None
+
+    def run(self, job: BulkImportJob, rows: List[Dict[str, Any]]):
+        """Validar, reenviar por lotes y guardar lo aceptado"""
+        job.status = "running"
+        store = get_medication_store()
+        try:
+            valid, errors = validate_rows(rows)
+            job.validated = len(valid)
+            job.add_errors(errors)
+
+            # Agrupar por usuario para que cada lote toque pocos usuarios
+            valid.sort(key=lambda item: item[0])
+            for offset in range(0, len(valid), BULK_BATCH_SIZE):
+                batch = valid[offset:offset + BULK_BATCH_SIZE]
+
+                # Reservar los ids antes de programar en Node: lo que ya existe (p. ej. el
+                # mismo CSV subido dos veces) no se reenvía y no duplica notificaciones
+                duplicates = {id(medication) for _, medication in store.add_many(batch)}
+                rejected = [
+                    {"row": medication["_row"], "errors": ["medicamento_id ya existe para el usuario"]}
+                    for _, medication in batch if id(medication) in duplicates
+                ]
+                reserved = [(user_id, med) for user_id, med in batch if id(med) not in duplicates]
+
+                results = list(self._executor.map(self._forward, (med for _, med in reserved)))
+                forwarded = 0
+                for (user_id, medication), error in zip(reserved, results):
+                    if error is None:
+                        forwarded += 1
+                    else:
+                        # Node no lo programó: deshacer la reserva
+                        store.delete(user_id, medicamento_id=medication["medicamentoId"])
+                        rejected.append({"row": medication["_row"], "errors": [error]})
+
+                job.forwarded += forwarded
+                job.stored += forwarded
+                job.add_errors(rejected)
+                self._save(job)
+
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Error en importación masiva {job.id}: {e}")
+            job.status = "failed"
+            job.add_errors([{"row": None, "errors": [str(e)]}])
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            logger.info(
+                f"📦 Importación {job.id}: {job.stored}/{job.total} guardadas, "
+                f"{job.failed} con error ({job.finished_at - job.started_at:.1f}s)"
+            )
+
+# Instancia global
+_importer: Optional[BulkImporter] = None
+_importer_lock = threading.Lock()
+
+def get_bulk_importer(node_url: str) -> BulkImporter:
+    """Obtener el importador (una sesión HTTP compartida por proceso)"""
+    global _importer
+    if _importer is None:
+        with _importer_lock:
+            if _importer is None:
+                _importer = BulkImporter(node_url)
+    return _importer
@@ -0,0 +1,282 @@
+"""
+Servicio compartido de ejecución de comandos de medicamentos
+
+Los endpoints de voz (normal y 'Mi Dosis') solo adaptan la petición: el
+cálculo de fechas, el payload para Node, el almacén local y la respuesta
+viven aquí, con una tabla de despacho por acción y expresiones precompiladas.
+Las llamadas a Node usan una sesión HTTP con keep-alive ejecutada en un
+hilo para no bloquear el event loop.
+"""
+import os
+import re
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import requests
+
+from api.medication_store import get_medication_store
+from api.dose_index import get_dose_index
+from common.metrics import NODE_REQUESTS, time_stage
+from common.tracing import inject
+
+logger = logging.getLogger(__name__)
+
+NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "https://midosis.onrender.com")
+NODE_TIMEOUT = float(os.getenv("NODE_TIMEOUT", "10"))
+NODE_POOL_SIZE = int(os.getenv("NODE_POOL_SIZE", "20"))
+
+DEFAULT_DURATION_DAYS = 7
+DEFAULT_DOSAGE = "1 tableta"
+DEFAULT_FREQUENCY = "Diario"
+DEFAULT_TIME = "08:00"
+
+DURATION_RE = re.compile(r"(\d+)\s*(d[ií]as?|semanas?|mes(?:es)?)", re.IGNORECASE)
+
+def parse_duration_days(duration: Optional[str]) -> int:
+    """'2 semanas' -> 14, '1 mes' -> 30, '10 días' -> 10 (7 si no se reconoce)"""
+    if not duration:
+        return DEFAULT_DURATION_DAYS
+    match = DURATION_RE.search(duration)
+    if not match:
+        return DEFAULT_DURATION_DAYS
+    num = int(match.group(1))
+    unit = match.group(2).lower()
+    if unit.startswith("semana"):
+        return num * 7
+    if unit.startswith("mes"):
+        return num * 30
+    return num
+
+async def store_scheduled(user_id: str, medication_data: Dict[str, Any]) -> bool:
+    """
+    Guardar localmente un medicamento que Node ya programó
+
+    Node es la fuente de verdad de las notificaciones: si el almacén falla
+    se registra y la petición sigue siendo un éxito para el usuario.
+    """
+    try:
+        await asyncio.to_thread(get_medication_store().add, user_id, medication_data)
+        return True
+    except Exception as e:
+        logger.error(f"❌ Programado en Node pero no guardado localmente "
+                     f"({user_id}/{medication_data['medicamentoId']}): {e}")
+        return False
+
+# Textos por modo: el endpoint 'Mi Dosis' y el de voz normal solo difieren aquí
+MESSAGES = {
+    "dosis": {
+        "id_prefix": "dosis",
+        "added": "✅ {medication} agregado correctamente con 'Mi Dosis'",
+        "listing": "Mostrando lista de medicamentos desde 'Mi Dosis'...",
+        "deleting": "Eliminando {medication} desde 'Mi Dosis'...",
+        "today": "Tienes {count} tomas programadas para hoy desde 'Mi Dosis'",
+        "unknown": "No entendí completamente el comando 'Mi Dosis'.",
+        "suggestions": [
+            "Mi Dosis agregame [medicamento] de [dosis] a las [hora] con frecuencia [frecuencia] por [días] días",
+            "Dosis necesito [medicamento] [dosis] cada [horas] horas por [semanas] semanas",
+            "Asistente añádeme [medicamento] en la [mañana/tarde/noche] diario por [meses] meses"
+        ]
+    },
+    "voice": {
+        "id_prefix": "voice",
+        "added": "✅ {medication} programado correctamente",
+        "listing": "Mostrando lista de medicamentos...",
+        "deleting": "Eliminando {medication}...",
+        "today": "Tienes {count} tomas programadas para hoy",
+        "unknown": "No entendí el comando. Por favor intenta de nuevo.",
+        "suggestions": [
+            "Agregar paracetamol 500mg a las 8 de la mañana",
+            "Mi Dosis agregame ibuprofeno 400mg cada 8 horas por 7 días",
+            "Programar omeprazol cada 12 horas por 30 días"
+        ]
+    }
+}
+
+class NodeClient:
+    """Sesión HTTP compartida hacia el servidor de notificaciones Node.js"""
+
+    def __init__(self, base_url: str = NODE_SERVER_URL, pool_size: int = NODE_POOL_SIZE,
+                 timeout: float = NODE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def schedule(self, medication_data: Dict[str, Any]) -> requests.Response:
+        """Programar notificaciones (bloqueante)"""
+        try:
+            with time_stage("node_call"):
+                response = self.session.post(
+                    f"{self.base_url}/schedule-multiple-notifications",
+                    json=medication_data,
+                    headers=inject(),
+                    timeout=self.timeout
+                )
+        except requests.RequestException:
+            NODE_REQUESTS.labels("error").inc()
+            raise
+        NODE_REQUESTS.labels("ok" if response.status_code == 200 else f"http_{response.status_code}").inc()
+        return response
+
+    async def schedule_async(self, medication_data: Dict[str, Any]) -> requests.Response:
+        """Programar notificaciones sin bloquear el event loop"""
+        return await asyncio.to_thread(self.schedule, medication_data)
+
+class CommandService:
+    """Ejecuta la acción del parser para un usuario y arma la respuesta"""
+
+    def __init__(self, node: Optional[NodeClient] = None):
+        self.node = node or NodeClient()
+        self.handlers: Dict[str, Callable[..., Awaitable[Dict[str, Any]]]] = {
+            "add_medication": self._add,
+            "list_medications": self._list,
+            "delete_medication": self._delete,
+            "check_today": self._check_today
+        }
+
+    async def execute(self, parsed_info: Dict[str, Any], user_id: str, mode: str = "voice") -> Dict[str, Any]:
+        """
+        Ejecutar el comando ya parseado
+
+        Args:
+            parsed_info: Salida de extract_medication_info
+            user_id: Usuario
+            mode: "dosis" (endpoint 'Mi Dosis') o "voice"
+        """
+        messages = MESSAGES[mode]
+        is_dosis = True if mode == "dosis" else parsed_info.get("is_dosis_command", False)
+
+        action = parsed_info.get("action")
+        handler = self.handlers.get(action)
+        if handler is None or (action == "add_medication" and not parsed_info.get("medication")):
+            return {
+                "success": False,
+                "is_dosis_command": is_dosis,
+                "message": messages["unknown"],
+                "parsed_info": parsed_info,
+                "suggestions": messages["suggestions"]
+            }
+
+        return await handler(parsed_info, user_id, mode, is_dosis)
+
+    def build_medication(self, parsed_info: Dict[str, Any], user_id: str,
+                         id_prefix: str) -> Tuple[Dict[str, Any], datetime, datetime, int]:
+        """Payload para Node y fechas calculadas a partir de la duración"""
+        start_date = datetime.now()
+        duration_days = parse_duration_days(parsed_info.get("duration"))
+        end_date = start_date + timedelta(days=duration_days)
+
+        medication_data = {
+            "userId": user_id,
+            "medicamentoId": f"{id_prefix}_{uuid.uuid4().hex}",
+            "nombre": parsed_info["medication"],
+            "dosis": parsed_info.get("dosage") or DEFAULT_DOSAGE,
+            "frecuencia": parsed_info.get("frequency") or DEFAULT_FREQUENCY,
+            "hora": parsed_info.get("time") or DEFAULT_TIME,
+            "fechaInicio": start_date.isoformat(),
+            "fechaFin": end_date.isoformat()
+        }
+        return medication_data, start_date, end_date, duration_days
+
+    async def _add(self, parsed_info: Dict[str, Any], user_id: str, mode: str, is_dosis: bool) -> Dict[str, Any]:
+        messages = MESSAGES[mode]
+        medication_data, start_date, end_date, duration_days = self.build_medication(
+            parsed_info, user_id, messages["id_prefix"]
+        )
+        logger.info(f"📤 Enviando a Node.js: {medication_data}")
+
+        try:
+            response = await self.node.schedule_async(medication_data)
+        except Exception as e:
+            logger.error(f"Error conectando con Node.js: {e}")
+            return {
+                "success": False,
+                "message": f"Error de conexión: {str(e)}",
+                "parsed_info": parsed_info,
+                "fallback": True
+            }
+
+        if response.status_code != 200:
+            return {
+                "success": False,
+                "message": f"Error en servidor Node.js: {response.status_code}",
+                "parsed_info": parsed_info
+            }
+
+        result = response.json()
+        await store_scheduled(user_id, medication_data)
+
+        details = {
+            "dosis": medication_data["dosis"],
+            "frecuencia": medication_data["frecuencia"],
+            "hora": medication_data["hora"],
+            "desde": start_date.strftime("%d/%m/%Y"),
+            "hasta": end_date.strftime("%d/%m/%Y"),
+            "días": duration_days
+        }
+        body = {
+            "success": True,
+            "is_dosis_command": is_dosis,
+            "message": messages["added"].format(medication=parsed_info["medication"]),
+            "parsed_info": parsed_info,
+            "scheduled_notifications": result.get("programadas", 0)
+        }
+        if mode == "dosis":
+            confidence = parsed_info.get("confidence", 0.0)
+            body["confidence"] = confidence
+            details["confianza"] = f"{confidence:.0%}"
+        body["details"] = details
+        return body
+
+    async def _list(self, parsed_info: Dict[str, Any], user_id: str, mode: str, is_dosis: bool) -> Dict[str, Any]:
+        page = await asyncio.to_thread(get_medication_store().list, user_id)
+        return {
+            "success": True,
+            "is_dosis_command": is_dosis,
+            "message": MESSAGES[mode]["listing"],
+            "parsed_info": parsed_info,
+            "medications": page["medications"],
+            "next_cursor": page["next_cursor"]
+        }
+
+    async def _delete(self, parsed_info: Dict[str, Any], user_id: str, mode: str, is_dosis: bool) -> Dict[str, Any]:
+        medication_name = parsed_info.get("medication") or "medicamento"
+        deleted = await asyncio.to_thread(
+            get_medication_store().delete, user_id, nombre=parsed_info.get("medication")
+        )
+        return {
+            "success": True,
+            "is_dosis_command": is_dosis,
+            "message": MESSAGES[mode]["deleting"].format(medication=medication_name),
+            "parsed_info": parsed_info,
+            "deleted": deleted
+        }
+
+    async def _check_today(self, parsed_info: Dict[str, Any], user_id: str, mode: str, is_dosis: bool) -> Dict[str, Any]:
+        doses = await asyncio.to_thread(get_dose_index().today, user_id)
+        return {
+            "success": True,
+            "is_dosis_command": is_dosis,
+            "message": MESSAGES[mode]["today"].format(count=len(doses)),
+            "parsed_info": parsed_info,
+            "doses": doses
+        }
+
+# Instancia global
+_command_service: Optional[CommandService] = None
+_command_service_lock = threading.Lock()
+
+def get_command_service() -> CommandService:
+    """Obtener el servicio de comandos (una sesión hacia Node por proceso)"""
+    global _command_service
+    if _command_service is None:
+        with _command_service_lock:
+            if _command_service is None:
+                _command_service = CommandService()
+    return _command_service
@@ -0,0 +1,284 @@
+"""
+Índice materializado de próximas tomas por usuario
+
+Cada medicamento del almacén local se expande (frecuencia, hora, fecha de
+inicio y fin) en tomas concretas dentro de un horizonte. Por usuario se
+guardan dos listas paralelas ordenadas por instante, de modo que "próxima
+toma" y "tomas de hoy" son búsquedas binarias, y el índice se actualiza
+incrementalmente cuando el almacén agrega o elimina medicamentos.
+
+Cada usuario materializado guarda la versión del almacén con la que se
+construyó; si otro worker escribió después, la versión en SQLite es mayor
+y la siguiente consulta lo reconstruye.
+"""
+import os
+import re
+import heapq
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.medication_store import MedicationStore, get_medication_store
+from common.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+DOSE_INDEX_HORIZON_DAYS = int(os.getenv("DOSE_INDEX_HORIZON_DAYS", "90"))
+DOSE_INDEX_MAX_USERS = int(os.getenv("DOSE_INDEX_MAX_USERS", "10000"))
+BUILD_LOCK_STRIPES = 64
+DEFAULT_HOUR = (8, 0)
+DEFAULT_INTERVAL = timedelta(days=1)
+
+# Frecuencias del parser ("Cada 8 horas", "Diario", "Semanal") y variantes habladas
+CADA_N_RE = re.compile(r"cada\s+(\d+)\s*(horas?|hrs?|h|d[ií]as?|semanas?)\b", re.IGNORECASE)
+VECES_AL_DIA_RE = re.compile(r"\b(una|dos|tres|cuatro|\d+)\s+veces?\s+al\s+d[ií]a\b", re.IGNORECASE)
+SEMANAL_RE = re.compile(r"semanal|por\s+semana|cada\s+semana", re.IGNORECASE)
+HORA_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?")
+VECES = {"una": 1, "dos": 2, "tres": 3, "cuatro": 4}
+
+def parse_interval(frecuencia: Optional[str]) -> timedelta:
+    """Intervalo entre tomas a partir del texto de frecuencia (por defecto, diario)"""
+    if not frecuencia:
+        return DEFAULT_INTERVAL
+
+    match = CADA_N_RE.search(frecuencia)
+    if match:
+        num = int(match.group(1))
+        unit = match.group(2).lower()
+        if num <= 0:
+            return DEFAULT_INTERVAL
+        if unit.startswith("h"):
+            return timedelta(hours=num)
+        if unit.startswith("semana"):
+            return timedelta(weeks=num)
+        return timedelta(days=num)
+
+    match = VECES_AL_DIA_RE.search(frecuencia)
+    if match:
+        veces = VECES.get(match.group(1).lower()) or int(match.group(1))
+        return timedelta(hours=24 / veces) if veces > 0 else DEFAULT_INTERVAL
+
+    if SEMANAL_RE.search(frecuencia):
+        return timedelta(weeks=1)
+
+    return DEFAULT_INTERVAL
+
+def parse_hour(hora: Optional[str]) -> Tuple[int, int]:
+    """(hora, minuto) desde "HH:MM"; 08:00 si no se reconoce"""
+    match = HORA_RE.match(hora or "")
+    if not match:
+        return DEFAULT_HOUR
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return DEFAULT_HOUR
+    return hour, minute
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Fecha desde ISO ("2024-05-01" o "2024-05-01T10:00:00") o "DD/MM/AAAA" """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+def expand_schedule(record: Dict[str, Any],
+                    window_start: datetime,
+                    window_end: datetime) -> List[Tuple[datetime, Dict[str, Any]]]:
+    """
+    Expandir un medicamento en tomas dentro de [window_start, window_end)
+
+    La primera toma es fecha_inicio a la hora indicada; las siguientes se
+    repiten cada intervalo hasta el final de fecha_fin.
+    """
+    interval = parse_interval(record.get("frecuencia"))
+    hour, minute = parse_hour(record.get("hora"))
+    start_day = parse_date(record.get("fecha_inicio")) or window_start.date()
+    end_day = parse_date(record.get("fecha_fin"))
+
+    anchor = datetime.combine(start_day, time(hour, minute))
+    end = window_end
+    if end_day is not None:
+        end = min(end, datetime.combine(end_day + timedelta(days=1), time()))
+
+    # Saltar directamente a la primera toma dentro de la ventana
+    current = anchor
+    if current < window_start:
+        skipped = -(-(window_start - anchor) // interval)
+        current = anchor + skipped * interval
+
+    entry = {
+        "medicamento_id": record["medicamento_id"],
+        "nombre": record["nombre"],
+        "dosis": record.get("dosis"),
+        "frecuencia": record.get("frecuencia")
+    }
+    doses = []
+    while current < end:
+        doses.append((current, entry))
+        current += interval
+    return doses
+
+class UserDoses:
+    """Tomas de un usuario: instantes ordenados y entradas en listas paralelas"""
+
+    __slots__ = ("times", "entries", "window_start", "window_end", "version")
+
+    def __init__(self, window_start: datetime, window_end: datetime, version: int = 0):
+        self.times: List[datetime] = []
+        self.entries: List[Dict[str, Any]] = []
+        self.window_start = window_start
+        self.window_end = window_end
+        self.version = version
+
+    def merge(self, doses: List[Tuple[datetime, Dict[str, Any]]]):
+        """Mezclar tomas ya ordenadas en O(n + m)"""
+        merged = list(heapq.merge(zip(self.times, self.entries), doses, key=lambda dose: dose[0]))
+        self.times = [dose[0] for dose in merged]
+        self.entries = [dose[1] for dose in merged]
+
+    def remove(self, medicamento_ids: List[str]):
+        ids = set(medicamento_ids)
+        kept = [(t, e) for t, e in zip(self.times, self.entries) if e["medicamento_id"] not in ids]
+        self.times = [dose[0] for dose in kept]
+        self.entries = [dose[1] for dose in kept]
+
+    def between(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        lo = bisect_left(self.times, start)
+        hi = bisect_left(self.times, end, lo)
+        return [self._dose(i) for i in range(lo, hi)]
+
+    def after(self, moment: datetime, limit: int) -> List[Dict[str, Any]]:
+        lo = bisect_right(self.times, moment)
+        return [self._dose(i) for i in range(lo, min(lo + limit, len(self.times)))]
+
+    def _dose(self, i: int) -> Dict[str, Any]:
+        return dict(self.entries[i], hora=self.times[i].isoformat())
+
+class DoseIndex:
+    """Índice de tomas por usuario, cargado bajo demanda desde el almacén"""
+
+    def __init__(self,
+                 store: MedicationStore,
+                 horizon_days: int = DOSE_INDEX_HORIZON_DAYS,
+                 max_users: int = DOSE_INDEX_MAX_USERS):
+        self.store = store
+        self.horizon = timedelta(days=horizon_days)
+        self.max_users = max_users
+        self._users: "OrderedDict[str, UserDoses]" = OrderedDict()
+        self._lock = threading.Lock()
+        # La consulta a SQLite se hace fuera de _lock; estos locks por franja de usuarios
+        # solo evitan que varias peticiones del mismo usuario construyan a la vez
+        self._build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]
+        store.add_listener(self.on_change)
+
+    def _window(self, now: datetime) -> Tuple[datetime, datetime]:
+        """Desde el inicio del día actual hasta el horizonte"""
+        start = datetime.combine(now.date(), time())
+        return start, start + self.horizon
+
+    def _build(self, user_id: str, now: datetime, version: int) -> UserDoses:
+        window_start, window_end = self._window(now)
+        doses = UserDoses(window_start, window_end, version)
+        expanded = []
+        for record in self.store.all_for_user(user_id):
+            expanded.extend(expand_schedule(record, window_start, window_end))
+        expanded.sort(key=lambda dose: dose[0])
+        doses.times = [dose[0] for dose in expanded]
+        doses.entries = [dose[1] for dose in expanded]
+        return doses
+
+    def _cached(self, user_id: str, now: datetime, version: int) -> Optional[UserDoses]:
+        with self._lock:
+            doses = self._users.get(user_id)
+            if doses is not None and doses.window_start.date() == now.date() and doses.version == version:
+                self._users.move_to_end(user_id)
+                return doses
+        return None
+
+    def _get(self, user_id: str, now: datetime) -> UserDoses:
+        """Tomas del usuario; se rematerializan al cambiar de día o de versión"""
+        version = self.store.user_version(user_id)
+        doses = self._cached(user_id, now, version)
+        record_cache("dose_index", doses is not None)
+        if doses is not None:
+            return doses
+
+        with self._build_locks[hash(user_id) % BUILD_LOCK_STRIPES]:
+            # Otra petición del mismo usuario pudo construirlo mientras esperábamos
+            doses = self._cached(user_id, now, version)
+            if doses is not None:
+                return doses
+
+            doses = self._build(user_id, now, version)
+            with self._lock:
+                current = self._users.get(user_id)
+                if (current is not None and current.window_start == doses.window_start
+                        and current.version > doses.version):
+                    return current  # on_change lo dejó más nuevo durante la construcción
+                self._users[user_id] = doses
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            return doses
+
+    def on_change(self, event: str, user_id: str, data: Any, version: int):
+        """Actualizar incrementalmente a un usuario ya materializado"""
+        with self._lock:
+            doses = self._users.get(user_id)
+            if doses is None or doses.version > version:
+                return  # se cargará completo en la próxima consulta, o ya incluye el cambio
+            if doses.version < version - 1:
+                # Hubo escrituras en otro worker que este índice no vio
+                del self._users[user_id]
+                return
+            doses.version = version
+            if event == "add":
+                # Idempotente: el usuario pudo construirse ya con este medicamento
+                doses.remove([data["medicamento_id"]])
+                doses.merge(expand_schedule(data, doses.window_start, doses.window_end))
+            elif event == "delete":
+                doses.remove(data)
+
+    def next_doses(self, user_id: str, limit: int = 1, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Próximas tomas posteriores a now"""
+        now = now or datetime.now()
+        return self._get(user_id, now).after(now, limit)
+
+    def doses_between(self, user_id: str, start: datetime, end: datetime,
+                      now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Tomas en [start, end) dentro del horizonte materializado"""
+        return self._get(user_id, now or datetime.now()).between(start, end)
+
+    def today(self, user_id: str, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Todas las tomas del día de now (incluidas las ya pasadas)"""
+        now = now or datetime.now()
+        start = datetime.combine(now.date(), time())
+        return self.doses_between(user_id, start, start + timedelta(days=1), now=now)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "doses": sum(len(doses.times) for doses in self._users.values())
+            }
+
+# Instancia global
+_dose_index: Optional[DoseIndex] = None
+_dose_index_lock = threading.Lock()
+
+def get_dose_index() -> DoseIndex:
+    """Obtener el índice de tomas (suscrito al almacén de medicamentos)"""
+    global _dose_index
+    if _dose_index is None:
+        with _dose_index_lock:
+            if _dose_index is None:
+                _dose_index = DoseIndex(get_medication_store())
+    return _dose_index
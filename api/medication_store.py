@@ -0,0 +1,382 @@
+"""
+Almacén local de medicamentos programados por usuario
+
+SQLite en modo WAL con una conexión por hilo, paginación por cursor
+(keyset sobre id) y caché de lectura por usuario que se invalida al
+agregar o eliminar.
+
+Con varios workers cada proceso tiene su caché: cada escritura incrementa
+la versión del usuario en versiones_usuario (en la misma transacción) y las
+cachés comparan esa versión, una búsqueda por clave primaria, antes de
+servir. Así un cambio hecho en otro worker se ve en la siguiente lectura.
+"""
+import os
+import json
+import time
+import base64
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.metrics import record_cache, time_stage
+
+logger = logging.getLogger(__name__)
+
+MEDICATION_STORE_PATH = os.getenv(
+    "MEDICATION_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "medications.db")
+)
+LISTING_CACHE_TTL = float(os.getenv("LISTING_CACHE_TTL", "300"))
+LISTING_CACHE_MAX_USERS = int(os.getenv("LISTING_CACHE_MAX_USERS", "10000"))
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS medicaciones_programadas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        medicamento_id TEXT NOT NULL,
+        nombre TEXT NOT NULL,
+        dosis TEXT,
+        frecuencia TEXT,
+        hora TEXT,
+        fecha_inicio TEXT,
+        fecha_fin TEXT,
+        creado_en TEXT NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_medicaciones_user_id ON medicaciones_programadas (user_id, id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_medicaciones_medicamento_id "
+    "ON medicaciones_programadas (user_id, medicamento_id)",
+    '''
+    CREATE TABLE IF NOT EXISTS versiones_usuario (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''',
+    # Estado de las importaciones masivas, visible desde cualquier worker
+    '''
+    CREATE TABLE IF NOT EXISTS importaciones (
+        job_id TEXT PRIMARY KEY,
+        estado TEXT NOT NULL,
+        actualizado REAL NOT NULL
+    )
+    '''
+]
+
+COLUMNS = ["id", "medicamento_id", "nombre", "dosis", "frecuencia", "hora", "fecha_inicio", "fecha_fin", "creado_en"]
+
+class DuplicateMedicationError(ValueError):
+    """Ya existe un medicamento con ese medicamento_id para el usuario"""
+
+def encode_cursor(row_id: int) -> str:
+    """Cursor opaco a partir del último id devuelto"""
+    return base64.urlsafe_b64encode(str(row_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Id a partir del cursor (0 = primera página)"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+class ListingCache:
+    """Caché de lectura por usuario: user_id -> {(cursor, limit): (instante, versión, página)}"""
+
+    def __init__(self, ttl: float = LISTING_CACHE_TTL, max_users: int = LISTING_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries: "OrderedDict[str, Dict[Tuple, Tuple[float, int, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, key: Tuple, version: int) -> Optional[Any]:
+        """Página cacheada si sigue vigente y es de la versión actual del usuario"""
+        with self._lock:
+            pages = self._entries.get(user_id)
+            entry = pages.get(key) if pages else None
+            if entry is None or entry[1] != version or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                record_cache("medication_listing", False)
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        record_cache("medication_listing", True)
+        return entry[2]
+
+    def put(self, user_id: str, key: Tuple, version: int, value: Any):
+        with self._lock:
+            self._entries.setdefault(user_id, {})[key] = (time.monotonic(), version, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class MedicationStore:
+    """Medicamentos programados por usuario con listado paginado y cacheado"""
+
+    def __init__(self, db_path: str = MEDICATION_STORE_PATH):
+        self.db_path = db_path
+        self.cache = ListingCache()
+        self._local = threading.local()
+        # Suscriptores de cambios: fn(evento, user_id, datos, versión) con evento "add" o "delete"
+        self._listeners: List[Callable[[str, str, Any, int], None]] = []
+
+        with self._connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        logger.info(f"✅ Almacén de medicamentos listo: {db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (una por hilo)"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = conn
+        return conn
+
+    def add_listener(self, listener: Callable[[str, str, Any, int], None]):
+        """Registrar un índice derivado que se actualiza incrementalmente"""
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, user_id: str, data: Any, version: int):
+        self.cache.invalidate(user_id)
+        for listener in self._listeners:
+            try:
+                listener(event, user_id, data, version)
+            except Exception as e:
+                logger.error(f"Error notificando cambio ({event}) de {user_id}: {e}")
+
+    def _bump_version(self, conn: sqlite3.Connection, user_id: str) -> int:
+        """Incrementar la versión del usuario dentro de la transacción de escritura"""
+        conn.execute(
+            "INSERT INTO versiones_usuario (user_id, version) VALUES (?, 1) "
+            "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+            (user_id,)
+        )
+        return conn.execute("SELECT version FROM versiones_usuario WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def user_version(self, user_id: str) -> int:
+        """Versión actual del usuario (0 si nunca se modificó)"""
+        row = self._connection().execute(
+            "SELECT version FROM versiones_usuario WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def add(self, user_id: str, medication: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guardar un medicamento programado
+
+        Args:
+            user_id: Usuario
+            medication: Datos con las claves del payload a Node
+                (medicamentoId, nombre, dosis, frecuencia, hora, fechaInicio, fechaFin)
+
+        Raises:
+            DuplicateMedicationError: El usuario ya tiene ese medicamentoId (no se sobrescribe)
+        """
+        values = (
+            user_id,
+            medication["medicamentoId"],
+            medication["nombre"],
+            medication.get("dosis"),
+            medication.get("frecuencia"),
+            medication.get("hora"),
+            medication.get("fechaInicio"),
+            medication.get("fechaFin"),
+            datetime.now().isoformat()
+        )
+        try:
+            with time_stage("db_query"), self._connection() as conn:
+                row_id = conn.execute(
+                    "INSERT INTO medicaciones_programadas "
+                    "(user_id, medicamento_id, nombre, dosis, frecuencia, hora, fecha_inicio, fecha_fin, creado_en) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values
+                ).lastrowid
+                version = self._bump_version(conn, user_id)
+        except sqlite3.IntegrityError:
+            raise DuplicateMedicationError(
+                f"El medicamento {medication['medicamentoId']} ya existe para el usuario {user_id}"
+            )
+
+        record = dict(zip(COLUMNS, (row_id,) + values[1:]))
+        self._notify("add", user_id, record, version)
+        return record
+
+    def add_many(self, rows: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Guardar muchos medicamentos en una sola transacción
+
+        Args:
+            rows: Pares (user_id, medication) con las mismas claves que add()
+
+        Returns:
+            Pares no guardados porque el usuario ya tenía ese medicamentoId
+        """
+        if not rows:
+            return []
+
+        created = datetime.now().isoformat()
+        values = [
+            (
+                user_id,
+                medication["medicamentoId"],
+                medication["nombre"],
+                medication.get("dosis"),
+                medication.get("frecuencia"),
+                medication.get("hora"),
+                medication.get("fechaInicio"),
+                medication.get("fechaFin"),
+                created
+            )
+            for user_id, medication in rows
+        ]
+        inserted, duplicates = [], []
+        with time_stage("db_query"), self._connection() as conn:
+            # Fila a fila para saber cuáles chocan; sigue siendo una sola transacción
+            for row, pair in zip(values, rows):
+                cursor = conn.execute(
+                    "INSERT INTO medicaciones_programadas "
+                    "(user_id, medicamento_id, nombre, dosis, frecuencia, hora, fecha_inicio, fecha_fin, creado_en) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, medicamento_id) DO NOTHING",
+                    row
+                )
+                if cursor.rowcount:
+                    inserted.append((cursor.lastrowid,) + row)
+                else:
+                    duplicates.append(pair)
+            # Una versión nueva por usuario tocado (dict.fromkeys conserva el orden)
+            versions = {
+                user_id: self._bump_version(conn, user_id)
+                for user_id in dict.fromkeys(row[1] for row in inserted)
+            }
+
+        for row in inserted:
+            self._notify("add", row[1], dict(zip(COLUMNS, (row[0],) + row[2:])), versions[row[1]])
+        return duplicates
+
+    def delete(self, user_id: str,
+               medicamento_id: Optional[str] = None,
+               nombre: Optional[str] = None) -> int:
+        """Eliminar por id de medicamento o por nombre (sin distinguir mayúsculas)"""
+        if medicamento_id:
+            where, params = "user_id = ? AND medicamento_id = ?", (user_id, medicamento_id)
+        elif nombre:
+            where, params = "user_id = ? AND lower(nombre) = lower(?)", (user_id, nombre)
+        else:
+            return 0
+
+        with time_stage("db_query"), self._connection() as conn:
+            deleted_ids = [row[0] for row in conn.execute(
+                f"SELECT medicamento_id FROM medicaciones_programadas WHERE {where}", params
+            )]
+            conn.execute(f"DELETE FROM medicaciones_programadas WHERE {where}", params)
+            if deleted_ids:
+                version = self._bump_version(conn, user_id)
+
+        if deleted_ids:
+            self._notify("delete", user_id, deleted_ids, version)
+        return len(deleted_ids)
+
+    def all_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """Todos los medicamentos del usuario (sin paginar ni cachear)"""
+        with time_stage("db_query"):
+            rows = self._connection().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM medicaciones_programadas WHERE user_id = ? ORDER BY id",
+                (user_id,)
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def list(self, user_id: str,
+             limit: int = DEFAULT_PAGE_SIZE,
+             cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Listar medicamentos del usuario por páginas
+
+        Returns:
+            {"medications": [...], "next_cursor": str | None}
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        key = (cursor, limit)
+
+        # Leída antes de la consulta: si se cuela otra escritura, la página nace obsoleta
+        version = self.user_version(user_id)
+        page = self.cache.get(user_id, key, version)
+        if page is not None:
+            return page
+
+        after_id = decode_cursor(cursor)
+        with time_stage("db_query"):
+            rows = self._connection().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM medicaciones_programadas "
+                "WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, after_id, limit + 1)
+            ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page = {
+            "medications": [dict(zip(COLUMNS, row)) for row in rows],
+            "next_cursor": encode_cursor(rows[-1][0]) if has_more else None
+        }
+
+        self.cache.put(user_id, key, version, page)
+        return page
+
+    def save_import(self, job_id: str, state: Dict[str, Any], keep: Optional[int] = None):
+        """
+        Guardar el estado de una importación masiva
+
+        Args:
+            keep: Si se indica, conservar solo las `keep` importaciones más recientes
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO importaciones (job_id, estado, actualizado) VALUES (?, ?, ?)",
+                (job_id, json.dumps(state, ensure_ascii=False), time.time())
+            )
+            if keep is not None:
+                conn.execute(
+                    "DELETE FROM importaciones WHERE job_id NOT IN "
+                    "(SELECT job_id FROM importaciones ORDER BY actualizado DESC LIMIT ?)",
+                    (keep,)
+                )
+
+    def load_import(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Último estado guardado de una importación (de cualquier worker)"""
+        row = self._connection().execute(
+            "SELECT estado FROM importaciones WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+# Instancia global
+_store: Optional[MedicationStore] = None
+_store_lock = threading.Lock()
+
+def get_medication_store() -> MedicationStore:
+    """Obtener el almacén de medicamentos"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MedicationStore()
+    return _store
@@ -1,16 +1,27 @@
 """
 Servidor FastAPI con soporte para comandos 'Mi Dosis'
+
+El import del módulo es ligero: el parser (spaCy) se carga en segundo plano
+desde el lifespan y /health responde "warming" mientras tanto. Esta API no
+sintetiza voz; el calentamiento de Coqui es opcional (TTS_WARMUP=1) y nunca
+condiciona /ready: si falla, /health lo informa como "degraded".
 """
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
 import sys
+import uuid
+import threading
+import importlib
+import asyncio
 import logging
-import json
-import re
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
-import requests
-from fastapi import FastAPI, HTTPException
+from datetime import datetime
+from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 # ========== CONFIGURAR PATH PARA IMPORTACIONES ==========
@@ -71,8 +82,35 @@ def import_parser():
         logger.info("⚠️ Usando parser dummy")
         return dummy_extract, dummy_format
 
-# Importar funciones
-extract_medication_info, format_medication_response = import_parser()
+# Carga diferida: spaCy tarda segundos y no debe bloquear el import
+_parser_funcs = None
+_parser_lock = threading.Lock()
+
+# Fases de arranque en segundos (import, parser, ready_after)
+_startup_timings: Dict[str, float] = {}
+
+def load_parser():
+    """Parser cargado (o recién cargado); seguro entre hilos"""
+    global _parser_funcs
+    if _parser_funcs is None:
+        with _parser_lock:
+            if _parser_funcs is None:
+                start = time.perf_counter()
+                funcs = import_parser()
+                _startup_timings["parser"] = round(time.perf_counter() - start, 3)
+                _parser_funcs = funcs
+    return _parser_funcs
+
+def get_parser_status() -> str:
+    if _parser_funcs is None:
+        return "warming"
+    return "active" if _parser_funcs[0].__module__ == "medication_parser" else "fallback"
+
+def extract_medication_info(text: str) -> Dict[str, Any]:
+    return load_parser()[0](text)
+
+def format_medication_response(parsed: Dict[str, Any]) -> str:
+    return load_parser()[1](parsed)
 
 # Configurar logging
 logging.basicConfig(
@@ -81,14 +119,92 @@ logging.basicConfig(
 )
 
 
+from api.medication_store import get_medication_store, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.dose_index import get_dose_index
+from api.bulk_import import BulkImportError, get_bulk_importer, parse_rows
+from api.command_service import NODE_SERVER_URL, get_command_service, store_scheduled
+from common.tracing import TraceMiddleware
+from common.profiling import RequestProfilerMiddleware, create_profiling_router
+from common.metrics import (
+    CONTENT_TYPE, HTTP_REQUEST_SECONDS, monitor_event_loop_lag, render_metrics, route_template,
+    start_multiprocess_writer, time_stage
+)
+
 # Configuración
-NODE_SERVER_URL = "https://midosis.onrender.com"
+TTS_WARMUP = os.getenv("TTS_WARMUP", "0") == "1"  # opcional: la API no sintetiza
+PRELOAD_TTS = os.getenv("PRELOAD_TTS", "1") == "1"
+SERVER_HOST = os.getenv("HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", "8000"))
+
+def preload_models() -> Dict[str, float]:
+    """
+    Cargar en el maestro de gunicorn lo que los workers comparten por copy-on-write
+    
+    Carga el parser (spaCy) y los pesos de Coqui, sin inferencia: los pools
+    de hilos de torch no sobreviven bien a fork, así que el calentamiento
+    sigue en cada worker. SQLite y las sesiones HTTP se crean después del fork.
+    """
+    start = time.perf_counter()
+    load_parser()
+    timings = {"parser": round(time.perf_counter() - start, 3)}
+    if not (TTS_WARMUP and PRELOAD_TTS):
+        return timings
+    
+    from tts import tts_service
+    if not tts_service.COQUI_AVAILABLE:
+        logger.info("Coqui TTS no disponible; sin precarga en el maestro")
+        return timings
+    if tts_service.TTS_VOCODER_OPTIMIZATION != "none":
+        # trace/compile ejecutan el vocoder: se deja a cada worker
+        logger.info("Optimización de vocoder activa; TTS se carga en cada worker")
+        return timings
+    
+    start = time.perf_counter()
+    tts_service.get_tts_service()
+    timings["tts_load"] = round(time.perf_counter() - start, 3)
+    logger.info(f"📦 Modelos precargados en el maestro: {timings}")
+    return timings
+
+# Lifespan management para FastAPI
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Administrar el ciclo de vida de la aplicación"""
+    lifespan_start = time.perf_counter()
+    _startup_timings["import"] = round(lifespan_start - _IMPORT_START, 3)
+    
+    # Startup: parser y TTS en segundo plano sin bloquear el arranque
+    async def warm_parser():
+        await asyncio.to_thread(load_parser)
+        _startup_timings["ready_after"] = round(time.perf_counter() - lifespan_start, 3)
+        logger.info(f"⏱️ Tiempos de arranque: {_startup_timings}")
+    
+    async def warm_tts():
+        # Importar tts_service arrastra torch y Coqui: también fuera del event loop
+        start = time.perf_counter()
+        tts_service = await asyncio.to_thread(importlib.import_module, "tts.tts_service")
+        _startup_timings["tts_import"] = round(time.perf_counter() - start, 3)
+        tts_service.start_tts_warmup()
+        logger.info("🔥 Calentamiento TTS iniciado en segundo plano")
+    
+    warmups = [asyncio.create_task(warm_parser())]
+    if TTS_WARMUP:
+        warmups.append(asyncio.create_task(warm_tts()))
+    
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    start_multiprocess_writer()  # no-op sin METRICS_MULTIPROC_DIR
+    
+    yield
+    
+    for task in warmups:
+        task.cancel()
+    lag_monitor.cancel()
 
 # Crear aplicación FastAPI
 app = FastAPI(
     title="Asistente de Voz para Medicamentos con Mi Dosis",
     description="API para procesar comandos de voz para medicamentos con soporte para 'Mi Dosis'",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -100,6 +216,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Latencia por ruta (plantilla, no URL concreta) y código de estado"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    HTTP_REQUEST_SECONDS.labels(
+        request.method, route_template(request), str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
+# cProfile de una petición con X-Profile: 1 (solo con PROFILING_TOKEN)
+app.add_middleware(RequestProfilerMiddleware)
+
+# Traza por petición: continúa traceparent del cliente (STT, Rasa) o abre una nueva
+app.add_middleware(TraceMiddleware, service="api")
+
+# Perfil por muestreo bajo demanda: POST /admin/profile
+app.include_router(create_profiling_router())
+
 # Modelos Pydantic
 class VoiceCommandRequest(BaseModel):
     text: str
@@ -137,23 +272,70 @@ async def root():
             "process_command": "POST /api/voice/process-command",
             "process_dosis_command": "POST /api/voice/process-dosis-command",
             "test_parser": "POST /api/voice/test-parser",
-            "health": "GET /health"
+            "bulk_import": "POST /api/medication/bulk?format=ndjson|csv",
+            "list_medications": "GET /api/user/{user_id}/medications",
+            "next_dose": "GET /api/user/{user_id}/doses/next",
+            "today_doses": "GET /api/user/{user_id}/doses/today",
+            "health": "GET /health",
+            "ready": "GET /ready",
+            "metrics": "GET /metrics"
         }
     }
 
+def get_tts_status() -> Dict[str, Any]:
+    if not TTS_WARMUP:
+        return {"status": "disabled"}
+    tts_service = sys.modules.get("tts.tts_service")
+    if not hasattr(tts_service, "get_tts_readiness"):
+        # Aún importándose en segundo plano
+        return {"status": "cold"}
+    return tts_service.get_tts_readiness()
+
 @app.get("/health")
 async def health():
-    parser_status = "active" if "extract_medication_info" in globals() and not extract_medication_info.__module__.startswith("__main__") else "error"
+    """Responde desde el arranque; "warming" hasta cargar el parser, "degraded" si falló el TTS"""
+    parser_status = get_parser_status()
+    tts_state = get_tts_status()
+    if parser_status == "warming":
+        status = "warming"
+    elif tts_state["status"] == "failed":
+        status = "degraded"
+    else:
+        status = "healthy"
     
     return {
-        "status": "healthy",
+        "status": status,
         "timestamp": datetime.now().isoformat(),
         "services": {
             "parser": parser_status,
+            "tts": tts_state["status"],
             "node_connection": "checking..."
-        }
+        },
+        "startup": _startup_timings
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness para balanceadores: 503 hasta que el parser esté cargado
+    
+    Con TTS_WARMUP=1 también espera al calentamiento del TTS; si falló se
+    sirve igualmente (/health lo marca como "degraded").
+    """
+    parser_status = get_parser_status()
+    tts_state = get_tts_status()
+    ready = parser_status != "warming" and tts_state["status"] not in ("cold", "warming")
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "parser": parser_status, "tts": tts_state, "startup": _startup_timings}
+    )
+
 @app.post("/api/voice/process-dosis-command")
 async def process_dosis_command(request: DosisCommandRequest):
     """
@@ -163,7 +345,8 @@ async def process_dosis_command(request: DosisCommandRequest):
         logger.info(f"🎯 Procesando comando 'Mi Dosis': {request.transcript[:100]}...")
         
         # Usar el parser mejorado
-        parsed_info = extract_medication_info(request.transcript)
+        with time_stage("parse"):
+            parsed_info = extract_medication_info(request.transcript)
         
         logger.info(f"✅ Información parseada: {parsed_info}")
         
@@ -171,120 +354,7 @@ async def process_dosis_command(request: DosisCommandRequest):
         if not parsed_info.get("is_dosis_command", False):
             logger.warning("⚠️ El comando fue marcado como Dosis pero el parser no lo detectó")
         
-        # Si es agregar medicamento, programar en Node.js
-        if parsed_info.get("action") == "add_medication" and parsed_info.get("medication"):
-            
-            # Calcular fechas basadas en la duración
-            start_date = datetime.now()
-            
-            # Parsear duración si existe
-            duration_days = 7  # Valor por defecto
-            if parsed_info.get("duration"):
-                duration_str = parsed_info["duration"]
-                match = re.search(r"(\d+)\s*(días|día|semanas|semana|meses|mes)", duration_str.lower())
-                if match:
-                    num = int(match.group(1))
-                    unit = match.group(2)
-                    if "semana" in unit:
-                        duration_days = num * 7
-                    elif "mes" in unit:
-                        duration_days = num * 30
-                    else:
-                        duration_days = num
-            
-            end_date = start_date + timedelta(days=duration_days)
-            
-            # Parsear hora si existe
-            time_str = parsed_info.get("time", "08:00")
-            
-            # Preparar datos para Node.js
-            medication_data = {
-                "userId": request.userId,
-                "medicamentoId": f"dosis_{int(datetime.now().timestamp())}",
-                "nombre": parsed_info["medication"],
-                "dosis": parsed_info.get("dosage", "1 tableta"),
-                "frecuencia": parsed_info.get("frequency", "Diario"),
-                "hora": time_str,
-                "fechaInicio": start_date.isoformat(),
-                "fechaFin": end_date.isoformat()
-            }
-            
-            logger.info(f"📤 Enviando a Node.js: {medication_data}")
-            
-            try:
-                # Programar notificaciones
-                response = requests.post(
-                    f"{NODE_SERVER_URL}/schedule-multiple-notifications",
-                    json=medication_data,
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    return {
-                        "success": True,
-                        "is_dosis_command": True,
-                        "message": f"✅ {parsed_info['medication']} agregado correctamente con 'Mi Dosis'",
-                        "parsed_info": parsed_info,
-                        "scheduled_notifications": result.get("programadas", 0),
-                        "confidence": parsed_info.get("confidence", 0.0),
-                        "details": {
-                            "dosis": parsed_info.get("dosage", "1 tableta"),
-                            "frecuencia": parsed_info.get("frequency", "Diario"),
-                            "hora": time_str,
-                            "desde": start_date.strftime("%d/%m/%Y"),
-                            "hasta": end_date.strftime("%d/%m/%Y"),
-                            "días": duration_days,
-                            "confianza": f"{parsed_info.get('confidence', 0.0):.0%}"
-                        }
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "message": f"Error en servidor Node.js: {response.status_code}",
-                        "parsed_info": parsed_info
-                    }
-                    
-            except Exception as e:
-                logger.error(f"Error conectando con Node.js: {e}")
-                return {
-                    "success": False,
-                    "message": f"Error de conexión: {str(e)}",
-                    "parsed_info": parsed_info,
-                    "fallback": True
-                }
-        
-        # Para otros comandos Dosis
-        elif parsed_info.get("action") == "list_medications":
-            return {
-                "success": True,
-                "is_dosis_command": True,
-                "message": "Mostrando lista de medicamentos desde 'Mi Dosis'...",
-                "parsed_info": parsed_info
-            }
-        
-        elif parsed_info.get("action") == "delete_medication":
-            medication_name = parsed_info.get("medication", "medicamento")
-            return {
-                "success": True,
-                "is_dosis_command": True,
-                "message": f"Eliminando {medication_name} desde 'Mi Dosis'...",
-                "parsed_info": parsed_info
-            }
-        
-        else:
-            return {
-                "success": False,
-                "is_dosis_command": True,
-                "message": "No entendí completamente el comando 'Mi Dosis'.",
-                "parsed_info": parsed_info,
-                "suggestions": [
-                    "Mi Dosis agregame [medicamento] de [dosis] a las [hora] con frecuencia [frecuencia] por [días] días",
-                    "Dosis necesito [medicamento] [dosis] cada [horas] horas por [semanas] semanas",
-                    "Asistente añádeme [medicamento] en la [mañana/tarde/noche] diario por [meses] meses"
-                ]
-            }
+        return await get_command_service().execute(parsed_info, request.userId, mode="dosis")
             
     except Exception as e:
         logger.error(f"Error procesando comando Dosis: {e}")
@@ -299,110 +369,12 @@ async def process_voice_command(request: VoiceCommandRequest):
         logger.info(f"Procesando comando: {request.text}")
         
         # Usar el parser mejorado
-        parsed_info = extract_medication_info(request.text)
+        with time_stage("parse"):
+            parsed_info = extract_medication_info(request.text)
         
         logger.info(f"Información parseada: {parsed_info}")
         
-        # Si es agregar medicamento, programar en Node.js
-        if parsed_info.get("action") == "add_medication" and parsed_info.get("medication"):
-            
-            # Calcular fechas
-            start_date = datetime.now()
-            duration_days = 7  # Valor por defecto
-            if parsed_info.get("duration"):
-                duration_str = parsed_info["duration"]
-                match = re.search(r"(\d+)\s*(días|día)", duration_str.lower())
-                if match:
-                    duration_days = int(match.group(1))
-            
-            end_date = start_date + timedelta(days=duration_days)
-            
-            # Preparar datos para Node.js
-            medication_data = {
-                "userId": request.user_id,
-                "medicamentoId": f"voice_{int(datetime.now().timestamp())}",
-                "nombre": parsed_info["medication"],
-                "dosis": parsed_info.get("dosage", "1 tableta"),
-                "frecuencia": parsed_info.get("frequency", "Diario"),
-                "hora": parsed_info.get("time", "08:00"),
-                "fechaInicio": start_date.isoformat(),
-                "fechaFin": end_date.isoformat()
-            }
-            
-            logger.info(f"Enviando a Node.js: {medication_data}")
-            
-            try:
-                # Programar notificaciones
-                response = requests.post(
-                    f"{NODE_SERVER_URL}/schedule-multiple-notifications",
-                    json=medication_data,
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    return {
-                        "success": True,
-                        "is_dosis_command": parsed_info.get("is_dosis_command", False),
-                        "message": f"✅ {parsed_info['medication']} programado correctamente",
-                        "parsed_info": parsed_info,
-                        "scheduled_notifications": result.get("programadas", 0),
-                        "details": {
-                            "dosis": parsed_info.get("dosage", "1 tableta"),
-                            "frecuencia": parsed_info.get("frequency", "Diario"),
-                            "hora": parsed_info.get("time", "08:00"),
-                            "desde": start_date.strftime("%d/%m/%Y"),
-                            "hasta": end_date.strftime("%d/%m/%Y"),
-                            "días": duration_days
-                        }
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "message": f"Error en servidor Node.js: {response.status_code}",
-                        "parsed_info": parsed_info
-                    }
-                    
-            except Exception as e:
-                logger.error(f"Error conectando con Node.js: {e}")
-                return {
-                    "success": False,
-                    "message": f"Error de conexión: {str(e)}",
-                    "parsed_info": parsed_info,
-                    "fallback": True
-                }
-        
-        # Para otros comandos
-        elif parsed_info.get("action") == "list_medications":
-            return {
-                "success": True,
-                "is_dosis_command": parsed_info.get("is_dosis_command", False),
-                "message": "Mostrando lista de medicamentos...",
-                "parsed_info": parsed_info
-            }
-        
-        elif parsed_info.get("action") == "delete_medication":
-            medication_name = parsed_info.get("medication", "medicamento")
-            return {
-                "success": True,
-                "is_dosis_command": parsed_info.get("is_dosis_command", False),
-                "message": f"Eliminando {medication_name}...",
-                "parsed_info": parsed_info
-            }
-        
-        else:
-            return {
-                "success": False,
-                "is_dosis_command": parsed_info.get("is_dosis_command", False),
-                "message": "No entendí el comando. Por favor intenta de nuevo.",
-                "parsed_info": parsed_info,
-                "suggestions": [
-                    "Agregar paracetamol 500mg a las 8 de la mañana",
-                    "Mi Dosis agregame ibuprofeno 400mg cada 8 horas por 7 días",
-                    "Programar omeprazol cada 12 horas por 30 días"
-                ]
-            }
+        return await get_command_service().execute(parsed_info, request.user_id, mode="voice")
             
     except Exception as e:
         logger.error(f"Error procesando comando: {e}")
@@ -476,7 +448,7 @@ async def add_medication(request: MedicationRequest):
         # Enviar al servidor Node.js
         medication_data = {
             "userId": request.user_id,
-            "medicamentoId": f"manual_{int(datetime.now().timestamp())}",
+            "medicamentoId": f"manual_{uuid.uuid4().hex}",
             "nombre": request.nombre,
             "dosis": request.dosis,
             "frecuencia": request.frecuencia,
@@ -485,11 +457,10 @@ async def add_medication(request: MedicationRequest):
             "fechaFin": request.fecha_fin
         }
         
-        response = requests.post(
-            f"{NODE_SERVER_URL}/schedule-multiple-notifications",
-            json=medication_data,
-            timeout=10
-        )
+        response = await get_command_service().node.schedule_async(medication_data)
+        
+        if response.status_code == 200:
+            await store_scheduled(request.user_id, medication_data)
         
         return {
             "success": response.status_code == 200,
@@ -500,15 +471,100 @@ async def add_medication(request: MedicationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/medication/bulk", status_code=202)
+async def bulk_import_medications(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")
+):
+    """
+    Importar muchos medicamentos desde NDJSON o CSV
+    
+    Columnas: user_id, nombre, hora (obligatorias), medicamento_id, dosis,
+    frecuencia, fecha_inicio, fecha_fin. El formato se toma de ?format= o
+    del Content-Type (text/csv o application/x-ndjson). Responde 202 con un
+    job_id para consultar el progreso.
+    """
+    fmt = format
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    
+    try:
+        rows = parse_rows(await request.body(), fmt)
+    except BulkImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    importer = get_bulk_importer(NODE_SERVER_URL)
+    job = importer.create_job(len(rows))
+    background_tasks.add_task(importer.run, job, rows)
+    
+    return {"job_id": job.id, "total": job.total, "status_url": f"/api/medication/bulk/{job.id}"}
+
+@app.get("/api/medication/bulk/{job_id}")
+async def bulk_import_status(job_id: str):
+    """Progreso y errores por fila de una importación masiva"""
+    status = get_bulk_importer(NODE_SERVER_URL).get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return status
+
+@app.get("/api/user/{user_id}/medications")
+async def list_user_medications(
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    Listar medicamentos programados del usuario (paginado por cursor)
+    
+    Usar next_cursor de la respuesta para pedir la página siguiente.
+    """
+    try:
+        page = await asyncio.to_thread(get_medication_store().list, user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "user_id": user_id,
+        "count": len(page["medications"]),
+        "medications": page["medications"],
+        "next_cursor": page["next_cursor"]
+    }
+
+@app.delete("/api/user/{user_id}/medications/{medicamento_id}")
+async def delete_user_medication(user_id: str, medicamento_id: str):
+    """Eliminar un medicamento programado del usuario"""
+    deleted = await asyncio.to_thread(get_medication_store().delete, user_id, medicamento_id=medicamento_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Medicamento no encontrado")
+    
+    return {"success": True, "deleted": deleted, "medicamento_id": medicamento_id}
+
+@app.get("/api/user/{user_id}/doses/next")
+async def next_user_doses(user_id: str, limit: int = Query(1, ge=1, le=MAX_PAGE_SIZE)):
+    """Próximas tomas del usuario según el índice local"""
+    doses = await asyncio.to_thread(get_dose_index().next_doses, user_id, limit=limit)
+    return {"user_id": user_id, "count": len(doses), "doses": doses}
+
+@app.get("/api/user/{user_id}/doses/today")
+async def today_user_doses(user_id: str):
+    """Tomas programadas hoy para el usuario (incluidas las ya pasadas)"""
+    doses = await asyncio.to_thread(get_dose_index().today, user_id)
+    return {"user_id": user_id, "count": len(doses), "doses": doses}
+
 def start_server():
-    """Función para iniciar el servidor"""
+    """
+    Servidor de desarrollo (un proceso, recarga al cambiar archivos)
+    
+    En producción usar gunicorn: gunicorn -c gunicorn_conf.py api.server:app
+    """
     import uvicorn
     
     logger.info("=" * 60)
     logger.info("🚀 INICIANDO ASISTENTE DE VOZ CON 'MI DOSIS'")
     logger.info("=" * 60)
-    logger.info(f"📡 URL: http://localhost:8000")
-    logger.info(f"📖 Docs: http://localhost:8000/docs")
+    logger.info(f"📡 URL: http://localhost:{SERVER_PORT}")
+    logger.info(f"📖 Docs: http://localhost:{SERVER_PORT}/docs")
     logger.info(f"🔗 Node.js: {NODE_SERVER_URL}")
     logger.info("\n🎯 Comandos 'Mi Dosis' de ejemplo:")
     logger.info('  POST /api/voice/process-dosis-command')
@@ -517,7 +573,8 @@ def start_server():
     logger.info('  POST /api/voice/test-parser')
     logger.info('  Body: {"text": "Mi Dosis agregame...", "examples": true}')
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    # reload necesita la app como cadena de importación
+    uvicorn.run("api.server:app", host=SERVER_HOST, port=SERVER_PORT, reload=True, app_dir=parent_dir)
 
 if __name__ == "__main__":
     start_server()
\ No newline at end of file
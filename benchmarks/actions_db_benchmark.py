@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Benchmark de la base de datos de acciones Rasa con millones de tomas sintéticas
+
+Mide las consultas de ActionVerificarToma sobre el esquema original (fechas TEXT,
+sin índices), el tiempo de la migración 2 y las mismas consultas después.
+
+Uso:
+    python benchmarks/actions_db_benchmark.py --rows 2000000 --users 5000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import importlib.util
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATABASE_MODULE = ROOT_DIR / "rasa_project" / "actions" / "database.py"
+
+MEDICAMENTOS = [
+    "paracetamol", "ibuprofeno", "omeprazol", "metformina", "losartán", "amlodipino",
+    "atorvastatina", "lisinopril", "aspirina", "levotiroxina", "insulina", "salbutamol"
+]
+
+def load_database_module(db_path: str):
+    """Cargar database.py sin importar el paquete de acciones (que requiere rasa_sdk)"""
+    os.environ["ACTIONS_DB_PATH"] = db_path
+    spec = importlib.util.spec_from_file_location("actions_database", DATABASE_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def populate(db, rows: int, users: int, days: int, batch_size: int = 100_000):
+    """Insertar tomas sintéticas con el formato original (fecha 'AAAA-MM-DD')"""
+    start_day = date.today() - timedelta(days=days)
+    rng = random.Random(42)
+    conn = db.get_pool().get_connection()
+
+    inserted = 0
+    while inserted < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - inserted)):
+            day = start_day + timedelta(days=rng.randrange(days + 1))
+            batch.append((
+                rng.choice(MEDICAMENTOS),
+                day.isoformat(),
+                f"{rng.randrange(24):02d}:00",
+                1,
+                f"user_{rng.randrange(users)}"
+            ))
+        with conn:
+            conn.executemany(
+                "INSERT INTO tomas_registradas (medicamento, fecha, hora, confirmada, usuario_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+        inserted += len(batch)
+
+def time_queries(db, queries: list, fecha_entera: bool, repeats: int, users: int) -> dict:
+    """Ejecutar cada consulta con parámetros aleatorios y medir latencia"""
+    rng = random.Random(7)
+    today = date.today()
+    results = {}
+
+    for name, sql in queries:
+        timings = []
+        for _ in range(repeats):
+            user = f"user_{rng.randrange(users)}"
+            day = today - timedelta(days=rng.randrange(30))
+            fecha = db.fecha_a_entero(day) if fecha_entera else day.isoformat()
+            params = {
+                "verificar_toma": (user, fecha, rng.choice(MEDICAMENTOS)),
+                "tomas_del_dia": (user, fecha)
+            }[name]
+
+            start = time.perf_counter()
+            db.query_all(sql, params)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        results[name] = {
+            "mean_ms": sum(timings) / len(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p95_ms": timings[int(len(timings) * 0.95) - 1]
+        }
+
+    return results
+
+QUERIES = [
+    ("verificar_toma",
+     "SELECT EXISTS(SELECT 1 FROM tomas_registradas WHERE usuario_id = ? AND fecha = ? AND medicamento = ?)"),
+    ("tomas_del_dia",
+     "SELECT DISTINCT medicamento FROM tomas_registradas WHERE usuario_id = ? AND fecha = ?")
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la base de datos de acciones")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Tomas sintéticas")
+    parser.add_argument("--users", type=int, default=5000, help="Usuarios distintos")
+    parser.add_argument("--days", type=int, default=365, help="Días de historial")
+    parser.add_argument("--repeats", type=int, default=200, help="Consultas por medición")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = load_database_module(os.path.join(tmp_dir, "bench.db"))
+
+        print(f"Creando esquema original e insertando {args.rows:,} tomas...")
+        db.migrate(target_version=1)
+        start = time.perf_counter()
+        populate(db, args.rows, args.users, args.days)
+        populate_time = time.perf_counter() - start
+
+        before = time_queries(db, QUERIES, False, args.repeats, args.users)
+
+        start = time.perf_counter()
+        db.migrate()
+        migration_time = time.perf_counter() - start
+
+        after = time_queries(db, QUERIES, True, args.repeats, args.users)
+        db.get_pool().close_all()
+
+    report = {
+        "rows": args.rows,
+        "users": args.users,
+        "populate_seconds": populate_time,
+        "migration_seconds": migration_time,
+        "before": before,
+        "after": after
+    }
+
+    print(f"\nCarga: {populate_time:.1f}s | Migración 2: {migration_time:.1f}s\n")
+    print(f"{'consulta':<16} {'antes p50':>12} {'después p50':>12} {'mejora':>8}")
+    print("-" * 52)
+    for name, _ in QUERIES:
+        b, a = before[name]["p50_ms"], after[name]["p50_ms"]
+        print(f"{name:<16} {b:>10.3f}ms {a:>10.3f}ms {b / a if a else float('inf'):>7.0f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
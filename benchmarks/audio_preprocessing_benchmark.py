@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+Benchmark del preprocesado en memoria frente al camino ffmpeg de Whisper
+
+Camino ffmpeg (el anterior a stt/audio_preprocessing.py): archivo temporal,
+ffmpeg a 16 kHz mono s16le (el comando de whisper.audio.load_audio) y una
+segunda lectura con soundfile para las métricas de calidad. Camino numpy:
+preprocess_audio sobre los bytes, una sola decodificación.
+
+Se mide la latencia de cada camino y la concordancia entre salidas (SNR en dB
+entre la señal de ffmpeg y la nuestra sin la ganancia de sonoridad). Con
+--model y un corpus (manifest.jsonl, ver stt_benchmark.py) también el WER de
+Whisper con cada entrada.
+
+Las variantes sintéticas cubren las subidas problemáticas: 44.1/48 kHz,
+estéreo, volumen muy bajo y offset DC.
+
+Uso:
+    python benchmarks/audio_preprocessing_benchmark.py --repeats 20
+    python benchmarks/audio_preprocessing_benchmark.py --corpus bench_corpus --model base \\
+        --output preprocess_bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.stt_benchmark import environment, normalize_words, percentile, word_errors
+from stt.audio_preprocessing import (
+    TARGET_SAMPLE_RATE, audio_quality_metrics, preprocess_audio, to_mono
+)
+
+# (nombre, frecuencia, canales, nivel dBFS, offset DC)
+VARIANTS = [
+    ("16k_mono", 16000, 1, -20.0, 0.0),
+    ("44k1_stereo", 44100, 2, -20.0, 0.0),
+    ("48k_stereo", 48000, 2, -20.0, 0.0),
+    ("48k_mono_quiet", 48000, 1, -50.0, 0.0),
+    ("44k1_stereo_dc", 44100, 2, -25.0, 0.1)
+]
+
+# ========== ENTRADAS ==========
+def speech_like(sample_rate: int, seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """Armónicos de una fundamental que varía, modulados a ritmo silábico, más ruido"""
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    return voiced * envelope + 0.02 * rng.standard_normal(len(t))
+
+def encode_wav(audio: np.ndarray, sample_rate: int) -> bytes:
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+def synthetic_inputs(seconds: float, seed: int) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for name, sample_rate, channels, level_db, dc in VARIANTS:
+        mono = speech_like(sample_rate, seconds, rng)
+        mono *= 10 ** (level_db / 20) / np.sqrt(np.mean(mono ** 2))
+        audio = np.stack([mono * (1 - 0.2 * c) for c in range(channels)], axis=1) + dc
+        inputs.append({"name": name, "bytes": encode_wav(audio.astype(np.float32), sample_rate),
+                       "duration": seconds, "text": None})
+    return inputs
+
+def corpus_inputs(corpus_dir: Path) -> List[Dict]:
+    import soundfile as sf
+
+    inputs = []
+    with open(corpus_dir / "manifest.jsonl", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = corpus_dir / entry["audio"]
+            inputs.append({"name": entry["audio"], "bytes": path.read_bytes(),
+                           "duration": sf.info(str(path)).duration, "text": entry["text"]})
+    return inputs
+
+# ========== CAMINOS ==========
+def ffmpeg_path(audio_bytes: bytes) -> np.ndarray:
+    """Lo que hacía transcribe_base64: temporal, ffmpeg de Whisper y métricas con soundfile"""
+    import soundfile as sf
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        tmp.write(audio_bytes)
+        path = tmp.name
+    try:
+        cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", path, "-f", "s16le",
+               "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(TARGET_SAMPLE_RATE), "-"]
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        audio = np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+        samples, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        audio_quality_metrics(to_mono(samples), sample_rate)
+        return audio
+    finally:
+        os.unlink(path)
+
+def timed(fn, audio_bytes: bytes, repeats: int) -> List[float]:
+    fn(audio_bytes)  # calentar (imports de scipy, caché de disco)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(audio_bytes)
+        times.append(time.perf_counter() - start)
+    return times
+
+def agreement_db(reference: np.ndarray, processed) -> float:
+    """SNR entre la salida de ffmpeg (sin DC) y la nuestra sin la ganancia aplicada"""
+    ours = processed.audio / np.float32(10 ** (processed.quality["gain_db"] / 20))
+    n = min(len(reference), len(ours))
+    reference = reference[:n] - reference[:n].mean()
+    error = reference - ours[:n]
+    return float(10 * np.log10(np.sum(reference ** 2) / (np.sum(error ** 2) + 1e-20)))
+
+def summarize(times: List[float]) -> Dict[str, Optional[float]]:
+    return {"p50": percentile(times, 50), "p95": percentile(times, 95), "mean": float(np.mean(times))}
+
+# ========== WER ==========
+def transcribe_wer(model_name: str, inputs: List[Dict], ffmpeg_ok: bool) -> Dict[str, float]:
+    """WER de Whisper con la entrada de cada camino (solo entradas con texto de referencia)"""
+    from stt.whisper_service import WhisperSTTService
+
+    # Mismo modelo y configuración que en producción
+    service = WhisperSTTService(default_model=model_name)
+    model = service.current_model
+    config = service.get_transcription_config()
+
+    errors = {"numpy": 0, "ffmpeg": 0}
+    words = 0
+    for item in (item for item in inputs if item["text"]):
+        reference = normalize_words(item["text"])
+        words += len(reference)
+        candidates = {"numpy": preprocess_audio(item["bytes"]).audio}
+        if ffmpeg_ok:
+            candidates["ffmpeg"] = ffmpeg_path(item["bytes"])
+        for path, audio in candidates.items():
+            hypothesis = normalize_words(model.transcribe(audio, **config).get("text", ""))
+            errors[path] += word_errors(reference, hypothesis)
+
+    if not words:
+        return {}
+    return {path: count / words for path, count in errors.items() if ffmpeg_ok or path == "numpy"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocesado numpy frente a ffmpeg")
+    parser.add_argument("--corpus", help="Directorio con manifest.jsonl (además de las variantes sintéticas)")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Duración de las variantes sintéticas")
+    parser.add_argument("--repeats", type=int, default=10, help="Repeticiones por entrada y camino")
+    parser.add_argument("--model", help="Modelo Whisper para comparar WER (requiere --corpus)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+    if args.model and not args.corpus:
+        parser.error("--model requiere --corpus con textos de referencia")
+
+    inputs = synthetic_inputs(args.seconds, args.seed)
+    if args.corpus:
+        inputs += corpus_inputs(Path(args.corpus))
+
+    ffmpeg_ok = shutil.which("ffmpeg") is not None
+    if not ffmpeg_ok:
+        print("⚠️  ffmpeg no encontrado: solo se mide el camino numpy")
+
+    print(f"{'entrada':>20} {'numpy p50':>10} {'ffmpeg p50':>11} {'speedup':>8} {'acuerdo dB':>11} {'ganancia':>9}")
+    print("-" * 76)
+
+    results = []
+    for item in inputs:
+        processed = preprocess_audio(item["bytes"])
+        numpy_times = timed(preprocess_audio, item["bytes"], args.repeats)
+        result = {
+            "input": item["name"],
+            "duration": item["duration"],
+            "numpy": summarize(numpy_times),
+            "numpy_stages": {stage: seconds for stage, seconds in processed.timings.items()},
+            "quality": processed.quality
+        }
+        if ffmpeg_ok:
+            ffmpeg_times = timed(ffmpeg_path, item["bytes"], args.repeats)
+            result["ffmpeg"] = summarize(ffmpeg_times)
+            result["speedup_p50"] = result["ffmpeg"]["p50"] / result["numpy"]["p50"]
+            result["agreement_db"] = agreement_db(ffmpeg_path(item["bytes"]), processed)
+        results.append(result)
+
+        print(f"{item['name'][:20]:>20} {result['numpy']['p50'] * 1000:>8.1f}ms "
+              + (f"{result['ffmpeg']['p50'] * 1000:>9.1f}ms {result['speedup_p50']:>7.1f}x "
+                 f"{result['agreement_db']:>11.1f}" if ffmpeg_ok else f"{'-':>11} {'-':>8} {'-':>11}")
+              + f" {processed.quality['gain_db']:>+8.1f}dB")
+
+    wer = None
+    if args.model:
+        wer = transcribe_wer(args.model, inputs, ffmpeg_ok)
+        print("\nWER: " + ", ".join(f"{path} {value:.1%}" for path, value in wer.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "ffmpeg_available": ffmpeg_ok,
+                       "repeats": args.repeats, "results": results, "wer": wer},
+                      f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
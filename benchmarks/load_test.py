@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Generador de carga para los endpoints de voz de la API
+
+Bucle abierto: las peticiones se lanzan a la tasa objetivo aunque el
+servidor se retrase, y la latencia se mide desde el instante programado
+(sin omisión coordinada). Antes y después se leen /metrics para obtener
+el retraso del event loop del servidor durante la prueba.
+
+Uso (con el sustituto de Node):
+    python benchmarks/node_stub.py --port 3001 --latency-ms 80 &
+    NODE_SERVER_URL=http://127.0.0.1:3001 python run_server.py &
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --rps 20,50,100 --duration 30
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+LAG_METRIC = "midosis_event_loop_lag_seconds"
+BUCKET_RE = re.compile(LAG_METRIC + r'_bucket\{le="([^"]+)"\} (\S+)')
+
+COMMANDS = [
+    "Mi Dosis agregame paracetamol de 500 mg a las 8 de la mañana cada 12 horas por 14 días",
+    "Dosis necesito ibuprofeno 400 mg cada 8 horas por 7 días",
+    "Agregar omeprazol 20 mg a las 7 de la mañana diario por 30 días",
+    "Mostrar mis medicamentos",
+    "Qué tengo para hoy"
+]
+
+def build_request(endpoint: str, rng: random.Random, users: int) -> Tuple[str, Dict]:
+    """Ruta y cuerpo de una petición aleatoria para el endpoint"""
+    user_id = f"load_user_{rng.randrange(users)}"
+    text = rng.choice(COMMANDS)
+    if endpoint == "dosis":
+        return "/api/voice/process-dosis-command", {
+            "userId": user_id,
+            "transcript": text,
+            "commandType": "voice",
+            "medicationInfo": {}
+        }
+    return "/api/voice/process-command", {"text": text, "user_id": user_id}
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+# ========== RETRASO DEL EVENT LOOP (desde /metrics) ==========
+def scrape_lag(session: requests.Session, url: str) -> Optional[Dict]:
+    """Buckets acumulados, suma y cuenta del histograma de retraso del loop"""
+    try:
+        text = session.get(f"{url}/metrics", timeout=5).text
+    except requests.RequestException:
+        return None
+    buckets = [(float(le), float(count)) for le, count in BUCKET_RE.findall(text)]
+    if not buckets:
+        return None
+    total = re.search(LAG_METRIC + r"_sum (\S+)", text)
+    return {"buckets": buckets, "sum": float(total.group(1)) if total else 0.0}
+
+def lag_summary(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict]:
+    """Percentiles aproximados (límite superior del bucket) durante la prueba"""
+    if not before or not after:
+        return None
+    deltas = [(le, a - b) for (le, a), (_, b) in zip(after["buckets"], before["buckets"])]
+    count = deltas[-1][1]
+    if count <= 0:
+        return None
+
+    def bucket_percentile(pct: float) -> float:
+        target = count * pct / 100
+        return next(le for le, cumulative in deltas if cumulative >= target)
+
+    return {
+        "samples": int(count),
+        "mean": (after["sum"] - before["sum"]) / count,
+        "p50_le": bucket_percentile(50),
+        "p99_le": bucket_percentile(99),
+        "max_le": next(le for le, cumulative in deltas if cumulative >= count)
+    }
+
+# ========== CARGA ==========
+def run_level(url: str, endpoint: str, rps: float, duration: float,
+              workers: int, timeout: float, users: int, seed: int) -> Dict:
+    """Mantener rps peticiones por segundo durante duration segundos"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    latencies: List[float] = []
+    service_times: List[float] = []
+    outcomes: Counter = Counter()
+    lock = threading.Lock()
+
+    def send(scheduled: float, path: str, body: Dict):
+        sent = time.perf_counter()
+        try:
+            response = session.post(f"{url}{path}", json=body, timeout=timeout)
+            outcome = f"http_{response.status_code}"
+            if response.status_code == 200 and not response.json().get("success", True):
+                outcome = "app_error"
+        except requests.Timeout:
+            outcome = "timeout"
+        except requests.RequestException:
+            outcome = "connection_error"
+        done = time.perf_counter()
+        with lock:
+            latencies.append(done - scheduled)
+            service_times.append(done - sent)
+            outcomes[outcome] += 1
+
+    lag_before = scrape_lag(session, url)
+    total = int(rps * duration)
+    interval = 1.0 / rps
+    dispatch_delays = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i * interval
+            now = time.perf_counter()
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            dispatch_delays.append(max(0.0, time.perf_counter() - scheduled))
+            path, body = build_request(endpoint, rng, users)
+            pool.submit(send, scheduled, path, body)
+    elapsed = time.perf_counter() - start
+
+    lag_after = scrape_lag(session, url)
+    errors = sum(count for outcome, count in outcomes.items() if outcome != "http_200")
+
+    return {
+        "endpoint": endpoint,
+        "target_rps": rps,
+        "achieved_rps": total / elapsed,
+        "requests": total,
+        "outcomes": dict(outcomes),
+        "error_rate": errors / total if total else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else None,
+        "service_time_p50": percentile(service_times, 50),
+        "service_time_p99": percentile(service_times, 99),
+        "generator_dispatch_p99": percentile(dispatch_delays, 99),
+        "server_event_loop_lag": lag_summary(lag_before, lag_after)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los endpoints de voz")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base de la API")
+    parser.add_argument("--endpoints", default="voice,dosis", help="voice (process-command), dosis")
+    parser.add_argument("--rps", default="10,25,50", help="Tasas objetivo a probar")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos por nivel")
+    parser.add_argument("--workers", type=int, default=200, help="Peticiones simultáneas máximas")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por petición")
+    parser.add_argument("--users", type=int, default=1000, help="Usuarios distintos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':>8} {'rps':>6} {'real':>6} {'p50':>7} {'p99':>7} {'errores':>8} {'lag p99':>8}")
+    print("-" * 60)
+
+    results = []
+    for endpoint in args.endpoints.split(","):
+        for rps in (float(level) for level in args.rps.split(",")):
+            result = run_level(args.url, endpoint, rps, args.duration, args.workers,
+                               args.timeout, args.users, args.seed)
+            results.append(result)
+            lag = result["server_event_loop_lag"]
+            print(f"{endpoint:>8} {rps:>6.0f} {result['achieved_rps']:>6.1f} "
+                  f"{result['latency_p50']:>7.3f} {result['latency_p99']:>7.3f} "
+                  f"{result['error_rate']:>8.1%} {lag['p99_le'] if lag else '-':>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "duration": args.duration, "results": results}, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Sustituto local del servidor de notificaciones Node.js para pruebas de carga
+
+Implementa POST /schedule-multiple-notifications con latencia y errores
+configurables, para que la API no dependa de https://midosis.onrender.com:
+
+    python benchmarks/node_stub.py --port 3001 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+    NODE_SERVER_URL=http://127.0.0.1:3001 python run_server.py
+
+GET /stats devuelve los contadores desde el arranque (o desde POST /stats/reset).
+"""
+import sys
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from api.dose_index import expand_schedule
+
+def create_app(latency_ms: float = 50.0,
+               jitter_ms: float = 0.0,
+               error_rate: float = 0.0,
+               hang_rate: float = 0.0,
+               hang_seconds: float = 30.0,
+               seed: int = 0) -> FastAPI:
+    """
+    Args:
+        latency_ms / jitter_ms: Latencia uniforme en latency ± jitter
+        error_rate: Fracción de respuestas 500
+        hang_rate: Fracción de peticiones que tardan hang_seconds (para timeouts)
+    """
+    app = FastAPI(title="Node stub")
+    rng = random.Random(seed)
+    stats = Counter()
+
+    def count_doses(medication: dict) -> int:
+        """Tomas entre fechaInicio y fechaFin, como las programaría Node"""
+        record = {
+            "medicamento_id": medication.get("medicamentoId"),
+            "nombre": medication.get("nombre"),
+            "frecuencia": medication.get("frecuencia"),
+            "hora": medication.get("hora"),
+            "fecha_inicio": medication.get("fechaInicio"),
+            "fecha_fin": medication.get("fechaFin")
+        }
+        start = datetime.fromisoformat(medication.get("fechaInicio") or datetime.now().isoformat())
+        end = datetime.fromisoformat(medication.get("fechaFin") or start.isoformat())
+        return len(expand_schedule(record, start, end))
+
+    @app.post("/schedule-multiple-notifications")
+    async def schedule(request: Request):
+        medication = await request.json()
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < hang_rate:
+            stats["hangs"] += 1
+            await asyncio.sleep(hang_seconds)
+        else:
+            delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+            await asyncio.sleep(delay)
+
+        if roll >= hang_rate and roll < hang_rate + error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"success": False, "error": "Error inyectado"})
+
+        stats["ok"] += 1
+        return {"success": True, "programadas": count_doses(medication)}
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        stats.clear()
+        return {"success": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustituto local del servidor Node.js")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia media por petición")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variación uniforme de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fracción de peticiones colgadas")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="Duración de una petición colgada")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate,
+                     args.hang_rate, args.hang_seconds, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Benchmark de MedicationParser: precisión/recall por slot y velocidad
+
+Genera variaciones etiquetadas con CommandVariationGenerator, las pasa por
+extract_info (una a una) y extract_info_batch, comprueba que ambos caminos
+coinciden y reporta precisión y recall por slot, análisis por segundo y por
+qué vía se resolvió el medicamento (lista de comunes, spaCy o regex).
+
+Uso:
+    python benchmarks/parser_benchmark.py --count 20000
+    python benchmarks/parser_benchmark.py --count 50000 --output parser_bench.json
+"""
+import re
+import json
+import time
+import random
+import argparse
+import itertools
+import unicodedata
+import importlib.util
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+PARSER_MODULE = ROOT_DIR / "nlp" / "medication_parser.py"
+GENERATOR_MODULE = ROOT_DIR / "nlp" / "command_variation_generator.py"
+
+SLOTS = ["action", "medication", "dosage", "time", "frequency", "duration", "is_dosis_command"]
+
+BASE_MEDICATIONS = [
+    ("paracetamol", "500 mg"), ("ibuprofeno", "400 mg"), ("omeprazol", "20 mg"),
+    ("aspirina", "100 mg"), ("amoxicilina", "500 mg")
+]
+BASE_TIMES = ["a las 8 de la mañana", "a las 3 de la tarde", "a las 9 de la noche"]
+BASE_FREQUENCIES = ["cada 8 horas", "cada 12 horas", "cada 24 horas", "cada 7 días"]
+BASE_DURATIONS = ["por 7 días", "por 2 semanas", "por 3 meses"]
+
+UNIT_ALIASES = {"miligramos": "mg", "mililitros": "ml", "gramos": "g"}
+
+def load_module(name: str, path: Path):
+    """Cargar por ruta: nlp/__init__.py usa un import relativo fuera del paquete"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def base_commands() -> List[str]:
+    return [
+        f"Mi Dosis agregar {med} de {dosage} {hour} {freq} {duration}"
+        for (med, dosage), hour, freq, duration in itertools.product(
+            BASE_MEDICATIONS, BASE_TIMES, BASE_FREQUENCIES, BASE_DURATIONS
+        )
+    ]
+
+def generate_dataset(generator, count: int, seed: int) -> List[Dict[str, Any]]:
+    """count variaciones etiquetadas repartidas entre todos los comandos base"""
+    rng = random.Random(seed)
+    bases = base_commands()
+    per_base, extra = divmod(count, len(bases))
+    dataset = []
+    for i, base in enumerate(bases):
+        dataset.extend(generator.generate_labeled_variations(base, per_base + (i < extra), rng))
+    rng.shuffle(dataset)
+    return dataset
+
+def normalize(slot: str, value: Any) -> Any:
+    """Comparar sin mayúsculas, tildes, espacios ni plurales de unidades"""
+    if value is None or isinstance(value, bool):
+        return value
+    text = unicodedata.normalize("NFKD", str(value).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    if slot in ("dosage", "duration"):
+        match = re.match(r"(\d+)\s*([a-z]+)", text)
+        if match:
+            unit = UNIT_ALIASES.get(match.group(2), match.group(2)).rstrip("s")
+            return f"{match.group(1)} {unit}"
+    return " ".join(text.split())
+
+def score(dataset: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Precisión y recall por slot
+
+    Un valor predicho correcto es TP; uno incorrecto cuenta como FP y FN;
+    un slot esperado sin predicción es FN. Para is_dosis_command, "presente"
+    significa True.
+    """
+    report = {}
+    for slot in SLOTS:
+        tp = fp = fn = 0
+        for item, result in zip(dataset, results):
+            expected = normalize(slot, item["labels"].get(slot))
+            predicted = normalize(slot, result.get(slot))
+            if not predicted:
+                fn += bool(expected)
+            elif predicted == expected:
+                tp += 1
+            else:
+                fp += 1
+                fn += bool(expected)
+        report[slot] = {
+            "precision": tp / (tp + fp) if tp + fp else None,
+            "recall": tp / (tp + fn) if tp + fn else None,
+            "tp": tp, "fp": fp, "fn": fn
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de MedicationParser")
+    parser.add_argument("--count", type=int, default=20000, help="Variaciones etiquetadas")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del muestreo")
+    parser.add_argument("--batch-size", type=int, default=256, help="Lote de nlp.pipe")
+    parser.add_argument("--errors", type=int, default=10, help="Ejemplos de error por slot en el JSON")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    generator = load_module("command_variation_generator", GENERATOR_MODULE).CommandVariationGenerator()
+    medication_parser = load_module("medication_parser", PARSER_MODULE).parser
+
+    dataset = generate_dataset(generator, args.count, args.seed)
+    texts = [item["text"] for item in dataset]
+    print(f"Variaciones etiquetadas: {len(dataset)} (spaCy: {'sí' if medication_parser.nlp else 'no'})")
+
+    medication_parser.path_counts.clear()
+    start = time.perf_counter()
+    single = [medication_parser.extract_info(text) for text in texts]
+    single_time = time.perf_counter() - start
+    paths = dict(medication_parser.path_counts)
+
+    start = time.perf_counter()
+    batch = medication_parser.extract_info_batch(texts, batch_size=args.batch_size)
+    batch_time = time.perf_counter() - start
+    mismatches = sum(1 for a, b in zip(single, batch) if a != b)
+
+    report = score(dataset, single)
+
+    print(f"\nextract_info:       {len(texts) / single_time:>10.0f} análisis/s")
+    print(f"extract_info_batch: {len(texts) / batch_time:>10.0f} análisis/s")
+    print(f"Diferencias entre ambos caminos: {mismatches}")
+    print("Vía del medicamento: " + ", ".join(
+        f"{path} {count / len(texts):.1%}" for path, count in sorted(paths.items())
+    ))
+
+    print(f"\n{'slot':>18} {'precisión':>10} {'recall':>8}")
+    print("-" * 40)
+    for slot, values in report.items():
+        precision = "-" if values["precision"] is None else f"{values['precision']:.1%}"
+        recall = "-" if values["recall"] is None else f"{values['recall']:.1%}"
+        print(f"{slot:>18} {precision:>10} {recall:>8}")
+
+    errors = {
+        slot: [
+            {"text": item["text"], "expected": item["labels"].get(slot), "predicted": result.get(slot)}
+            for item, result in zip(dataset, single)
+            if normalize(slot, item["labels"].get(slot)) != normalize(slot, result.get(slot))
+        ][:args.errors]
+        for slot in SLOTS
+    }
+
+    if args.output:
+        results = {
+            "count": len(texts),
+            "seed": args.seed,
+            "spacy_available": medication_parser.nlp is not None,
+            "single": {"seconds": single_time, "parses_per_second": len(texts) / single_time},
+            "batch": {"seconds": batch_time, "parses_per_second": len(texts) / batch_time,
+                      "batch_size": args.batch_size, "mismatches": mismatches},
+            "medication_path": paths,
+            "slots": report,
+            "error_examples": errors
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
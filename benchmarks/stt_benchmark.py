@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""
+Benchmark de WhisperSTTService: latencia, RTF, throughput, memoria y WER
+
+El corpus es un directorio con manifest.jsonl ({"audio": "x.wav", "text": "..."}
+por línea, rutas relativas al directorio). Con --synthesize se genera con el TTS
+del proyecto a partir de comandos de medicamentos en español (texto de
+referencia = texto sintetizado). Cada tamaño de modelo corre en un subproceso
+propio para que el pico de RSS sea el de ese modelo.
+
+Uso:
+    python benchmarks/stt_benchmark.py --synthesize --corpus bench_corpus
+    python benchmarks/stt_benchmark.py --corpus grabaciones --models tiny,base,small \\
+        --concurrency 1,2,4,8 --output stt_bench.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+CORPUS_COMMANDS = [
+    "Agregar paracetamol de quinientos miligramos a las ocho de la mañana",
+    "Mi dosis agrégame ibuprofeno cuatrocientos miligramos cada ocho horas por siete días",
+    "Programar omeprazol veinte miligramos antes del desayuno",
+    "Recuérdame tomar metformina con la cena",
+    "Eliminar aspirina de mis medicamentos",
+    "Muéstrame mis medicamentos",
+    "Qué medicamentos tengo que tomar hoy",
+    "Dosis necesito losartán cincuenta miligramos cada doce horas por dos semanas",
+    "Ya tomé la pastilla de la presión",
+    "Añadir amoxicilina quinientos miligramos cada ocho horas por diez días"
+]
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+# ========== CORPUS ==========
+def synthesize_corpus(corpus_dir: Path) -> int:
+    """Generar WAVs con el TTS del proyecto y escribir manifest.jsonl"""
+    from tts.tts_service import text_to_speech
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for i, text in enumerate(CORPUS_COMMANDS):
+        name = f"cmd_{i:02d}.wav"
+        if not (corpus_dir / name).exists() and not text_to_speech(text, str(corpus_dir / name), "wav"):
+            print(f"⚠️  No se pudo sintetizar: {text}")
+            continue
+        entries.append({"audio": name, "text": text})
+
+    with open(corpus_dir / "manifest.jsonl", "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return len(entries)
+
+def load_corpus(corpus_dir: Path) -> List[Dict]:
+    """Entradas del manifiesto con el audio ya en base64 y su duración"""
+    import soundfile as sf
+
+    entries = []
+    with open(corpus_dir / "manifest.jsonl", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = corpus_dir / entry["audio"]
+            entries.append({
+                "audio": entry["audio"],
+                "text": entry["text"],
+                "duration": sf.info(str(path)).duration,
+                "base64": base64.b64encode(path.read_bytes()).decode("ascii")
+            })
+    return entries
+
+# ========== MÉTRICAS ==========
+def normalize_words(text: str) -> List[str]:
+    """Minúsculas, sin tildes ni puntuación: solo cuentan errores de palabra"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return PUNCTUATION_RE.sub(" ", text).split()
+
+def word_errors(reference: List[str], hypothesis: List[str]) -> int:
+    """Distancia de Levenshtein por palabras (sustituciones + borrados + inserciones)"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1]
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil con interpolación lineal"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso (ru_maxrss: KiB en Linux, bytes en macOS)"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+# ========== WORKER (un modelo por proceso) ==========
+async def run_concurrency(service, corpus: List[Dict], concurrency: int, requests: int) -> Dict:
+    """Lanzar requests transcripciones con como mucho concurrency en vuelo"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(entry):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await service.transcribe_base64(entry["base64"], language="es")
+            latencies.append(time.perf_counter() - start)
+            failures += not result.success
+
+    batch = [corpus[i % len(corpus)] for i in range(requests)]
+    start = time.perf_counter()
+    await asyncio.gather(*(one(entry) for entry in batch))
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "failures": failures,
+        "wall_time": wall,
+        "requests_per_second": requests / wall,
+        "audio_seconds_per_second": sum(entry["duration"] for entry in batch) / wall,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99)
+    }
+
+async def run_worker_async(model: str, corpus_dir: Path, repeats: int, concurrency: List[int]) -> Dict:
+    from stt.whisper_service import WhisperSTTService
+
+    rss_before = peak_rss_mb()
+    load_start = time.perf_counter()
+    service = WhisperSTTService(default_model=model)
+    load_time = time.perf_counter() - load_start
+    rss_model = peak_rss_mb()
+
+    corpus = load_corpus(corpus_dir)
+
+    # Calentamiento fuera de la medición
+    await service.transcribe_base64(corpus[0]["base64"], language="es")
+
+    # Latencia secuencial, RTF y WER
+    latencies, rtfs, samples = [], [], []
+    total_errors = total_words = 0
+    for _ in range(repeats):
+        for entry in corpus:
+            start = time.perf_counter()
+            result = await service.transcribe_base64(entry["base64"], language="es")
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            rtfs.append(elapsed / entry["duration"] if entry["duration"] else 0.0)
+
+            reference = normalize_words(entry["text"])
+            errors = word_errors(reference, normalize_words(result.text))
+            total_errors += errors
+            total_words += len(reference)
+            samples.append({
+                "audio": entry["audio"],
+                "latency": elapsed,
+                "wer": errors / len(reference) if reference else 0.0,
+                "hypothesis": result.text,
+                "error": result.error
+            })
+
+    throughput = [
+        await run_concurrency(service, corpus, level, max(len(corpus), level * 4))
+        for level in concurrency
+    ]
+
+    return {
+        "model": model,
+        "device": service.device,
+        "load_time": load_time,
+        "rss_before_model_mb": rss_before,
+        "rss_after_load_mb": rss_model,
+        "peak_rss_mb": peak_rss_mb(),
+        "utterances": len(corpus),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "rtf_mean": sum(rtfs) / len(rtfs),
+        "rtf_p95": percentile(rtfs, 95),
+        "wer": total_errors / total_words if total_words else None,
+        "throughput": throughput,
+        "samples": samples
+    }
+
+def run_model(model: str, corpus_dir: Path, repeats: int, concurrency: List[int]) -> Dict:
+    """Medir un tamaño de modelo en un subproceso limpio"""
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", "--models", model, "--corpus", str(corpus_dir),
+         "--repeats", str(repeats), "--concurrency", ",".join(map(str, concurrency))],
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        return {"model": model, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    # La última línea de stdout es el resultado JSON
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def environment() -> Dict:
+    """Contexto para comparar ejecuciones entre máquinas y commits"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de Whisper STT")
+    parser.add_argument("--corpus", default="bench_corpus", help="Directorio con manifest.jsonl")
+    parser.add_argument("--synthesize", action="store_true", help="Generar el corpus con el TTS")
+    parser.add_argument("--models", default="tiny,base", help="Tamaños de modelo a probar")
+    parser.add_argument("--repeats", type=int, default=3, help="Pasadas secuenciales por el corpus")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Niveles de concurrencia")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.corpus)
+    concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    if args.worker:
+        result = asyncio.run(run_worker_async(args.models, corpus_dir, args.repeats, concurrency))
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    if args.synthesize:
+        print(f"Sintetizadas {synthesize_corpus(corpus_dir)} frases en {corpus_dir}")
+    if not (corpus_dir / "manifest.jsonl").exists():
+        parser.error(f"No existe {corpus_dir / 'manifest.jsonl'} (usa --synthesize)")
+
+    print(f"{'modelo':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'RTF':>6} {'WER':>6} {'RSS MB':>8}")
+    print("-" * 56)
+
+    results = []
+    for model in args.models.split(","):
+        result = run_model(model, corpus_dir, args.repeats, concurrency)
+        results.append(result)
+
+        if "error" in result:
+            print(f"{model:>8}  ERROR {result['error']}")
+            continue
+        print(f"{model:>8} {result['latency_p50']:>7.3f} {result['latency_p95']:>7.3f} "
+              f"{result['latency_p99']:>7.3f} {result['rtf_mean']:>6.3f} {result['wer']:>6.1%} "
+              f"{result['peak_rss_mb']:>8.0f}")
+        for level in result["throughput"]:
+            print(f"{'':>8}   concurrencia {level['concurrency']:>2}: "
+                  f"{level['requests_per_second']:.2f} req/s, p95 {level['latency_p95']:.3f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark de Coqui TTS: factor de tiempo real (RTF) por configuración de inferencia
+
+Cada configuración corre en un subproceso propio porque los hilos inter-op de
+torch solo pueden fijarse una vez por proceso.
+
+Uso:
+    python benchmarks/tts_benchmark.py --threads 1,2,4 --vocoder none,trace,compile
+    python benchmarks/tts_benchmark.py --output tts_bench.json
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import itertools
+import subprocess
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+BENCH_PHRASES = [
+    "Es hora de tomar tu medicamento.",
+    "Paracetamol de quinientos miligramos cada ocho horas por siete días.",
+    "Tu próximo recordatorio es omeprazol de veinte miligramos a las ocho de la mañana antes del desayuno."
+]
+
+def wav_duration(path: str) -> float:
+    """Duración en segundos de un archivo WAV"""
+    with wave.open(path, "rb") as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+def run_worker(repeats: int) -> dict:
+    """Medir RTF con la configuración recibida por variables de entorno"""
+    from tts.tts_service import CoquiTTS
+
+    engine = CoquiTTS()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Primera síntesis fuera de la medición (calentamiento)
+        engine.synthesize(BENCH_PHRASES[0], os.path.join(tmp_dir, "warmup.wav"))
+
+        for i, phrase in enumerate(BENCH_PHRASES):
+            for r in range(repeats):
+                path = os.path.join(tmp_dir, f"bench_{i}_{r}.wav")
+                start = time.perf_counter()
+                engine.synthesize(phrase, path)
+                elapsed = time.perf_counter() - start
+                duration = wav_duration(path)
+                results.append({
+                    "chars": len(phrase),
+                    "synthesis_time": elapsed,
+                    "audio_duration": duration,
+                    "rtf": elapsed / duration if duration else None
+                })
+
+    rtfs = sorted(r["rtf"] for r in results if r["rtf"] is not None)
+    return {
+        "tuning": engine.tuning,
+        "startup_timings": engine.startup_timings,
+        "samples": len(results),
+        "rtf_mean": sum(rtfs) / len(rtfs) if rtfs else None,
+        "rtf_p50": rtfs[len(rtfs) // 2] if rtfs else None,
+        "rtf_max": rtfs[-1] if rtfs else None
+    }
+
+def run_setting(threads: int, interop: int, inference_mode: str, vocoder: str, repeats: int) -> dict:
+    """Lanzar un subproceso con una configuración concreta"""
+    env = dict(os.environ)
+    env.update({
+        "TTS_TORCH_THREADS": str(threads),
+        "TTS_TORCH_INTEROP_THREADS": str(interop),
+        "TTS_INFERENCE_MODE": inference_mode,
+        "TTS_VOCODER_OPTIMIZATION": vocoder
+    })
+
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", "--repeats", str(repeats)],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    setting = {
+        "threads": threads,
+        "interop_threads": interop,
+        "inference_mode": inference_mode == "1",
+        "vocoder": vocoder
+    }
+
+    if proc.returncode != 0:
+        return {"setting": setting, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    # La última línea de stdout es el resultado JSON
+    return {"setting": setting, **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RTF de Coqui TTS")
+    parser.add_argument("--threads", default="1,2,4", help="Hilos intra-op a probar")
+    parser.add_argument("--interop", default="1", help="Hilos inter-op a probar")
+    parser.add_argument("--inference-mode", default="0,1", help="torch.inference_mode (0/1)")
+    parser.add_argument("--vocoder", default="none,trace,compile", help="Optimización del vocoder")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones por frase")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeats)))
+        return
+
+    matrix = itertools.product(
+        [int(t) for t in args.threads.split(",")],
+        [int(t) for t in args.interop.split(",")],
+        args.inference_mode.split(","),
+        args.vocoder.split(",")
+    )
+
+    print(f"{'threads':>7} {'interop':>7} {'inf_mode':>8} {'vocoder':>8} {'RTF medio':>10} {'RTF p50':>8}")
+    print("-" * 56)
+
+    results = []
+    for threads, interop, inference_mode, vocoder in matrix:
+        result = run_setting(threads, interop, inference_mode, vocoder, args.repeats)
+        results.append(result)
+
+        if "error" in result:
+            print(f"{threads:>7} {interop:>7} {inference_mode:>8} {vocoder:>8}  ERROR {result['error']}")
+        else:
+            print(f"{threads:>7} {interop:>7} {inference_mode:>8} {result['tuning']['vocoder_optimization']:>8} "
+                  f"{result['rtf_mean']:>10.3f} {result['rtf_p50']:>8.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Utilidades compartidas por los servicios (API, STT y acciones)
+"""
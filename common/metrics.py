@@ -0,0 +1,444 @@
+"""
+Métricas en proceso con exposición en formato de texto de Prometheus
+
+Registro mínimo sin dependencias: contadores, gauges e histogramas con
+etiquetas. Para el camino caliente, labels() devuelve un hijo ya resuelto
+(se puede guardar en una constante de módulo) y observe() es una búsqueda
+binaria en los buckets y dos sumas bajo un lock propio del hijo.
+
+Con varios workers (gunicorn) cada proceso tiene su propio registro. Si
+METRICS_MULTIPROC_DIR está definido, cada worker vuelca su estado a
+<dir>/metrics_<pid>.json cada METRICS_FLUSH_INTERVAL segundos y /metrics
+suma los archivos de todos: contadores e histogramas agregados, gauges con
+una etiqueta pid por proceso. Los archivos de workers muertos conservan sus
+contadores (los totales no retroceden) y pierden los gauges.
+"""
+import os
+import glob
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from common.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Starlette agrega "; charset=utf-8" a los tipos text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Buckets en segundos: de sub-milisegundo (SQLite, parser) a decenas de segundos (Whisper)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Hijo para una combinación de etiquetas (crear una vez, reutilizar)"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera etiquetas {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+    def _values(self) -> Iterator[Tuple[Tuple[str, ...], object]]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, object]:
+        """Estado serializable a JSON (para agregar entre procesos)"""
+        return {
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(key), value] for key, value in self._values()]
+        }
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """Valor monótono creciente"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self.labels(*labels).inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames, key), child.value
+
+    def _values(self):
+        for key, child in list(self._children.items()):
+            yield key, child.value
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Calcular el valor al exportar (sin coste en el camino caliente)"""
+        self.function = function
+
+    def get(self) -> float:
+        return float(self.function()) if self.function is not None else self.value
+
+class Gauge(_Metric):
+    """Valor que sube y baja (o se calcula al exportar)"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float, *labels: str):
+        self.labels(*labels).set(value)
+
+    def _values(self):
+        for key, child in list(self._children.items()):
+            try:
+                yield key, child.get()
+            except Exception:
+                continue
+
+    def _samples(self):
+        for key, value in self._values():
+            yield "", _format_labels(self.labelnames, key), value
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # último = +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """Distribución acumulada por buckets (le = límite superior)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float, *labels: str):
+        self.labels(*labels).observe(value)
+
+    def _values(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                yield key, {"counts": list(child.counts), "sum": child.sum}
+
+    def _samples(self):
+        return _histogram_samples(self.labelnames, self.upper_bounds, self._values())
+
+    def snapshot(self):
+        data = super().snapshot()
+        data["buckets"] = list(self.upper_bounds)
+        return data
+
+def _histogram_samples(labelnames: Sequence[str], upper_bounds: Sequence[float], values) -> Iterator:
+    for key, value in values:
+        cumulative = 0
+        for bound, count in zip(tuple(upper_bounds) + (float("inf"),), value["counts"]):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            yield "_bucket", _format_labels(labelnames, key, le), cumulative
+        yield "_sum", _format_labels(labelnames, key), value["sum"]
+        yield "_count", _format_labels(labelnames, key), cumulative
+
+class Registry:
+    """Conjunto de métricas de un proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # reimportar un módulo no duplica métricas
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Exposición completa en formato de texto de Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+# Registro global del proceso
+REGISTRY = Registry()
+
+# ========== MULTIPROCESO ==========
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f"metrics_{pid}.json")
+
+def _write_snapshot(path: str, data: Dict[str, Dict[str, object]]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)  # quien lee nunca ve un archivo a medias
+
+def write_process_snapshot():
+    """Volcar el registro de este proceso a METRICS_MULTIPROC_DIR"""
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    _write_snapshot(_snapshot_path(os.getpid()), REGISTRY.snapshot())
+
+def mark_process_dead(pid: int):
+    """Worker terminado: quitar sus gauges y conservar contadores e histogramas"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = _snapshot_path(pid)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    _write_snapshot(path, {name: metric for name, metric in data.items() if metric["kind"] != "gauge"})
+
+def clear_multiprocess_dir():
+    """Borrar volcados de una ejecución anterior (al arrancar el maestro)"""
+    if METRICS_MULTIPROC_DIR:
+        for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "metrics_*.json*")):
+            os.unlink(path)
+
+_writer_pid: Optional[int] = None
+_writer_lock = threading.Lock()
+
+def start_multiprocess_writer(interval: float = METRICS_FLUSH_INTERVAL):
+    """Hilo que vuelca el registro periódicamente (uno por proceso; no-op sin METRICS_MULTIPROC_DIR)"""
+    global _writer_pid
+    if not METRICS_MULTIPROC_DIR:
+        return
+    with _writer_lock:
+        if _writer_pid == os.getpid():
+            return
+        _writer_pid = os.getpid()
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_process_snapshot()
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudieron volcar las métricas: {e}")
+
+    threading.Thread(target=loop, name="metrics-writer", daemon=True).start()
+
+def _merge_snapshots(paths: List[str]) -> Dict[str, Dict[str, object]]:
+    merged: Dict[str, Dict[str, object]] = {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # archivo de un worker que aún no escribió
+        pid = os.path.basename(path)[len("metrics_"):-len(".json")]
+
+        for name, metric in data.items():
+            target = merged.setdefault(name, {
+                "kind": metric["kind"],
+                "documentation": metric["documentation"],
+                "labelnames": metric["labelnames"] + (["pid"] if metric["kind"] == "gauge" else []),
+                "buckets": metric.get("buckets"),
+                "values": {}
+            })
+            values = target["values"]
+            for key, value in metric["values"]:
+                if metric["kind"] == "gauge":
+                    values[tuple(key) + (pid,)] = value
+                elif metric["kind"] == "histogram":
+                    current = values.setdefault(tuple(key), {"counts": [0] * len(value["counts"]), "sum": 0.0})
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+                else:
+                    values[tuple(key)] = values.get(tuple(key), 0.0) + value
+    return merged
+
+def render_multiprocess() -> str:
+    """Exposición sumando los volcados de todos los workers (incluido este, recién volcado)"""
+    write_process_snapshot()
+    merged = _merge_snapshots(sorted(glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "metrics_*.json"))))
+
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric["labelnames"]
+        if metric["kind"] == "histogram":
+            samples = _histogram_samples(labelnames, metric["buckets"], metric["values"].items())
+        else:
+            samples = (("", _format_labels(labelnames, key), value) for key, value in metric["values"].items())
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# ========== MÉTRICAS COMUNES ==========
+STAGE_SECONDS = REGISTRY.histogram(
+    "midosis_stage_duration_seconds",
+    "Duración de cada etapa (decode, whisper_inference, audio_quality, parse, node_call, db_query, tts_synthesis, tts_encode)",
+    ["stage"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "midosis_http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta y código",
+    ["method", "route", "status"]
+)
+CACHE_EVENTS = REGISTRY.counter(
+    "midosis_cache_events_total",
+    "Aciertos y fallos de las cachés en proceso",
+    ["cache", "result"]
+)
+NODE_REQUESTS = REGISTRY.counter(
+    "midosis_node_requests_total",
+    "Llamadas al servidor de notificaciones Node.js por resultado",
+    ["outcome"]
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "midosis_event_loop_lag_seconds",
+    "Retraso del event loop al despertar de un sleep (código que bloquea el loop)",
+    buckets=LOOP_LAG_BUCKETS
+)
+
+_stage_children: Dict[str, _HistogramChild] = {}
+
+def stage(name: str) -> _HistogramChild:
+    """Histograma ya resuelto de una etapa"""
+    child = _stage_children.get(name)
+    if child is None:
+        child = _stage_children[name] = STAGE_SECONDS.labels(name)
+    return child
+
+@contextmanager
+def time_stage(name: str):
+    """Medir un bloque: with time_stage("parse"): ... (y abrir un span si hay traza activa)"""
+    child = stage(name)
+    start = time.perf_counter()
+    with span(name):
+        try:
+            yield
+        finally:
+            child.observe(time.perf_counter() - start)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc()
+
+def route_template(request) -> str:
+    """Plantilla de la ruta (/api/user/{user_id}/...) para no explotar la cardinalidad"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Tarea de fondo: cuánto tarda el loop en despertar de sleep(interval) respecto a lo pedido"""
+    loop = asyncio.get_running_loop()
+    lag = EVENT_LOOP_LAG_SECONDS.labels()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, loop.time() - start - interval))
+
+def render_metrics() -> str:
+    if METRICS_MULTIPROC_DIR:
+        return render_multiprocess()
+    return REGISTRY.render()
@@ -0,0 +1,199 @@
+"""
+Caché local y versionada de artefactos de modelos (Whisper, Coqui, spaCy)
+
+prefetch_models.py descarga todo en MODEL_CACHE_DIR/MODEL_CACHE_VERSION y
+escribe manifest.json con el SHA-256 y tamaño de cada archivo. Los servicios
+cargan desde ahí cuando el artefacto está registrado; con MIDOSIS_OFFLINE=1
+nunca descargan y fallan con ModelCacheError si falta algo.
+
+    models_cache/v1/
+        manifest.json
+        whisper/base.pt
+        coqui/tts/tts_models--es--css10--vits/...
+        spacy/es_core_news_sm/...
+
+Cambiar MODEL_CACHE_VERSION (p. ej. al actualizar modelos) crea un
+directorio nuevo en vez de mezclar pesos viejos y nuevos.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+MODEL_CACHE_DIR = Path(os.getenv("MODEL_CACHE_DIR", str(ROOT_DIR / "models_cache")))
+MODEL_CACHE_VERSION = os.getenv("MODEL_CACHE_VERSION", "v1")
+OFFLINE_MODE = os.getenv("MIDOSIS_OFFLINE", "0") == "1"
+# 1 = SHA-256 completo al cargar (lento con modelos grandes); 0 = solo tamaño
+MODEL_CACHE_VERIFY = os.getenv("MODEL_CACHE_VERIFY", "0") == "1"
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "es_core_news_sm")
+# Modelos Whisper a descargar por adelantado (el servicio usa "base" por defecto)
+WHISPER_MODELS = [name for name in os.getenv("WHISPER_MODELS", "base").split(",") if name]
+
+HASH_CHUNK = 1 << 20
+
+class ModelCacheError(RuntimeError):
+    """Artefacto ausente o corrupto en la caché (o descarga prohibida en modo offline)"""
+
+def cache_root() -> Path:
+    return MODEL_CACHE_DIR / MODEL_CACHE_VERSION
+
+def kind_dir(kind: str) -> Path:
+    """Directorio de descarga de un tipo de artefacto (whisper, coqui, spacy)"""
+    return cache_root() / kind
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_tree(path: Path) -> Dict[str, Dict[str, Any]]:
+    """SHA-256 y tamaño de un archivo o de todos los archivos bajo un directorio"""
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    root = cache_root()
+    return {
+        str(file.relative_to(root)): {"sha256": sha256_file(file), "size": file.stat().st_size}
+        for file in files
+    }
+
+def configure_offline():
+    """Cortar las descargas de librerías que las hacen por su cuenta (Hugging Face)"""
+    if OFFLINE_MODE:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+class ModelCache:
+    """Manifiesto de artefactos descargados y su verificación"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or cache_root()
+        self.manifest_path = self.root / "manifest.json"
+        self._lock = threading.Lock()
+        self._verified = set()
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"version": MODEL_CACHE_VERSION, "artifacts": {}}
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise ModelCacheError(f"Manifiesto de modelos ilegible ({self.manifest_path}): {e}")
+
+    def _write_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def artifacts(self) -> Dict[str, Dict[str, Any]]:
+        return self._manifest["artifacts"]
+
+    def record(self, kind: str, name: str, paths: Dict[str, Path],
+               source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Registrar un artefacto descargado
+
+        Args:
+            kind: whisper, coqui o spacy
+            name: Nombre del modelo (base, tts_models/es/css10/vits...)
+            paths: Rutas con nombre ("model", "config", "vocoder"...) dentro de la caché
+            source: URL o paquete de origen, informativo
+        """
+        files = {}
+        for path in paths.values():
+            files.update(hash_tree(Path(path)))
+
+        entry = {
+            "kind": kind,
+            "name": name,
+            "paths": {role: str(Path(path).relative_to(self.root)) for role, path in paths.items()},
+            "files": files,
+            "bytes": sum(info["size"] for info in files.values()),
+            "source": source,
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }
+        with self._lock:
+            self.artifacts[f"{kind}:{name}"] = entry
+            self._write_manifest()
+        logger.info(f"📦 {kind}:{name} en caché ({entry['bytes'] / 1e6:.1f} MB, {len(files)} archivos)")
+        return entry
+
+    def verify(self, kind: str, name: str, full: bool = True) -> Dict[str, Any]:
+        """
+        Comprobar que los archivos del artefacto coinciden con el manifiesto
+
+        Args:
+            full: SHA-256 de cada archivo; si es False solo existencia y tamaño
+
+        Raises:
+            ModelCacheError: Artefacto no registrado, archivo ausente o distinto
+        """
+        entry = self.artifacts.get(f"{kind}:{name}")
+        if entry is None:
+            raise ModelCacheError(f"{kind}:{name} no está en la caché {self.root}")
+
+        for relative, expected in entry["files"].items():
+            file = self.root / relative
+            if not file.is_file():
+                raise ModelCacheError(f"{kind}:{name}: falta {relative}")
+            if file.stat().st_size != expected["size"]:
+                raise ModelCacheError(f"{kind}:{name}: tamaño distinto en {relative}")
+            if full and sha256_file(file) != expected["sha256"]:
+                raise ModelCacheError(f"{kind}:{name}: checksum distinto en {relative}")
+        return entry
+
+    def resolve(self, kind: str, name: str) -> Optional[Dict[str, Path]]:
+        """
+        Rutas locales del artefacto, verificadas una vez por proceso
+
+        Returns:
+            Rutas por rol, o None si no está en caché y se permite descargar
+
+        Raises:
+            ModelCacheError: Corrupto, o ausente en modo offline
+        """
+        key = f"{kind}:{name}"
+        if key not in self.artifacts:
+            if OFFLINE_MODE:
+                raise ModelCacheError(
+                    f"MIDOSIS_OFFLINE=1 y {key} no está en {self.root}; ejecuta prefetch_models.py"
+                )
+            return None
+
+        with self._lock:
+            if key not in self._verified:
+                entry = self.verify(kind, name, full=MODEL_CACHE_VERIFY)
+                self._verified.add(key)
+            else:
+                entry = self.artifacts[key]
+        return {role: self.root / relative for role, relative in entry["paths"].items()}
+
+    def find(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        """Artefactos registrados de un tipo, por nombre"""
+        return {entry["name"]: entry for entry in self.artifacts.values() if entry["kind"] == kind}
+
+# Instancia global
+_cache: Optional[ModelCache] = None
+_cache_lock = threading.Lock()
+
+def get_model_cache() -> ModelCache:
+    """Caché de modelos de la versión configurada"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                configure_offline()
+                _cache = ModelCache()
+    return _cache
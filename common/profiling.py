@@ -0,0 +1,241 @@
+"""
+Perfilado bajo demanda para los workers de producción
+
+Dos herramientas, ambas desactivadas (sin coste) mientras no se pidan:
+
+* Perfil por muestreo del proceso completo: POST /admin/profile?seconds=N
+  recorre sys._current_frames() cada intervalo durante N segundos y
+  devuelve pilas plegadas ("hilo;modulo:funcion;... muestras"), el
+  formato de entrada de flamegraph.pl, speedscope e inferno.
+* cProfile de una petición: con la cabecera X-Profile: 1 la petición se
+  ejecuta bajo cProfile y se guardan <id>.pstats y <id>.folded en
+  PROFILE_DIR; la respuesta indica el id en X-Profile-Id.
+
+Solo funciona con PROFILING_TOKEN definido y enviado en X-Admin-Token.
+"""
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import asyncio
+import logging
+import secrets
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+def _authorized(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and secrets.compare_digest(token, PROFILING_TOKEN)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", Path(code.co_filename).stem)
+    return f"{module}:{code.co_name}"
+
+# ========== MUESTREO ==========
+class SamplingProfiler:
+    """Muestrea las pilas de todos los hilos del proceso (uno a la vez)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float = 0.005) -> Tuple[str, Dict[str, float]]:
+        """
+        Tomar muestras durante seconds
+
+        Returns:
+            (pilas plegadas, resumen con muestras e intervalo efectivo)
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Ya hay un perfil en curso")
+
+        try:
+            own_thread = threading.get_ident()
+            names = {}
+            stacks: Counter = Counter()
+            samples = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+
+            while time.perf_counter() < deadline:
+                for thread in threading.enumerate():
+                    names[thread.ident] = thread.name
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            elapsed = time.perf_counter() - start
+        finally:
+            self._lock.release()
+
+        folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return folded + "\n", {
+            "samples": samples,
+            "seconds": elapsed,
+            "effective_interval_ms": elapsed / samples * 1000 if samples else 0.0
+        }
+
+_sampler = SamplingProfiler()
+
+# ========== cPROFILE → PILAS PLEGADAS ==========
+def pstats_to_folded(stats: pstats.Stats, max_depth: int = 64) -> str:
+    """
+    Reconstruir pilas plegadas a partir de las aristas llamador→llamado de cProfile
+
+    cProfile no guarda pilas completas: el tiempo de cada función se reparte
+    entre sus llamadores en proporción al tiempo acumulado de cada arista
+    (la misma aproximación que usan flameprof y similares). Valores en µs.
+    """
+    raw = stats.stats
+    callees: Dict[tuple, List[Tuple[tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    def label(func) -> str:
+        filename, _, name = func
+        return f"{Path(filename).stem}:{name}" if filename != "~" else name
+
+    lines: Counter = Counter()
+
+    def walk(func, path: List[str], fraction: float, visiting: set):
+        own_time = raw[func][2]
+        path = path + [label(func)]
+        self_us = own_time * fraction * 1e6
+        if self_us >= 1:
+            lines[";".join(path)] += int(self_us)
+        if len(path) >= max_depth:
+            return
+        for child, edge_time in callees.get(func, []):
+            if child in visiting or child not in raw:
+                continue
+            child_total = raw[child][3]
+            if child_total <= 0:
+                continue
+            walk(child, path, fraction * edge_time / child_total, visiting | {child})
+
+    roots = [func for func, value in raw.items() if not value[4]]
+    for root in roots:
+        walk(root, [], 1.0, {root})
+
+    return "\n".join(f"{stack} {value}" for stack, value in lines.most_common()) + "\n"
+
+# ========== MIDDLEWARE POR PETICIÓN ==========
+class RequestProfilerMiddleware:
+    """
+    Middleware ASGI: con X-Profile: 1 y un token válido, ejecuta la petición bajo cProfile
+
+    cProfile solo ve el hilo del event loop: el trabajo enviado a
+    asyncio.to_thread (Whisper, Node) aparece como espera, y otras
+    peticiones concurrentes en el mismo loop también se cuelan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING_TOKEN:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        if headers.get(PROFILE_HEADER) != b"1" or not _authorized(
+                headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1") or None):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ])
+            await send(message)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            self._save(profiler, profile_id, scope)
+
+    def _save(self, profiler: cProfile.Profile, profile_id: str, scope):
+        try:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(PROFILE_DIR / f"{profile_id}.pstats")
+            stats = pstats.Stats(profiler)
+            (PROFILE_DIR / f"{profile_id}.folded").write_text(pstats_to_folded(stats), encoding="utf-8")
+            logger.info(f"🔬 Perfil de {scope['method']} {scope['path']} guardado: {profile_id}")
+        except Exception as e:
+            logger.error(f"No se pudo guardar el perfil {profile_id}: {e}")
+
+# ========== ENDPOINTS DE ADMINISTRACIÓN ==========
+def create_profiling_router() -> APIRouter:
+    """Rutas /admin/profile*; responden 404 si PROFILING_TOKEN no está definido"""
+    router = APIRouter(prefix="/admin", tags=["admin"])
+
+    def check(token: Optional[str]):
+        if not PROFILING_TOKEN:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if not _authorized(token):
+            raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+    @router.post("/profile", response_class=PlainTextResponse)
+    async def sample_profile(
+        seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+        interval_ms: float = Query(5.0, ge=1, le=1000),
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        """Perfil por muestreo del worker; devuelve pilas plegadas (flamegraph)"""
+        check(x_admin_token)
+        try:
+            folded, summary = await asyncio.to_thread(_sampler.sample, seconds, interval_ms / 1000)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return PlainTextResponse(folded, headers={
+            "X-Profile-Samples": str(summary["samples"]),
+            "X-Profile-Interval-Ms": f"{summary['effective_interval_ms']:.2f}"
+        })
+
+    @router.get("/profile/requests/{profile_id}")
+    async def request_profile(
+        profile_id: str,
+        format: str = Query("folded", pattern="^(folded|pstats)$"),
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        """Descargar el perfil de una petición (folded para flamegraph, pstats para snakeviz)"""
+        check(x_admin_token)
+        path = PROFILE_DIR / f"{Path(profile_id).name}.{format}"
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="Perfil no encontrado")
+        return FileResponse(path, filename=path.name)
+
+    return router
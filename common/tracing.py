@@ -0,0 +1,277 @@
+"""
+Trazas de extremo a extremo entre STT, API, acciones de Rasa y TTS
+
+El contexto viaja en la cabecera W3C traceparent (00-<trace_id>-<span_id>-01)
+entre servicios HTTP y en metadata["traceparent"] de los mensajes de Rasa.
+El cliente que encadena un turno de voz (STT -> API o Rasa) reenvía el
+traceparent que devuelve cada respuesta para que todo quede en una traza.
+Dentro de un proceso el span actual vive en un ContextVar, así que
+asyncio.to_thread y las tareas heredan la traza sin pasar argumentos.
+
+Exportación según TRACE_EXPORTER:
+    none       solo propagación (por defecto)
+    file       una línea JSON por span en TRACE_FILE
+    collector  lotes JSON por POST a TRACE_COLLECTOR_URL (hilo en segundo plano)
+"""
+import os
+import re
+import json
+import time
+import queue
+import logging
+import secrets
+import threading
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "100"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+
+TRACEPARENT_HEADER = "traceparent"
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_service_name = os.getenv("TRACE_SERVICE_NAME", "midosis")
+
+class Span:
+    """Intervalo de una traza; se exporta al cerrarse"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "service",
+                 "start_time", "_start", "duration_ms", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.service = _service_name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# ========== EXPORTADORES ==========
+class FileExporter:
+    """Una línea JSON por span (compatible con jq y con cargarlo en pandas)"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+class CollectorExporter:
+    """Envía lotes por HTTP desde un hilo para no tocar la latencia de las peticiones"""
+
+    def __init__(self, url: str, batch_size: int = TRACE_BATCH_SIZE,
+                 flush_interval: float = TRACE_FLUSH_INTERVAL):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            pass  # preferir perder spans a bloquear una petición
+
+    def _send(self, batch: List[Dict[str, Any]]):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"spans": batch}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"No se pudieron exportar {len(batch)} spans: {e}")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._send(batch)
+
+def _create_exporter():
+    if TRACE_EXPORTER == "file":
+        return FileExporter()
+    if TRACE_EXPORTER == "collector":
+        if not TRACE_COLLECTOR_URL:
+            logger.warning("TRACE_EXPORTER=collector sin TRACE_COLLECTOR_URL; no se exportan spans")
+            return None
+        return CollectorExporter(TRACE_COLLECTOR_URL)
+    return None
+
+_exporter = _create_exporter()
+
+# ========== API ==========
+def init_tracing(service: str):
+    """Nombre del servicio que firma los spans de este proceso"""
+    global _service_name
+    _service_name = os.getenv("TRACE_SERVICE_NAME", service)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id del padre) o None si la cabecera no es válida"""
+    if not value:
+        return None
+    match = TRACEPARENT_RE.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_request_id() -> Optional[str]:
+    """Id de correlación para logs: el trace_id de la petición en curso"""
+    active = _current_span.get()
+    return active.trace_id if active is not None else None
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Agregar traceparent y X-Request-ID de la traza actual a unas cabeceras salientes"""
+    headers = dict(headers or {})
+    active = _current_span.get()
+    if active is not None:
+        headers[TRACEPARENT_HEADER] = active.traceparent
+        headers[REQUEST_ID_HEADER] = active.trace_id
+    return headers
+
+def traceparent_from_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """traceparent enviado por el cliente en la metadata del mensaje de Rasa"""
+    if not metadata:
+        return None
+    return metadata.get(TRACEPARENT_HEADER)
+
+@contextmanager
+def span(name: str,
+         attributes: Optional[Dict[str, Any]] = None,
+         traceparent: Optional[str] = None,
+         root: bool = False) -> Iterator[Optional[Span]]:
+    """
+    Abrir un span hijo del actual
+
+    Args:
+        traceparent: Contexto remoto (cabecera o metadata) del que colgar el span
+        root: Empezar una traza nueva si no hay contexto; sin root y sin traza
+            activa no se crea nada (las etapas fuera de una petición no se trazan)
+    """
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif root:
+        trace_id, parent_id = secrets.token_hex(16), None
+    else:
+        yield None
+        return
+
+    new_span = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.set_attribute("error", repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end()
+        if _exporter is not None:
+            try:
+                _exporter.export(new_span)
+            except Exception as e:
+                logger.warning(f"Error exportando span {new_span.name}: {e}")
+
+class TraceMiddleware:
+    """
+    Middleware ASGI: continúa la traza de traceparent (o abre una nueva) por
+    petición y devuelve traceparent y X-Request-ID en la respuesta
+    """
+
+    def __init__(self, app, service: Optional[str] = None):
+        self.app = app
+        if service:
+            init_tracing(service)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        with span(f"{scope['method']} {scope['path']}",
+                  traceparent=headers.get(TRACEPARENT_HEADER),
+                  root=True) as request_span:
+            request_span.set_attribute("http.method", scope["method"])
+            request_span.set_attribute("http.path", scope["path"])
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        request_span.status = "error"
+                    extra = [
+                        (TRACEPARENT_HEADER.encode(), request_span.traceparent.encode()),
+                        (REQUEST_ID_HEADER.lower().encode(), request_span.trace_id.encode())
+                    ]
+                    message = dict(message, headers=list(message.get("headers", [])) + extra)
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+            # Nombre por plantilla de ruta una vez resuelto el endpoint
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                request_span.name = f"{scope['method']} {route.path}"
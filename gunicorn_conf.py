@@ -0,0 +1,86 @@
+"""
+Configuración de gunicorn para producción (workers uvicorn)
+
+    gunicorn -c gunicorn_conf.py api.server:app
+
+El maestro importa la app antes de crear los workers (preload_app): el
+parser (y, con TTS_WARMUP=1, torch y los pesos de Coqui) queda en memoria
+compartida por copy-on-write y gc.freeze() evita que el recolector la ensucie.
+
+Reinicios sin cortar tráfico:
+    kill -HUP <maestro>    workers nuevos con la misma app precargada
+    kill -USR2 <maestro>   maestro nuevo con código nuevo; luego -WINCH y
+                           -QUIT al maestro viejo cuando el nuevo esté listo
+Los workers se reciclan tras GUNICORN_MAX_REQUESTS peticiones (con jitter).
+
+Estado compartido entre workers: los trabajos de importación masiva y las
+versiones por usuario que invalidan el listado cacheado y el índice de tomas
+viven en el SQLite del almacén; las métricas se agregan desde
+METRICS_MULTIPROC_DIR (ver common/metrics.py).
+"""
+import gc
+import os
+import time
+import tempfile
+
+def _available_cpus() -> int:
+    """CPUs asignadas al proceso (respeta taskset/cpuset en contenedores)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+CPUS = _available_cpus()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Carga CPU (parser, TTS): un worker por núcleo
+workers = int(os.getenv("WEB_CONCURRENCY", str(CPUS)))
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# /metrics suma los volcados de todos los workers (antes de importar la app)
+os.environ.setdefault(
+    "METRICS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), f"midosis-metrics-{os.getenv('PORT', '8000')}")
+)
+
+# Repartir los núcleos entre workers para que torch no sobresuscriba la CPU
+os.environ.setdefault("TTS_TORCH_THREADS", str(max(1, CPUS // max(1, workers))))
+
+def on_starting(server):
+    """Antes de precargar la app: descartar métricas de una ejecución anterior"""
+    from common.metrics import clear_multiprocess_dir
+
+    clear_multiprocess_dir()
+
+def when_ready(server):
+    """Tras precargar la app y antes de crear workers"""
+    from api.server import preload_models
+
+    start = time.perf_counter()
+    timings = preload_models()
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Maestro listo en {time.perf_counter() - start:.2f}s "
+                    f"({workers} workers, precarga {timings})")
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} iniciado")
+
+def child_exit(server, worker):
+    """Los contadores del worker siguen sumando en /metrics; sus gauges no"""
+    from common.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
+
+def worker_abort(worker):
+    worker.log.warning(f"Worker {worker.pid} abortado por timeout")
@@ -1,9 +1,19 @@
 """
 Generador de variaciones de comandos para entrenar el asistente 'Mi Dosis'
 """
-import spacy
 import re
+import random
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Frecuencias base en el vocabulario de salida de MedicationParser
+CANONICAL_FREQUENCIES = {
+    ("8", "horas"): "Cada 8 horas",
+    ("12", "horas"): "Cada 12 horas",
+    ("24", "horas"): "Diario",
+    ("1", "días"): "Diario",
+    ("7", "días"): "Semanal"
+}
 
 class CommandVariationGenerator:
     """Genera variaciones de comandos para entrenar el asistente"""
@@ -76,6 +86,83 @@ class CommandVariationGenerator:
         
         return variations
     
+    def generate_labeled_variations(self,
+                                    base_command: str,
+                                    count: int = 50,
+                                    rng: Optional[random.Random] = None) -> List[Dict[str, Any]]:
+        """
+        Generar variaciones con sus slots esperados
+        
+        Todas las variaciones parafrasean el comando base, así que comparten
+        sus slots (en el formato que devuelve MedicationParser.extract_info);
+        is_dosis_command depende del inicio elegido y la hora solo pasa a
+        formato 24 h si la variante conserva el periodo. A diferencia de
+        generate_variations, se muestrean todas las plantillas y variantes.
+        
+        Returns:
+            [{"text": str, "labels": {slot: valor esperado}}, ...]
+        """
+        rng = rng or random.Random(0)
+        components = self._parse_base_command(base_command)
+        if not components.get("medication"):
+            return []
+        
+        labels = self._canonical_labels(components)
+        choices = {
+            "starter": self._get_starter_variations(),
+            "action": self._get_action_variations(components.get("action", "")),
+            "medication": self._get_medication_variations(components["medication"]),
+            "dosage": self._get_dosage_variations(components.get("dosage", "")),
+            "time": sorted(self._get_time_variations(components.get("time", ""))),
+            "frequency": sorted(self._get_frequency_variations(components.get("frequency", ""))),
+            "duration": self._get_duration_variations(components.get("duration", ""))
+        }
+        
+        variations = []
+        for _ in range(count):
+            picked = {slot: rng.choice(options) for slot, options in choices.items()}
+            text = " ".join(rng.choice(self.templates).format(**picked).split())
+            variations.append({
+                "text": text,
+                "labels": dict(
+                    labels,
+                    time=self._time_label(picked["time"]),
+                    is_dosis_command="dosis" in picked["starter"].lower()
+                )
+            })
+        return variations
+    
+    def _canonical_labels(self, components: Dict[str, str]) -> Dict[str, Any]:
+        """Slots del comando base normalizados como los devuelve el parser"""
+        labels = {
+            "action": "add_medication",
+            "medication": components["medication"].capitalize(),
+            "dosage": components.get("dosage"),
+            "time": self._time_label(components.get("time", "")),
+            "frequency": None,
+            "duration": None
+        }
+        
+        match = re.search(r'cada\s+(\d+)\s*(horas|días)', components.get("frequency", ""))
+        if match:
+            labels["frequency"] = CANONICAL_FREQUENCIES.get(match.groups())
+        
+        match = re.search(r'por\s+(\d+\s*\w+)', components.get("duration", ""))
+        if match:
+            labels["duration"] = match.group(1)
+        
+        return labels
+    
+    def _time_label(self, time_text: str) -> Optional[str]:
+        """"a las 8 de la noche" -> "20:00"; sin periodo la hora queda tal cual"""
+        match = re.search(r'(\d{1,2})', time_text)
+        if not match:
+            return None
+        hour = int(match.group(1))
+        if re.search(r'\b(?:tarde|noche|pm)\b', time_text) and hour < 12:
+            hour += 12
+        return f"{hour:02d}:00"
+    
     def _parse_base_command(self, command: str) -> Dict[str, str]:
         """Parsear comando base para extraer componentes"""
         components = {}
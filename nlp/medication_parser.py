@@ -1,22 +1,57 @@
-import spacy
 import re
+from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+try:
+    from common.model_cache import SPACY_MODEL, ModelCacheError, get_model_cache
+except ImportError:  # Cargado por ruta sin la raíz del proyecto en sys.path
+    SPACY_MODEL, ModelCacheError, get_model_cache = "es_core_news_sm", None, None
+
 class MedicationParser:
     def __init__(self):
         """Cargar modelo de spaCy para español"""
+        # Por qué vía se resolvió el medicamento: common_list, spacy, regex o none
+        self.path_counts = Counter()
+        
+        if spacy is None:
+            print("⚠️ spaCy no está instalado; solo se usarán patrones regex")
+            self.nlp = None
+            return
+        
         try:
-            # Cargar modelo de español
-            self.nlp = spacy.load("es_core_news_sm")
+            # Cargar modelo de español (desde la caché de modelos si está)
+            self.nlp = spacy.load(self._spacy_model_path())
             print("✅ spaCy cargado correctamente")
         except Exception as e:
             print(f"⚠️ Modelo spaCy no encontrado: {e}")
-            print("💡 Ejecuta: python -m spacy download es_core_news_sm")
+            print(f"💡 Ejecuta: python -m spacy download {SPACY_MODEL}")
             self.nlp = None
     
-    def extract_info(self, text: str) -> Dict[str, Any]:
-        """Extraer información de medicamentos del texto - VERSIÓN MEJORADA"""
+    def _spacy_model_path(self) -> str:
+        """Directorio del modelo en la caché o, si no está, el paquete instalado"""
+        if get_model_cache is None:
+            return SPACY_MODEL
+        try:
+            cached = get_model_cache().resolve("spacy", SPACY_MODEL)
+        except ModelCacheError as e:
+            # spacy.load no descarga: el paquete instalado también vale sin red
+            print(f"⚠️ {e}")
+            cached = None
+        return str(cached["model"]) if cached else SPACY_MODEL
+    
+    def extract_info(self, text: str, doc=None) -> Dict[str, Any]:
+        """
+        Extraer información de medicamentos del texto - VERSIÓN MEJORADA
+        
+        Args:
+            doc: Doc de spaCy ya procesado para text en minúsculas (extract_info_batch)
+        """
         info = {
             "medication": None,
             "dosage": None,
@@ -80,7 +115,7 @@ class MedicationParser:
             info["action"] = "add_medication"
         
         # 3. Extraer medicamento (MÉTODO MEJORADO)
-        info["medication"] = self._extract_medication_improved(text_lower, info["action"])
+        info["medication"] = self._extract_medication_improved(text_lower, info["action"], doc)
         
         # 4. Extraer dosis (PATRONES MEJORADOS) - CORREGIDO
         dosage_patterns = [
@@ -193,8 +228,24 @@ class MedicationParser:
         
         return info
     
-    def _extract_medication_improved(self, text: str, action: Optional[str]) -> Optional[str]:
-        """Extraer nombre de medicamento con lógica mejorada"""
+    def extract_info_batch(self, texts: List[str], batch_size: int = 256) -> List[Dict[str, Any]]:
+        """
+        Extraer información de muchos textos
+        
+        Los textos sin un medicamento conocido pasan por spaCy en lote
+        (nlp.pipe) en lugar de uno a uno; el resultado es el mismo que
+        llamar a extract_info por cada texto.
+        """
+        docs = {}
+        if self.nlp:
+            pending = [i for i, text in enumerate(texts) if not self._find_common_medication(text.lower())]
+            pipe = self.nlp.pipe((texts[i].lower() for i in pending), batch_size=batch_size)
+            docs = dict(zip(pending, pipe))
+        
+        return [self.extract_info(text, doc=docs.get(i)) for i, text in enumerate(texts)]
+    
+    def _find_common_medication(self, text: str) -> Optional[str]:
+        """Primer medicamento de la lista de comunes contenido en el texto"""
         
         # Lista de medicamentos comunes en español
         common_medications = [
@@ -206,14 +257,23 @@ class MedicationParser:
             'ketorolaco', 'dexametasona', 'prednisona', 'salbutamol', 'ventolín'
         ]
         
-        # 1. Buscar medicamentos comunes
         for med in common_medications:
             if med in text:
-                return med.capitalize()
+                return med
+        return None
+    
+    def _extract_medication_improved(self, text: str, action: Optional[str], doc=None) -> Optional[str]:
+        """Extraer nombre de medicamento con lógica mejorada"""
+        
+        # 1. Buscar medicamentos comunes
+        med = self._find_common_medication(text)
+        if med:
+            self.path_counts["common_list"] += 1
+            return med.capitalize()
         
         # 2. Si tenemos spaCy, usarlo
         if self.nlp:
-            doc = self.nlp(text)
+            doc = doc if doc is not None else self.nlp(text)
             
             # Buscar sustantivos después de verbos de acción
             action_words = ['agregar', 'añadir', 'tomar', 'poner', 'programar', 
@@ -229,6 +289,7 @@ class MedicationParser:
                                           'cápsula', 'jarabe', 'dosis', 'hora',
                                           'mañana', 'tarde', 'noche', 'día']
                             if doc[j].text.lower() not in common_words:
+                                self.path_counts["spacy"] += 1
                                 return doc[j].text.capitalize()
         
         # 3. Patrones regex de respaldo
@@ -251,8 +312,10 @@ class MedicationParser:
                 if (len(candidate) > 3 and 
                     candidate not in ['medicamento', 'pastilla', 'tableta', 
                                     'cápsula', 'dosis', 'hora', 'día']):
+                    self.path_counts["regex"] += 1
                     return candidate.capitalize()
         
+        self.path_counts["none"] += 1
         return None
     
     def _regex_extraction(self, text):
@@ -334,6 +397,10 @@ def extract_medication_info(text):
     """Función para usar desde otros módulos"""
     return parser.extract_info(text)
 
+def extract_medication_info_batch(texts):
+    """Versión por lotes de extract_medication_info"""
+    return parser.extract_info_batch(texts)
+
 
 if __name__ == "__main__":
     # Prueba del parser
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Descargar por adelantado los modelos configurados a la caché versionada
+
+Whisper (WHISPER_MODELS), Coqui (el que elegiría tts_service) y spaCy
+(SPACY_MODEL) se guardan en MODEL_CACHE_DIR/MODEL_CACHE_VERSION con su
+SHA-256 en manifest.json. Pensado para el build de Docker, de modo que el
+contenedor arranque con MIDOSIS_OFFLINE=1 y sin descargas:
+
+    python prefetch_models.py                      # todo lo configurado
+    python prefetch_models.py --whisper base,small --skip coqui
+    python prefetch_models.py --verify             # solo comprobar checksums
+"""
+import os
+import sys
+import shutil
+import logging
+import argparse
+import importlib
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from common.model_cache import (
+    MODEL_CACHE_DIR, MODEL_CACHE_VERSION, OFFLINE_MODE, SPACY_MODEL, WHISPER_MODELS,
+    ModelCacheError, get_model_cache, kind_dir
+)
+
+logger = logging.getLogger("prefetch_models")
+
+def prefetch_whisper(name: str) -> Dict[str, Any]:
+    """Descargar el checkpoint .pt; whisper verifica el SHA-256 publicado en la URL"""
+    import whisper
+
+    if name not in whisper._MODELS:
+        raise ModelCacheError(f"Modelo Whisper desconocido: {name}")
+    url = whisper._MODELS[name]
+    path = whisper._download(url, str(kind_dir("whisper")), False)
+    return get_model_cache().record("whisper", name, {"model": Path(path)}, source=url)
+
+def prefetch_coqui(name: str) -> Dict[str, Any]:
+    """Descargar modelo y vocoder por defecto con el ModelManager de Coqui"""
+    # Coqui descarga en TTS_HOME/tts/<modelo> y reescribe el config con esas rutas
+    os.environ["TTS_HOME"] = str(kind_dir("coqui"))
+    from TTS.utils.manage import ModelManager
+
+    manager = ModelManager(progress_bar=False)
+    model_path, config_path, model_item = manager.download_model(name)
+    paths = {"model": Path(model_path), "model_dir": Path(model_path).parent}
+    if config_path:
+        paths["config"] = Path(config_path)
+
+    vocoder = model_item.get("default_vocoder")
+    if vocoder:
+        vocoder_path, vocoder_config_path, _ = manager.download_model(vocoder)
+        paths.update({
+            "vocoder": Path(vocoder_path),
+            "vocoder_config": Path(vocoder_config_path),
+            "vocoder_dir": Path(vocoder_path).parent
+        })
+    return get_model_cache().record("coqui", name, paths, source=f"{name} + {vocoder}" if vocoder else name)
+
+def prefetch_spacy(name: str) -> Dict[str, Any]:
+    """Guardar el pipeline en la caché (se instala el paquete si falta)"""
+    import spacy
+
+    try:
+        nlp = spacy.load(name)
+    except OSError:
+        logger.info(f"Instalando paquete spaCy {name}...")
+        spacy.cli.download(name)
+        importlib.invalidate_caches()
+        nlp = spacy.load(name)
+
+    target = kind_dir("spacy") / name
+    if target.exists():
+        shutil.rmtree(target)
+    nlp.to_disk(target)
+    return get_model_cache().record("spacy", name, {"model": target}, source=f"spacy {spacy.__version__}")
+
+def coqui_model_name() -> str:
+    from tts import tts_service
+
+    if not tts_service.COQUI_AVAILABLE:
+        raise ModelCacheError("Coqui TTS no está instalado")
+    return tts_service.select_model_name()
+
+def verify_all() -> int:
+    """SHA-256 completo de todos los artefactos del manifiesto"""
+    cache = get_model_cache()
+    if not cache.artifacts:
+        print(f"✗ Caché vacía: {cache.root}")
+        return 1
+
+    failures = 0
+    for key, entry in sorted(cache.artifacts.items()):
+        try:
+            cache.verify(entry["kind"], entry["name"], full=True)
+            print(f"✓ {key:45} {entry['bytes'] / 1e6:>9.1f} MB")
+        except ModelCacheError as e:
+            failures += 1
+            print(f"✗ {e}")
+    return 1 if failures else 0
+
+def prune_versions() -> List[Path]:
+    """Eliminar las cachés de otras versiones"""
+    removed = []
+    if MODEL_CACHE_DIR.exists():
+        for path in MODEL_CACHE_DIR.iterdir():
+            if path.is_dir() and path.name != MODEL_CACHE_VERSION:
+                shutil.rmtree(path)
+                removed.append(path)
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Descargar modelos a la caché versionada")
+    parser.add_argument("--whisper", default=",".join(WHISPER_MODELS), help="Modelos Whisper")
+    parser.add_argument("--coqui", help="Modelo Coqui (por defecto el que elegiría tts_service)")
+    parser.add_argument("--spacy", default=SPACY_MODEL, help="Pipeline spaCy")
+    parser.add_argument("--skip", default="", help="Tipos a omitir: whisper,coqui,spacy")
+    parser.add_argument("--force", action="store_true", help="Volver a descargar lo ya registrado")
+    parser.add_argument("--verify", action="store_true", help="Solo verificar checksums")
+    parser.add_argument("--prune", action="store_true", help="Borrar cachés de otras versiones")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    if args.verify:
+        sys.exit(verify_all())
+
+    if OFFLINE_MODE:
+        print("✗ MIDOSIS_OFFLINE=1: prefetch_models.py necesita red")
+        sys.exit(1)
+
+    skip = set(filter(None, args.skip.split(",")))
+    failures = 0
+    jobs = []
+    if "whisper" not in skip:
+        jobs += [("whisper", name, prefetch_whisper) for name in args.whisper.split(",") if name]
+    if "coqui" not in skip:
+        try:
+            jobs.append(("coqui", args.coqui or coqui_model_name(), prefetch_coqui))
+        except Exception as e:
+            failures += 1
+            print(f"✗ coqui: no se pudo elegir el modelo: {e}")
+    if "spacy" not in skip:
+        jobs.append(("spacy", args.spacy, prefetch_spacy))
+
+    cache = get_model_cache()
+    print(f"Caché: {cache.root}")
+    for kind, name, fetch in jobs:
+        if not args.force and f"{kind}:{name}" in cache.artifacts:
+            try:
+                cache.verify(kind, name, full=True)
+                print(f"✓ {kind}:{name} ya en caché")
+                continue
+            except ModelCacheError as e:
+                print(f"⚠️ {e}; se descarga de nuevo")
+        try:
+            fetch(name)
+            cache.verify(kind, name, full=True)
+            print(f"✓ {kind}:{name} descargado y verificado")
+        except Exception as e:
+            failures += 1
+            print(f"✗ {kind}:{name}: {e}")
+
+    if args.prune:
+        for path in prune_versions():
+            print(f"🗑️ Eliminada caché antigua {path}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
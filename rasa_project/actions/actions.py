@@ -6,82 +6,18 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, ReminderScheduled, ReminderCancelled
 from datetime import datetime, timedelta
-import sqlite3
 import logging
 import json
-import os
 
 logger = logging.getLogger(__name__)
 
-# Base de datos para medicamentos
-DB_PATH = os.path.join(os.path.dirname(__file__), "medicamentos.db")
+from .database import migrate, query_one, query_all, execute, fecha_a_entero
+from .tracing import traced_action
+from .reminder_scheduler import REMINDER_SCHEDULER, get_reminder_scheduler, reminder_from_row, start_reminder_scheduler
 
 def init_database():
-    """Inicializar base de datos de medicamentos"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Tabla de medicamentos comunes
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS medicamentos (
-        id INTEGER PRIMARY KEY,
-        nombre TEXT NOT NULL,
-        dosis_habitual TEXT,
-        frecuencia TEXT,
-        indicaciones TEXT,
-        efectos_secundarios TEXT
-    )
-    ''')
-    
-    # Tabla de recordatorios del usuario
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recordatorios (
-        id INTEGER PRIMARY KEY,
-        medicamento TEXT NOT NULL,
-        hora TEXT NOT NULL,
-        dias TEXT,
-        activo INTEGER DEFAULT 1,
-        usuario_id TEXT DEFAULT 'default'
-    )
-    ''')
-    
-    # Tabla de registro de tomas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tomas_registradas (
-        id INTEGER PRIMARY KEY,
-        medicamento TEXT NOT NULL,
-        fecha TEXT NOT NULL,
-        hora TEXT NOT NULL,
-        confirmada INTEGER DEFAULT 0,
-        usuario_id TEXT DEFAULT 'default'
-    )
-    ''')
-    
-    # Insertar medicamentos comunes si no existen
-    medicamentos_comunes = [
-        ("metformina", "500mg", "Cada 12 horas", "Diabetes tipo 2", "Malestar estomacal, diarrea"),
-        ("lisinopril", "10mg", "Una vez al día", "Hipertensión", "Tos seca, mareos"),
-        ("atorvastatina", "20mg", "Noche", "Colesterol alto", "Dolor muscular"),
-        ("omeprazol", "20mg", "Mañana antes de desayuno", "Acidez estomacal", "Dolor de cabeza"),
-        ("losartán", "50mg", "Una vez al día", "Hipertensión", "Mareos, fatiga"),
-        ("amlodipino", "5mg", "Una vez al día", "Hipertensión", "Hinchazón de tobillos"),
-        ("paracetamol", "500mg", "Cada 8 horas si duele", "Dolor y fiebre", "Riesgo hepático en dosis altas"),
-        ("ibuprofeno", "400mg", "Cada 8 horas si duele", "Dolor e inflamación", "Malestar estomacal")
-    ]
-    
-    for med in medicamentos_comunes:
-        cursor.execute(
-            "SELECT 1 FROM medicamentos WHERE nombre = ?",
-            (med[0],)
-        )
-        if not cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO medicamentos (nombre, dosis_habitual, frecuencia, indicaciones, efectos_secundarios) VALUES (?, ?, ?, ?, ?)",
-                med
-            )
-    
-    conn.commit()
-    conn.close()
+    """Inicializar base de datos de medicamentos (migración única por proceso)"""
+    migrate()
     logger.info("Base de datos de medicamentos inicializada")
 
 class ActionVerificarToma(Action):
@@ -90,39 +26,31 @@ class ActionVerificarToma(Action):
     def name(self) -> Text:
         return "action_verificar_toma"
     
+    @traced_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         try:
-            # Inicializar DB si no existe
-            init_database()
-            
             medicamento = tracker.get_slot("medicamento")
-            hoy = datetime.now().strftime("%Y-%m-%d")
-            
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
+            usuario_id = tracker.sender_id
+            hoy = fecha_a_entero(datetime.now().date())
             
             if medicamento:
-                # Buscar si ya tomó este medicamento hoy
-                cursor.execute(
-                    "SELECT 1 FROM tomas_registradas WHERE medicamento = ? AND fecha = ?",
-                    (medicamento, hoy)
+                # Toma de hoy y frecuencia habitual en una sola consulta indexada
+                tomado, frecuencia = query_one(
+                    "SELECT EXISTS(SELECT 1 FROM tomas_registradas "
+                    "WHERE usuario_id = ? AND fecha = ? AND medicamento = ?), "
+                    "(SELECT frecuencia FROM medicamentos WHERE nombre = ?)",
+                    (usuario_id, hoy, medicamento, medicamento.lower()),
+                    usuario_id=usuario_id
                 )
                 
-                if cursor.fetchone():
+                if tomado:
                     response = f"Sí, según mis registros ya tomaste {medicamento} hoy."
                 else:
-                    # Verificar información del medicamento
-                    cursor.execute(
-                        "SELECT frecuencia FROM medicamentos WHERE nombre = ?",
-                        (medicamento.lower(),)
-                    )
-                    frecuencia = cursor.fetchone()
-                    
                     if frecuencia:
-                        response = f"No encuentro registro de que hayas tomado {medicamento} hoy. Normalmente se toma {frecuencia[0]}."
+                        response = f"No encuentro registro de que hayas tomado {medicamento} hoy. Normalmente se toma {frecuencia}."
                     else:
                         response = f"No encuentro registro de que hayas tomado {medicamento} hoy. ¿Lo tomaste?"
                     
@@ -132,11 +60,11 @@ class ActionVerificarToma(Action):
                     return [SlotSet("ultima_toma", "pendiente")]
             else:
                 # Listar medicamentos del día
-                cursor.execute(
-                    "SELECT DISTINCT medicamento FROM tomas_registradas WHERE fecha = ?",
-                    (hoy,)
+                tomas_hoy = query_all(
+                    "SELECT DISTINCT medicamento FROM tomas_registradas WHERE usuario_id = ? AND fecha = ?",
+                    (usuario_id, hoy),
+                    usuario_id=usuario_id
                 )
-                tomas_hoy = cursor.fetchall()
                 
                 if tomas_hoy:
                     medicamentos = ", ".join([t[0] for t in tomas_hoy])
@@ -144,7 +72,6 @@ class ActionVerificarToma(Action):
                 else:
                     response = "No hay registros de medicamentos tomados hoy."
             
-            conn.close()
             dispatcher.utter_message(text=response)
             
         except Exception as e:
@@ -161,13 +88,12 @@ class ActionProgramarRecordatorio(Action):
     def name(self) -> Text:
         return "action_programar_recordatorio"
     
+    @traced_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         try:
-            init_database()
-            
             medicamento = tracker.get_slot("medicamento")
             hora = tracker.get_slot("hora_recordatorio")
             
@@ -180,22 +106,21 @@ class ActionProgramarRecordatorio(Action):
                 return []
             
             # Guardar en base de datos
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO recordatorios (medicamento, hora, activo) VALUES (?, ?, 1)",
-                (medicamento, hora)
+            recordatorio_id = execute(
+                "INSERT INTO recordatorios (medicamento, hora, activo, usuario_id) VALUES (?, ?, 1, ?)",
+                (medicamento, hora, tracker.sender_id),
+                usuario_id=tracker.sender_id
             )
             
-            conn.commit()
-            conn.close()
+            # Entregar al planificador en proceso para que se dispare a su hora
+            if REMINDER_SCHEDULER:
+                reminder = reminder_from_row((recordatorio_id, medicamento, hora, None, tracker.sender_id))
+                if reminder is not None:
+                    get_reminder_scheduler().add(reminder)
             
             response = f"✅ Recordatorio programado: {medicamento} a las {hora}"
             dispatcher.utter_message(text=response)
             
-            # Aquí podrías integrar con un sistema real de notificaciones
-            
         except Exception as e:
             logger.error(f"Error programando recordatorio: {e}")
             dispatcher.utter_message(
@@ -210,30 +135,23 @@ class ActionConsultarMedicamento(Action):
     def name(self) -> Text:
         return "action_consultar_medicamento"
     
+    @traced_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         try:
-            init_database()
-            
             medicamento = tracker.get_slot("medicamento")
             
             if not medicamento:
                 dispatcher.utter_message(text="¿De qué medicamento te gustaría información?")
                 return []
             
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute(
+            resultado = query_one(
                 "SELECT dosis_habitual, frecuencia, indicaciones, efectos_secundarios FROM medicamentos WHERE nombre = ?",
                 (medicamento.lower(),)
             )
             
-            resultado = cursor.fetchone()
-            conn.close()
-            
             if resultado:
                 dosis, frecuencia, indicaciones, efectos = resultado
                 
@@ -267,6 +185,7 @@ class ActionEmergencia(Action):
     def name(self) -> Text:
         return "action_emergencia"
     
+    @traced_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -287,5 +206,8 @@ class ActionEmergencia(Action):
         
         return []
 
-# Inicializar base de datos al importar
-init_database()
\ No newline at end of file
+# Migrar el esquema una sola vez al arrancar el servidor de acciones
+init_database()
+
+# Cargar los recordatorios activos y arrancar el planificador
+start_reminder_scheduler()
\ No newline at end of file
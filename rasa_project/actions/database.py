@@ -0,0 +1,258 @@
+"""
+Capa de acceso a datos SQLite para las acciones de Rasa
+
+Una conexión por hilo (reutilizada entre turnos), modo WAL y migración
+del esquema una sola vez al arrancar el servidor de acciones.
+
+Con ACTIONS_DB_SHARDS > 1 los datos de cada usuario viven en un archivo
+por bucket (hash del usuario); cada shard tiene el esquema completo,
+incluido el catálogo de medicamentos, para que las consultas no crucen archivos.
+"""
+import os
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import date
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv(
+    "ACTIONS_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "medicamentos.db")
+)
+
+# Número de archivos por bucket de usuario (0 o 1 = un solo archivo)
+ACTIONS_DB_SHARDS = int(os.getenv("ACTIONS_DB_SHARDS", "0"))
+
+# Pragmas aplicados a cada conexión nueva
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",      # ~8 MB de caché de páginas
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON"
+]
+
+# Medicamentos comunes precargados
+MEDICAMENTOS_COMUNES = [
+    ("metformina", "500mg", "Cada 12 horas", "Diabetes tipo 2", "Malestar estomacal, diarrea"),
+    ("lisinopril", "10mg", "Una vez al día", "Hipertensión", "Tos seca, mareos"),
+    ("atorvastatina", "20mg", "Noche", "Colesterol alto", "Dolor muscular"),
+    ("omeprazol", "20mg", "Mañana antes de desayuno", "Acidez estomacal", "Dolor de cabeza"),
+    ("losartán", "50mg", "Una vez al día", "Hipertensión", "Mareos, fatiga"),
+    ("amlodipino", "5mg", "Una vez al día", "Hipertensión", "Hinchazón de tobillos"),
+    ("paracetamol", "500mg", "Cada 8 horas si duele", "Dolor y fiebre", "Riesgo hepático en dosis altas"),
+    ("ibuprofeno", "400mg", "Cada 8 horas si duele", "Dolor e inflamación", "Malestar estomacal")
+]
+
+def _migration_1(conn: sqlite3.Connection):
+    """Esquema inicial y medicamentos comunes"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS medicamentos (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        dosis_habitual TEXT,
+        frecuencia TEXT,
+        indicaciones TEXT,
+        efectos_secundarios TEXT
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS recordatorios (
+        id INTEGER PRIMARY KEY,
+        medicamento TEXT NOT NULL,
+        hora TEXT NOT NULL,
+        dias TEXT,
+        activo INTEGER DEFAULT 1,
+        usuario_id TEXT DEFAULT 'default'
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tomas_registradas (
+        id INTEGER PRIMARY KEY,
+        medicamento TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        hora TEXT NOT NULL,
+        confirmada INTEGER DEFAULT 0,
+        usuario_id TEXT DEFAULT 'default'
+    )
+    ''')
+    conn.executemany(
+        "INSERT INTO medicamentos (nombre, dosis_habitual, frecuencia, indicaciones, efectos_secundarios) "
+        "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM medicamentos WHERE nombre = ?)",
+        [med + (med[0],) for med in MEDICAMENTOS_COMUNES]
+    )
+
+def _migration_2(conn: sqlite3.Connection):
+    """Fechas enteras (AAAAMMDD), índices compuestos y nombre único en medicamentos"""
+    # SQLite no permite cambiar el tipo de una columna: reconstruir la tabla
+    conn.execute('''
+    CREATE TABLE tomas_registradas_v2 (
+        id INTEGER PRIMARY KEY,
+        medicamento TEXT NOT NULL,
+        fecha INTEGER NOT NULL,
+        hora TEXT NOT NULL,
+        confirmada INTEGER DEFAULT 0,
+        usuario_id TEXT NOT NULL DEFAULT 'default'
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO tomas_registradas_v2 (id, medicamento, fecha, hora, confirmada, usuario_id)
+    SELECT id, medicamento, CAST(REPLACE(fecha, '-', '') AS INTEGER), hora, confirmada,
+           COALESCE(usuario_id, 'default')
+    FROM tomas_registradas
+    ''')
+    conn.execute("DROP TABLE tomas_registradas")
+    conn.execute("ALTER TABLE tomas_registradas_v2 RENAME TO tomas_registradas")
+    
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tomas_usuario_fecha_med "
+        "ON tomas_registradas (usuario_id, fecha, medicamento)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recordatorios_usuario_activo_hora "
+        "ON recordatorios (usuario_id, activo, hora)"
+    )
+    
+    # Conservar la primera fila de cada nombre antes de exigir unicidad
+    conn.execute("DELETE FROM medicamentos WHERE id NOT IN (SELECT MIN(id) FROM medicamentos GROUP BY nombre)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_medicamentos_nombre ON medicamentos (nombre)")
+
+# Migraciones en orden; la versión aplicada se guarda en PRAGMA user_version
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+]
+
+def fecha_a_entero(fecha: date) -> int:
+    """Representación entera AAAAMMDD usada en tomas_registradas.fecha"""
+    return fecha.year * 10000 + fecha.month * 100 + fecha.day
+
+class ConnectionPool:
+    """Pool de conexiones SQLite con una conexión por hilo"""
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Obtener (o crear) la conexión del hilo actual"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        """Cerrar todas las conexiones abiertas"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+_pools: Dict[str, ConnectionPool] = {}
+_pool_lock = threading.Lock()
+_migrate_lock = threading.Lock()
+_migrated = False
+
+def shard_for(usuario_id: str) -> int:
+    """Bucket estable del usuario (crc32, no hash() que cambia entre procesos)"""
+    return zlib.crc32(usuario_id.encode("utf-8")) % ACTIONS_DB_SHARDS
+
+def shard_path(shard: int) -> str:
+    """Ruta del archivo de un shard: medicamentos_003.db"""
+    base, ext = os.path.splitext(DB_PATH)
+    return f"{base}_{shard:03d}{ext}"
+
+def _pool_for_path(db_path: str) -> ConnectionPool:
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool
+
+def get_pool(usuario_id: Optional[str] = None) -> ConnectionPool:
+    """Obtener el pool del archivo que contiene los datos del usuario"""
+    if usuario_id is None or ACTIONS_DB_SHARDS <= 1:
+        return _pool_for_path(DB_PATH)
+    return _pool_for_path(shard_path(shard_for(usuario_id)))
+
+def all_pools() -> List[ConnectionPool]:
+    """Pool principal y, si hay sharding, uno por shard"""
+    pools = [get_pool()]
+    if ACTIONS_DB_SHARDS > 1:
+        pools.extend(_pool_for_path(shard_path(shard)) for shard in range(ACTIONS_DB_SHARDS))
+    return pools
+
+def _migrate_pool(pool: ConnectionPool, target_version: Optional[int]) -> bool:
+    """Migrar un archivo; devuelve True si quedó en la última versión"""
+    conn = pool.get_connection()
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for version, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        if target_version is not None and version > target_version:
+            return False
+        # BEGIN explícito: el DDL también queda dentro de la transacción
+        with conn:
+            conn.execute("BEGIN")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        logger.info(f"Migración {version} aplicada a {pool.db_path}")
+
+    return True
+
+def migrate(target_version: Optional[int] = None):
+    """
+    Aplicar migraciones pendientes en todos los archivos (una sola vez por proceso)
+
+    Args:
+        target_version: Detenerse en esta versión (por defecto, la última)
+    """
+    global _migrated
+    if _migrated:
+        return
+
+    with _migrate_lock:
+        if _migrated:
+            return
+
+        results = [_migrate_pool(pool, target_version) for pool in all_pools()]
+        _migrated = all(results)
+
+@contextmanager
+def transaction(usuario_id: Optional[str] = None):
+    """Transacción sobre la conexión del hilo actual (commit o rollback automático)"""
+    conn = get_pool(usuario_id).get_connection()
+    with conn:
+        yield conn
+
+def query_one(sql: str, params: Iterable[Any] = (), usuario_id: Optional[str] = None) -> Optional[Tuple]:
+    """Ejecutar una consulta y devolver la primera fila"""
+    return get_pool(usuario_id).get_connection().execute(sql, tuple(params)).fetchone()
+
+def query_all(sql: str, params: Iterable[Any] = (), usuario_id: Optional[str] = None) -> List[Tuple]:
+    """Ejecutar una consulta y devolver todas las filas"""
+    return get_pool(usuario_id).get_connection().execute(sql, tuple(params)).fetchall()
+
+def execute(sql: str, params: Iterable[Any] = (), usuario_id: Optional[str] = None) -> int:
+    """Ejecutar una sentencia de escritura en su propia transacción"""
+    with transaction(usuario_id) as conn:
+        return conn.execute(sql, tuple(params)).lastrowid
@@ -0,0 +1,98 @@
+"""
+Cliente HTTP asíncrono compartido para llamar al backend FastAPI desde las acciones
+
+Una sesión aiohttp por proceso del servidor de acciones, con pool de
+conexiones keep-alive, límite de peticiones concurrentes y timeouts.
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from .tracing import inject, span
+
+logger = logging.getLogger(__name__)
+
+# URL de tu backend FastAPI
+FASTAPI_URL = os.getenv("FASTAPI_URL", "http://localhost:8000")
+HTTP_TIMEOUT = float(os.getenv("ACTIONS_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("ACTIONS_HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("ACTIONS_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_CONCURRENT = int(os.getenv("ACTIONS_HTTP_MAX_CONCURRENT", "50"))
+
+class BackendClient:
+    """Cliente aiohttp con conexiones reutilizadas hacia FASTAPI_URL"""
+
+    def __init__(self,
+                 base_url: str = FASTAPI_URL,
+                 max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_concurrent: int = HTTP_MAX_CONCURRENT,
+                 timeout: float = HTTP_TIMEOUT,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_concurrent = max_concurrent
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Crear la sesión en el event loop del servidor de acciones"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                connector=connector,
+                timeout=self.timeout
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            logger.info(f"Sesión HTTP creada hacia {self.base_url}")
+        return self._session
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      json: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Enviar una petición y devolver (status, cuerpo JSON)
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError
+        """
+        session = self._get_session()
+        with span(f"{method} {path}") as request_span:
+            async with self._semaphore:
+                async with session.request(method, path, json=json, headers=inject()) as response:
+                    if request_span is not None:
+                        request_span.set_attribute("http.status_code", response.status)
+                    body = None
+                    if response.content_type == "application/json":
+                        body = await response.json()
+                    return response.status, body
+
+    async def get(self, path: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        return await self.request("GET", path)
+
+    async def post(self, path: str, json: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        return await self.request("POST", path, json=json)
+
+    async def close(self):
+        """Cerrar la sesión y sus conexiones"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+# Instancia global (una por proceso del servidor de acciones)
+_backend_client: Optional[BackendClient] = None
+
+def get_backend_client() -> BackendClient:
+    """Obtener el cliente HTTP compartido"""
+    global _backend_client
+    if _backend_client is None:
+        _backend_client = BackendClient()
+    return _backend_client
@@ -3,16 +3,16 @@ Actions específicas para comandos 'Mi Dosis'
 """
 import logging
 import json
-import requests
+from urllib.parse import quote
 from typing import Dict, Text, Any, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
-logger = logging.getLogger(__name__)
+from .http_client import get_backend_client
+from .tracing import traced_action
 
-# URL de tu backend FastAPI
-FASTAPI_URL = "http://localhost:8000"
+logger = logging.getLogger(__name__)
 
 class ActionMiDosisAgregar(Action):
     """Acción para agregar medicamento desde comando 'Mi Dosis'"""
@@ -20,6 +20,7 @@ class ActionMiDosisAgregar(Action):
     def name(self) -> Text:
         return "action_mi_dosis_agregar"
     
+    @traced_action
     async def run(
         self, 
         dispatcher: CollectingDispatcher,
@@ -67,15 +68,12 @@ class ActionMiDosisAgregar(Action):
                 "user_id": tracker.sender_id  # ID único del usuario
             }
             
-            response = requests.post(
-                f"{FASTAPI_URL}/api/voice/process-command",
-                json=payload,
-                timeout=10
+            status, result = await get_backend_client().post(
+                "/api/voice/process-command",
+                json=payload
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                
+            if status == 200 and result is not None:
                 if result.get("success"):
                     # Extraer información para confirmación
                     parsed_info = result.get("parsed_info", {})
@@ -126,6 +124,7 @@ class ActionMiDosisListar(Action):
     def name(self) -> Text:
         return "action_mi_dosis_listar"
     
+    @traced_action
     async def run(
         self, 
         dispatcher: CollectingDispatcher,
@@ -140,13 +139,12 @@ class ActionMiDosisListar(Action):
             # Por ahora simulamos una respuesta
             
             # Para integración real, conectar con tu backend
-            response = requests.get(
-                f"{FASTAPI_URL}/api/user/{user_id}/medications",
-                timeout=10
+            status, result = await get_backend_client().get(
+                f"/api/user/{quote(user_id, safe='')}/medications"
             )
             
-            if response.status_code == 200:
-                medications = response.json().get("medications", [])
+            if status == 200 and result is not None:
+                medications = result.get("medications", [])
                 
                 if medications:
                     medication_list = "\n".join([
@@ -201,6 +199,7 @@ class ActionMiDosisEliminar(Action):
     def name(self) -> Text:
         return "action_mi_dosis_eliminar"
     
+    @traced_action
     async def run(
         self, 
         dispatcher: CollectingDispatcher,
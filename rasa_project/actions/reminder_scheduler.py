@@ -0,0 +1,299 @@
+"""
+Planificador de recordatorios en proceso para el servidor de acciones
+
+Carga los recordatorios activos de la tabla recordatorios en un min-heap
+ordenado por próxima ejecución y un único hilo duerme hasta el siguiente
+vencimiento (sin sondear la base de datos). Las cancelaciones son perezosas:
+cada recordatorio lleva una versión y las entradas obsoletas del heap se
+descartan al salir.
+
+Cada cierto tiempo se guarda un checkpoint (instante hasta el que todo
+se disparó); al reiniciar, los recordatorios vencidos mientras el proceso
+estuvo caído se disparan una vez si caen dentro de REMINDER_CATCHUP_SECONDS.
+"""
+import os
+import re
+import json
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from .database import DB_PATH, all_pools
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SCHEDULER = os.getenv("REMINDER_SCHEDULER", "1") == "1"
+REMINDER_CHECKPOINT_PATH = os.getenv(
+    "REMINDER_CHECKPOINT_PATH",
+    os.path.splitext(DB_PATH)[0] + "_recordatorios.checkpoint.json"
+)
+REMINDER_CHECKPOINT_INTERVAL = float(os.getenv("REMINDER_CHECKPOINT_INTERVAL", "30"))
+REMINDER_CATCHUP_SECONDS = float(os.getenv("REMINDER_CATCHUP_SECONDS", "3600"))
+REMINDER_NOTIFY_WORKERS = int(os.getenv("REMINDER_NOTIFY_WORKERS", "4"))
+
+HORA_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?")
+DIAS_SEMANA = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6
+}
+TODOS_LOS_DIAS = frozenset(range(7))
+
+# (usuario_id, id del recordatorio): los ids solo son únicos dentro de un shard
+ReminderKey = Tuple[str, int]
+
+@dataclass
+class Reminder:
+    """Recordatorio diario a una hora fija en ciertos días de la semana"""
+    id: int
+    usuario_id: str
+    medicamento: str
+    hour: int
+    minute: int
+    weekdays: FrozenSet[int] = TODOS_LOS_DIAS
+    version: int = 0
+
+    @property
+    def key(self) -> ReminderKey:
+        return (self.usuario_id, self.id)
+
+    def next_after(self, moment: float) -> float:
+        """Próxima ejecución estrictamente posterior a moment (epoch)"""
+        current = datetime.fromtimestamp(moment)
+        candidate = current.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate.timestamp() <= moment:
+            candidate += timedelta(days=1)
+        while candidate.weekday() not in self.weekdays:
+            candidate += timedelta(days=1)
+        return candidate.timestamp()
+
+def parse_hora(hora: str) -> Optional[Tuple[int, int]]:
+    match = HORA_RE.search(hora or "")
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+def parse_dias(dias: Optional[str]) -> FrozenSet[int]:
+    """'lunes, miércoles' -> {0, 2}; vacío o no reconocido -> todos los días"""
+    if not dias:
+        return TODOS_LOS_DIAS
+    found = {DIAS_SEMANA[d] for d in re.split(r"[\s,;]+", dias.lower()) if d in DIAS_SEMANA}
+    return frozenset(found) or TODOS_LOS_DIAS
+
+def reminder_from_row(row: Tuple) -> Optional[Reminder]:
+    """Fila (id, medicamento, hora, dias, usuario_id) -> Reminder"""
+    reminder_id, medicamento, hora, dias, usuario_id = row
+    parsed = parse_hora(hora)
+    if parsed is None:
+        logger.warning(f"Recordatorio {reminder_id} con hora no reconocida: {hora!r}")
+        return None
+    return Reminder(reminder_id, usuario_id or "default", medicamento, parsed[0], parsed[1], parse_dias(dias))
+
+def log_notifier(reminder: Reminder, due: float):
+    """Notificador por defecto: solo registra el disparo"""
+    logger.info(
+        f"⏰ Recordatorio {reminder.id} para {reminder.usuario_id}: "
+        f"{reminder.medicamento} ({datetime.fromtimestamp(due):%H:%M})"
+    )
+
+class ReminderScheduler:
+    """Min-heap de (vencimiento, clave, versión) con un hilo que duerme hasta el siguiente"""
+
+    def __init__(self,
+                 notifier: Callable[[Reminder, float], None] = log_notifier,
+                 checkpoint_path: str = REMINDER_CHECKPOINT_PATH,
+                 checkpoint_interval: float = REMINDER_CHECKPOINT_INTERVAL,
+                 catchup_seconds: float = REMINDER_CATCHUP_SECONDS):
+        self.notifier = notifier
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.catchup_seconds = catchup_seconds
+
+        self._heap: List[Tuple[float, ReminderKey, int]] = []
+        self._reminders: Dict[ReminderKey, Reminder] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=REMINDER_NOTIFY_WORKERS,
+                                            thread_name_prefix="recordatorio")
+        self._stopping = False
+        self._fired_until = time.time()
+        self._last_checkpoint = 0.0
+        self.fired = 0
+
+    # ========== CHECKPOINTS ==========
+    def _read_checkpoint(self) -> Optional[float]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return float(json.load(f)["fired_until"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Checkpoint de recordatorios ilegible ({e}); se ignora")
+            return None
+
+    def _write_checkpoint(self):
+        """Escritura atómica: nunca queda un checkpoint a medias tras un fallo"""
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fired_until": self._fired_until, "active": len(self._reminders)}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self._last_checkpoint = time.monotonic()
+        except OSError as e:
+            logger.error(f"No se pudo guardar el checkpoint de recordatorios: {e}")
+
+    # ========== CARGA ==========
+    def load(self) -> int:
+        """Cargar los recordatorios activos de todos los archivos y construir el heap"""
+        now = time.time()
+        checkpoint = self._read_checkpoint()
+        # Repetir lo que venció mientras el proceso no corría (acotado)
+        since = now if checkpoint is None else max(checkpoint, now - self.catchup_seconds)
+
+        reminders = {}
+        for pool in all_pools():
+            rows = pool.get_connection().execute(
+                "SELECT id, medicamento, hora, dias, usuario_id FROM recordatorios WHERE activo = 1"
+            ).fetchall()
+            for row in rows:
+                reminder = reminder_from_row(row)
+                if reminder is not None:
+                    reminders[reminder.key] = reminder
+
+        # Muchos recordatorios comparten hora y días: calcular cada vencimiento una vez
+        next_due: Dict[Tuple[int, int, FrozenSet[int]], float] = {}
+        heap = []
+        for r in reminders.values():
+            slot = (r.hour, r.minute, r.weekdays)
+            due = next_due.get(slot)
+            if due is None:
+                due = next_due[slot] = r.next_after(since)
+            heap.append((due, r.key, r.version))
+        heapq.heapify(heap)  # O(n): cientos de miles de recordatorios en milisegundos
+
+        with self._condition:
+            self._reminders = reminders
+            self._heap = heap
+            self._fired_until = since
+            self._condition.notify()
+
+        logger.info(f"📅 {len(reminders)} recordatorios activos cargados")
+        return len(reminders)
+
+    # ========== ALTAS Y BAJAS ==========
+    def add(self, reminder: Reminder):
+        """Agregar o reemplazar un recordatorio"""
+        with self._condition:
+            previous = self._reminders.get(reminder.key)
+            if previous is not None:
+                reminder.version = previous.version + 1
+            self._reminders[reminder.key] = reminder
+            due = reminder.next_after(time.time())
+            heapq.heappush(self._heap, (due, reminder.key, reminder.version))
+            # Despertar solo si el nuevo es el más próximo
+            if self._heap[0][1] == reminder.key:
+                self._condition.notify()
+
+    def cancel(self, usuario_id: str, reminder_id: int) -> bool:
+        """Cancelar; la entrada del heap se descarta cuando llega a la cima"""
+        with self._condition:
+            return self._reminders.pop((usuario_id, reminder_id), None) is not None
+
+    # ========== BUCLE ==========
+    def _pop_due(self, now: float) -> List[Tuple[Reminder, float]]:
+        """Sacar del heap lo vencido y reprogramar la siguiente ejecución"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, key, version = heapq.heappop(self._heap)
+            reminder = self._reminders.get(key)
+            if reminder is None or reminder.version != version:
+                continue  # cancelado o reemplazado
+            due.append((reminder, when))
+            # Desde now y no desde when: tras una caída larga cada recordatorio
+            # se dispara una sola vez en la recuperación, no una por día perdido
+            heapq.heappush(self._heap, (reminder.next_after(max(when, now)), key, version))
+        return due
+
+    def _fire(self, reminder: Reminder, when: float):
+        try:
+            self.notifier(reminder, when)
+        except Exception as e:
+            logger.error(f"Error notificando recordatorio {reminder.id}: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    break
+                now = time.time()
+                if not self._heap or self._heap[0][0] > now:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    if timeout is None or timeout > self.checkpoint_interval:
+                        timeout = self.checkpoint_interval
+                    self._condition.wait(timeout)
+                    now = time.time()
+                due = self._pop_due(now)
+                self._fired_until = now
+
+            for reminder, when in due:
+                self._executor.submit(self._fire, reminder, when)
+            self.fired += len(due)
+
+            if due or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                self._write_checkpoint()
+
+    def start(self):
+        """Cargar y arrancar el hilo del planificador"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.load()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detener el hilo y guardar el último checkpoint"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+        self._write_checkpoint()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "active": len(self._reminders),
+                "heap_size": len(self._heap),
+                "next_due": self._heap[0][0] if self._heap else None,
+                "fired": self.fired
+            }
+
+# Instancia global (una por proceso del servidor de acciones)
+_scheduler: Optional[ReminderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_reminder_scheduler() -> ReminderScheduler:
+    """Obtener el planificador de recordatorios"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ReminderScheduler()
+    return _scheduler
+
+def start_reminder_scheduler() -> Optional[ReminderScheduler]:
+    """Arrancar el planificador si REMINDER_SCHEDULER está activo"""
+    if not REMINDER_SCHEDULER:
+        return None
+    scheduler = get_reminder_scheduler()
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,39 @@
+"""
+Trazas en el servidor de acciones
+
+Cada acción continúa la traza que el cliente envió en la metadata del
+mensaje (metadata["traceparent"]) y las llamadas al backend la propagan.
+"""
+import sys
+import inspect
+import functools
+from pathlib import Path
+
+# Raíz del proyecto en sys.path para los módulos compartidos (common/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from common.tracing import init_tracing, inject, span, traceparent_from_metadata
+
+init_tracing("rasa-actions")
+
+def traced_action(run):
+    """Decorador para Action.run (síncrono o asíncrono): un span por acción"""
+
+    def _open_span(action, tracker):
+        traceparent = traceparent_from_metadata((tracker.latest_message or {}).get("metadata"))
+        return span(action.name(), {"rasa.sender_id": tracker.sender_id}, traceparent=traceparent, root=True)
+
+    if inspect.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def async_wrapper(self, dispatcher, tracker, domain):
+            with _open_span(self, tracker):
+                return await run(self, dispatcher, tracker, domain)
+        return async_wrapper
+
+    @functools.wraps(run)
+    def wrapper(self, dispatcher, tracker, domain):
+        with _open_span(self, tracker):
+            return run(self, dispatcher, tracker, domain)
+    return wrapper
+
+__all__ = ["inject", "span", "traced_action"]
@@ -0,0 +1,216 @@
+"""
+Preprocesado de audio en memoria antes de Whisper
+
+Una sola pasada por petición sobre el array decodificado:
+
+    decodificar (soundfile; ffmpeg por tubería si libsndfile no admite el formato)
+    -> mezcla a mono -> quitar DC -> remuestreo polifásico a 16 kHz
+    -> normalización de sonoridad
+
+El resultado alimenta a la vez las métricas de calidad y al modelo:
+whisper.transcribe acepta el array float32 a 16 kHz y se salta su propio
+ffmpeg, también a través del servidor de inferencia (memoria compartida).
+
+Las métricas se calculan antes de aplicar la ganancia, así que rms y
+max_amplitude describen la grabación original (el SNR no depende de la ganancia).
+"""
+import io
+import os
+import math
+import time
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE
+
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "1") == "1"  # 0 = archivo temporal + ffmpeg de whisper
+STT_TARGET_DBFS = float(os.getenv("STT_TARGET_DBFS", "-20"))
+STT_MAX_GAIN_DB = float(os.getenv("STT_MAX_GAIN_DB", "30"))  # no convertir silencio en ruido
+STT_PEAK_DBFS = float(os.getenv("STT_PEAK_DBFS", "-1"))
+
+# Sonoridad por bloques con compuertas al estilo BS.1770 (sin ponderación K)
+LOUDNESS_BLOCK_SECONDS = 0.4
+LOUDNESS_HOP_SECONDS = 0.1
+ABSOLUTE_GATE_DBFS = -70.0
+RELATIVE_GATE_DB = -10.0
+
+@dataclass
+class PreprocessedAudio:
+    """Audio listo para Whisper y métricas calculadas sobre el mismo array"""
+    audio: np.ndarray  # float32 mono a TARGET_SAMPLE_RATE
+    quality: Dict[str, Any]
+    timings: Dict[str, float]
+
+# ========== DECODIFICACIÓN ==========
+def decode_with_ffmpeg(audio_bytes: bytes, sample_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Decodificar cualquier formato con ffmpeg por tubería (mono, float32)"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"
+    ]
+    try:
+        out = subprocess.run(cmd, input=audio_bytes, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg no está instalado")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg no pudo decodificar el audio: {e.stderr.decode(errors='ignore')[-200:]}")
+    return np.frombuffer(out, dtype=np.float32)
+
+def decode_audio(audio_bytes: bytes) -> Tuple[np.ndarray, int, str]:
+    """
+    Decodificar a un array (muestras, canales) float32
+
+    Returns:
+        (audio, sample_rate, decodificador usado)
+    """
+    try:
+        import soundfile as sf
+    except ImportError:
+        sf = None
+
+    if sf is not None:
+        try:
+            audio, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=True)
+            return audio, sample_rate, "soundfile"
+        except RuntimeError:
+            pass  # webm/m4a y otros formatos que libsndfile no lee
+
+    return decode_with_ffmpeg(audio_bytes)[:, None], TARGET_SAMPLE_RATE, "ffmpeg"
+
+# ========== ETAPAS ==========
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """Promedio de canales (producto matriz-vector: ~30x más rápido que mean(axis=1))"""
+    if audio.ndim == 1:
+        return audio
+    if audio.shape[1] == 1:
+        return audio[:, 0]
+    channels = audio.shape[1]
+    return audio @ np.full(channels, 1 / channels, dtype=np.float32)
+
+def remove_dc(audio: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Restar la media; antes de remuestrear para no generar transitorios en los bordes"""
+    if not audio.size:
+        return audio, 0.0
+    offset = float(np.mean(audio, dtype=np.float64))
+    return audio - np.float32(offset), offset
+
+def resample(audio: np.ndarray, sample_rate: int, target: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Remuestreo polifásico (up/down por el MCD: 44100 -> 16000 es 160/441)"""
+    if sample_rate == target or not audio.size:
+        return audio
+    from scipy.signal import resample_poly
+
+    factor = math.gcd(sample_rate, target)
+    return resample_poly(audio, target // factor, sample_rate // factor).astype(np.float32, copy=False)
+
+def loudness_dbfs(audio: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> Optional[float]:
+    """
+    Sonoridad en dBFS: RMS de los bloques de 400 ms que superan las compuertas
+
+    Returns:
+        None si todo el audio queda bajo la compuerta absoluta (silencio)
+    """
+    if not audio.size:
+        return None
+    power = np.square(audio, dtype=np.float64)
+    block = int(LOUDNESS_BLOCK_SECONDS * sample_rate)
+
+    if len(power) <= block:
+        block_power = np.array([power.mean()])
+    else:
+        hop = int(LOUDNESS_HOP_SECONDS * sample_rate)
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        starts = np.arange(0, len(power) - block + 1, hop)
+        block_power = (cumulative[starts + block] - cumulative[starts]) / block
+
+    block_db = 10 * np.log10(block_power + 1e-20)
+    gated = block_power[block_db > ABSOLUTE_GATE_DBFS]
+    if not gated.size:
+        return None
+
+    relative_gate = 10 * np.log10(gated.mean()) + RELATIVE_GATE_DB
+    gated = gated[10 * np.log10(gated) > relative_gate]
+    return float(10 * np.log10(gated.mean()))
+
+def loudness_gain_db(audio: np.ndarray, loudness: Optional[float]) -> float:
+    """Ganancia hacia STT_TARGET_DBFS, limitada por STT_MAX_GAIN_DB y el pico"""
+    if loudness is None:
+        return 0.0
+    gain_db = min(STT_TARGET_DBFS - loudness, STT_MAX_GAIN_DB)
+
+    peak = float(np.max(np.abs(audio)))
+    if peak > 0:
+        gain_db = min(gain_db, STT_PEAK_DBFS - 20 * math.log10(peak))
+    return gain_db
+
+def audio_quality_metrics(audio: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """Duración, amplitud, RMS y SNR aproximado (percentil 10 como piso de ruido)"""
+    if not audio.size:
+        return {"duration": 0.0, "sample_rate": sample_rate, "has_audio": False, "samples": 0}
+
+    duration = len(audio) / sample_rate
+    magnitude = np.abs(audio)
+    max_amplitude = float(magnitude.max())
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+    noise_floor = float(np.percentile(magnitude, 10))
+    snr = 20 * np.log10(rms / (noise_floor + 1e-10)) if noise_floor > 0 else 0
+
+    return {
+        "duration": float(duration),
+        "sample_rate": sample_rate,
+        "max_amplitude": max_amplitude,
+        "rms": rms,
+        "snr": float(snr),
+        "has_audio": duration > 0.1 and max_amplitude > 0.01,
+        "samples": len(audio)
+    }
+
+# ========== PIPELINE ==========
+def preprocess_array(audio: np.ndarray, sample_rate: int) -> PreprocessedAudio:
+    """Pipeline sobre un array ya decodificado (muestras[, canales])"""
+    timings = {}
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+
+    start = time.perf_counter()
+    mono, dc_offset = remove_dc(to_mono(np.asarray(audio, dtype=np.float32)))
+    timings["downmix_dc"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mono = resample(mono, sample_rate)
+    timings["resample"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    quality = audio_quality_metrics(mono, TARGET_SAMPLE_RATE)
+    loudness = loudness_dbfs(mono)
+    gain_db = loudness_gain_db(mono, loudness)
+    if gain_db:
+        mono = mono * np.float32(10 ** (gain_db / 20))
+    timings["loudness"] = time.perf_counter() - start
+
+    quality.update({
+        # Formato de entrada; samples y duration son del audio a 16 kHz
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "dc_offset": dc_offset,
+        "loudness_dbfs": loudness,
+        "gain_db": gain_db
+    })
+    return PreprocessedAudio(
+        audio=np.ascontiguousarray(mono, dtype=np.float32),
+        quality=quality,
+        timings=timings
+    )
+
+def preprocess_audio(audio_bytes: bytes) -> PreprocessedAudio:
+    """Decodificar y preprocesar el audio de una petición"""
+    start = time.perf_counter()
+    audio, sample_rate, decoder = decode_audio(audio_bytes)
+    decode_time = time.perf_counter() - start
+
+    processed = preprocess_array(audio, sample_rate)
+    processed.timings = {"decode": decode_time, **processed.timings}
+    processed.quality["decoder"] = decoder
+    return processed
@@ -0,0 +1,284 @@
+"""
+Servidor de inferencia Whisper compartido por varios workers HTTP
+
+Un único proceso carga los modelos; los workers de whisper_service envían
+trabajos por IPC (multiprocessing.managers sobre TCP local) y el audio ya
+decodificado (float32, 16 kHz) viaja por memoria compartida, sin pickle.
+La memoria de modelos queda constante sin importar cuántos workers haya.
+
+    export STT_INFERENCE_AUTHKEY=$(openssl rand -hex 32)
+    python -m stt.inference_server --address 127.0.0.1:50055 --models base,small
+    STT_INFERENCE_SERVER=127.0.0.1:50055 python stt/whisper_service.py
+
+BaseManager intercambia objetos con pickle: quien conozca la clave puede
+ejecutar código en el servidor. Servidor y workers se niegan a arrancar sin
+STT_INFERENCE_AUTHKEY, y la dirección debe quedarse en loopback o en una
+red privada.
+
+Dentro del servidor los trabajos entran a una cola consumida por
+STT_INFERENCE_THREADS hilos (1 por defecto: el modelo no se comparte entre
+inferencias simultáneas).
+"""
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing.managers import BaseManager
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from common.model_cache import get_model_cache
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SERVER_ADDRESS = os.getenv("STT_INFERENCE_SERVER")  # host:port; sin definir = modelos en proceso
+INFERENCE_AUTHKEY = os.getenv("STT_INFERENCE_AUTHKEY", "").encode()  # obligatoria, sin valor por defecto
+INFERENCE_THREADS = int(os.getenv("STT_INFERENCE_THREADS", "1"))
+INFERENCE_MAX_MODELS = int(os.getenv("STT_INFERENCE_MAX_MODELS", "2"))
+INFERENCE_TIMEOUT = float(os.getenv("STT_INFERENCE_TIMEOUT", "300"))
+
+# Campos de cada segmento que usa whisper_service (confianza, texto)
+SEGMENT_FIELDS = ("start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio")
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+class InferenceManager(BaseManager):
+    """Manager que expone el motor de inferencia (registro en serve() y en el cliente)"""
+
+# ========== SERVIDOR ==========
+class _Job:
+    __slots__ = ("model", "shm_name", "n_samples", "config", "done", "result", "error", "enqueued")
+
+    def __init__(self, model: str, shm_name: str, n_samples: int, config: Dict[str, Any]):
+        self.model = model
+        self.shm_name = shm_name
+        self.n_samples = n_samples
+        self.config = config
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.enqueued = time.perf_counter()
+
+class InferenceEngine:
+    """Dueño único de los modelos Whisper; atiende trabajos desde una cola"""
+
+    def __init__(self,
+                 device: Optional[str] = None,
+                 max_models: int = INFERENCE_MAX_MODELS,
+                 threads: int = INFERENCE_THREADS):
+        import torch
+
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.max_models = max_models
+        self.model_dir = Path(__file__).parent / "models"
+        self.model_dir.mkdir(exist_ok=True)
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._models_lock = threading.Lock()
+        self._jobs: "queue.Queue[_Job]" = queue.Queue()
+        self._stats = {"jobs": 0, "errors": 0, "queue_wait": 0.0, "inference": 0.0}
+        self._stats_lock = threading.Lock()
+
+        for i in range(threads):
+            threading.Thread(target=self._run, name=f"inference-{i}", daemon=True).start()
+
+    def load_model(self, model_size: str) -> str:
+        """Cargar un modelo por adelantado (expuesto a los clientes)"""
+        self._get_model(model_size)
+        return model_size
+
+    def _get_model(self, model_size: str):
+        """Modelo cargado (o recién cargado); expulsa el menos usado si hace falta"""
+        with self._models_lock:
+            model = self._models.get(model_size)
+            if model is not None:
+                self._models.move_to_end(model_size)
+                return model
+
+            import whisper
+
+            while len(self._models) >= self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                logger.info(f"Liberado modelo {evicted} de la memoria")
+
+            cached = get_model_cache().resolve("whisper", model_size)
+            logger.info(f"Cargando modelo {model_size} en {self.device}...")
+            model = self._models[model_size] = whisper.load_model(
+                str(cached["model"]) if cached else model_size,
+                device=self.device, download_root=self.model_dir
+            )
+            logger.info(f"✓ Modelo {model_size} cargado")
+            return model
+
+    def transcribe(self, model_size: str, shm_name: str, n_samples: int,
+                   config: Dict[str, Any]) -> Dict[str, Any]:
+        """Encolar un trabajo y esperar su resultado (se llama desde el hilo de cada conexión)"""
+        job = _Job(model_size, shm_name, n_samples, config)
+        self._jobs.put(job)
+        if not job.done.wait(INFERENCE_TIMEOUT):
+            raise TimeoutError(f"Inferencia sin respuesta tras {INFERENCE_TIMEOUT}s")
+        if job.error is not None:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        jobs = stats["jobs"] or 1
+        return {
+            "device": self.device,
+            "models_loaded": list(self._models.keys()),
+            "queue_depth": self._jobs.qsize(),
+            "jobs": stats["jobs"],
+            "errors": stats["errors"],
+            "avg_queue_wait": stats["queue_wait"] / jobs,
+            "avg_inference": stats["inference"] / jobs
+        }
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            started = time.perf_counter()
+            try:
+                model = self._get_model(job.model)
+                config = dict(job.config, fp16=self.device == "cuda")
+
+                shm = SharedMemory(name=job.shm_name)
+                # El cliente crea y libera el bloque; aquí solo se adjunta
+                resource_tracker.unregister(shm._name, "shared_memory")
+                try:
+                    audio = np.ndarray((job.n_samples,), dtype=np.float32, buffer=shm.buf)
+                    result = model.transcribe(audio, **config)
+                    del audio
+                finally:
+                    shm.close()
+
+                job.result = {
+                    "text": result.get("text", ""),
+                    "language": result.get("language"),
+                    "segments": [
+                        {field: segment.get(field) for field in SEGMENT_FIELDS}
+                        for segment in result.get("segments", [])
+                    ]
+                }
+            except Exception as e:
+                logger.error(f"Error en inferencia ({job.model}): {e}")
+                job.error = str(e)
+            finally:
+                finished = time.perf_counter()
+                with self._stats_lock:
+                    self._stats["jobs"] += 1
+                    self._stats["errors"] += job.error is not None
+                    self._stats["queue_wait"] += started - job.enqueued
+                    self._stats["inference"] += finished - started
+                job.done.set()
+
+def require_authkey() -> bytes:
+    """Clave compartida de STT_INFERENCE_AUTHKEY; sin ella no se abre ni se acepta la conexión"""
+    if not INFERENCE_AUTHKEY:
+        raise RuntimeError(
+            "STT_INFERENCE_AUTHKEY no está definida: el servidor de inferencia acepta objetos "
+            "pickle y necesita una clave secreta compartida con los workers"
+        )
+    return INFERENCE_AUTHKEY
+
+def serve(address: str, models: Tuple[str, ...] = ("base",), threads: int = INFERENCE_THREADS):
+    """Cargar los modelos y atender a los workers (bloqueante)"""
+    authkey = require_authkey()
+    engine = InferenceEngine(threads=threads)
+    for model_size in models:
+        engine.load_model(model_size)
+
+    InferenceManager.register("engine", callable=lambda: engine)
+    manager = InferenceManager(address=parse_address(address), authkey=authkey)
+    server = manager.get_server()
+    logger.info(f"🧠 Servidor de inferencia escuchando en {address} (modelos: {', '.join(models)})")
+    server.serve_forever()
+
+# ========== CLIENTE ==========
+class RemoteWhisperModel:
+    """Sustituto de whisper.Whisper: misma firma de transcribe, inferencia en el servidor"""
+
+    def __init__(self, client: "InferenceClient", model_size: str):
+        self.client = client
+        self.model_size = model_size
+
+    def transcribe(self, audio, **config) -> Dict[str, Any]:
+        if isinstance(audio, str):
+            import whisper
+            # Decodificar (ffmpeg) en el worker; al servidor solo llegan muestras
+            audio = whisper.load_audio(audio)
+        return self.client.transcribe(self.model_size, audio, config)
+
+class InferenceClient:
+    """Conexión de un worker HTTP al servidor de inferencia"""
+
+    def __init__(self, address: str = INFERENCE_SERVER_ADDRESS):
+        authkey = require_authkey()
+        InferenceManager.register("engine")
+        self.address = address
+        self._manager = InferenceManager(address=parse_address(address), authkey=authkey)
+        self._manager.connect()
+        # Los proxies abren una conexión por hilo, así que sirven desde asyncio.to_thread
+        self._engine = self._manager.engine()
+        logger.info(f"✓ Conectado al servidor de inferencia {address}")
+
+    def model(self, model_size: str) -> RemoteWhisperModel:
+        self._engine.load_model(model_size)
+        return RemoteWhisperModel(self, model_size)
+
+    def transcribe(self, model_size: str, audio: np.ndarray, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Copiar el audio a memoria compartida y esperar el resultado"""
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        shm = SharedMemory(create=True, size=max(1, audio.nbytes))
+        try:
+            np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+            return self._engine.transcribe(model_size, shm.name, len(audio), config)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._engine.stats()
+
+# Instancia global
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+def get_inference_client() -> InferenceClient:
+    """Cliente del servidor de inferencia (STT_INFERENCE_SERVER)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient()
+    return _client
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de inferencia Whisper compartido")
+    parser.add_argument(
+        "--address", default=INFERENCE_SERVER_ADDRESS or "127.0.0.1:50055",
+        help="host:puerto de escucha; solo loopback o red privada (el protocolo usa pickle)"
+    )
+    parser.add_argument("--models", default="base", help="Modelos a precargar")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS, help="Hilos de inferencia")
+    args = parser.parse_args()
+    if not INFERENCE_AUTHKEY:
+        parser.error("define STT_INFERENCE_AUTHKEY con una clave secreta compartida con los workers")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    serve(args.address, tuple(args.models.split(",")), args.threads)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 """
 Servicio Whisper STT optimizado - Servidor FastAPI con funcionalidades avanzadas
+
+torch, whisper y soundfile se importan al usarse: el módulo carga rápido y
+el modelo se carga en segundo plano desde el lifespan. Mientras tanto
+/health responde "warming" y /ready 503.
 """
+import time
+_IMPORT_START = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import whisper
-import torch
+from fastapi.responses import JSONResponse, Response
 import numpy as np
-import soundfile as sf
 import base64
 import tempfile
 import os
@@ -20,9 +24,22 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 from contextlib import asynccontextmanager
 import asyncio
-import aiofiles
 from dataclasses import dataclass, asdict
 import uuid
+import sys
+
+# Raíz del proyecto en sys.path para los módulos compartidos (common/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common.metrics import (
+    CONTENT_TYPE, HTTP_REQUEST_SECONDS, monitor_event_loop_lag, record_cache, render_metrics, route_template,
+    start_multiprocess_writer, time_stage
+)
+from common.tracing import TraceMiddleware, current_request_id
+from common.profiling import RequestProfilerMiddleware, create_profiling_router
+from common.model_cache import get_model_cache
+from stt.audio_preprocessing import STT_PREPROCESS, audio_quality_metrics, preprocess_audio, to_mono
+from stt.inference_server import INFERENCE_SERVER_ADDRESS, get_inference_client
 
 # Configurar logging
 logging.basicConfig(
@@ -65,6 +82,16 @@ class WhisperSTTService:
                  device: Optional[str] = None):
         if self._initialized:
             return
+        
+        timings = {}
+        phase_start = time.perf_counter()
+        import torch
+        timings["import_torch"] = time.perf_counter() - phase_start
+        
+        # Importación deliberada: medir su coste aquí en vez de en la primera carga de modelo
+        phase_start = time.perf_counter()
+        import whisper  # noqa: F401
+        timings["import_whisper"] = time.perf_counter() - phase_start
             
         self.default_model = default_model
         self.max_models = max_models_in_memory
@@ -76,11 +103,21 @@ class WhisperSTTService:
         logger.info(f"Modelo por defecto: {default_model}")
         
         # Cargar modelo por defecto
+        phase_start = time.perf_counter()
         self.current_model = self.load_model(default_model)
+        timings["load_model"] = time.perf_counter() - phase_start
+        
+        self.startup_timings = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+        logger.info(f"Tiempos de arranque Whisper: {self.startup_timings}")
         self._initialized = True
         
-    def load_model(self, model_size: str = "base") -> whisper.Whisper:
+    def load_model(self, model_size: str = "base"):
         """Cargar modelo Whisper con caché"""
+        if INFERENCE_SERVER_ADDRESS:
+            # Modo sidecar: el servidor de inferencia es el único dueño de los modelos
+            return get_inference_client().model(model_size)
+        
+        record_cache("whisper_model", model_size in self._models_pool)
         if model_size in self._models_pool:
             logger.info(f"Modelo {model_size} ya cargado en memoria")
             return self._models_pool[model_size]
@@ -92,9 +129,13 @@ class WhisperSTTService:
             logger.info(f"Liberado modelo {oldest_model} de la memoria")
         
         try:
+            import whisper
+            
+            # Caché de prefetch_models.py; sin ella whisper descarga a stt/models
+            cached = get_model_cache().resolve("whisper", model_size)
             logger.info(f"Cargando modelo {model_size}...")
             model = whisper.load_model(
-                model_size,
+                str(cached["model"]) if cached else model_size,
                 device=self.device,
                 download_root=self.model_dir
             )
@@ -113,7 +154,7 @@ class WhisperSTTService:
         return {
             "task": task,
             "language": language if language != "auto" else None,
-            "fp16": torch.cuda.is_available(),
+            "fp16": self.device == "cuda",
             "verbose": False,
             "temperature": 0.0,
             "best_of": 1,
@@ -133,36 +174,52 @@ class WhisperSTTService:
                                language: str = "es",
                                request_id: Optional[str] = None) -> TranscriptionResult:
         """Transcribir audio en formato base64 (versión asíncrona)"""
-        request_id = request_id or str(uuid.uuid4())[:8]
+        request_id = request_id or current_request_id() or str(uuid.uuid4())[:8]
         start_time = datetime.now()
         
         try:
             # Decodificar base64
             logger.info(f"[{request_id}] Decodificando audio base64...")
-            audio_bytes = base64.b64decode(audio_base64)
-            
-            # Crear archivo temporal
             temp_path = None
             try:
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                    tmp.write(audio_bytes)
-                    temp_path = tmp.name
+                with time_stage("decode"):
+                    audio_bytes = base64.b64decode(audio_base64)
+                
+                # Preprocesar en memoria: el mismo array va a las métricas y al modelo
+                processed = None
+                if STT_PREPROCESS:
+                    try:
+                        with time_stage("preprocess"):
+                            processed = await asyncio.to_thread(preprocess_audio, audio_bytes)
+                    except Exception as e:
+                        logger.warning(f"[{request_id}] Preprocesado fallido, se usa ffmpeg de Whisper: {e}")
+                
+                if processed is None:
+                    # Archivo temporal para que Whisper lo decodifique con ffmpeg
+                    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+                        tmp.write(audio_bytes)
+                        temp_path = tmp.name
                 
                 # Transcribir
                 logger.info(f"[{request_id}] Transcribiendo audio...")
                 config = self.get_transcription_config(language)
-                result = await asyncio.to_thread(
-                    self.current_model.transcribe,
-                    temp_path,
-                    **config
-                )
+                with time_stage("whisper_inference"):
+                    result = await asyncio.to_thread(
+                        self.current_model.transcribe,
+                        processed.audio if processed is not None else temp_path,
+                        **config
+                    )
                 
                 # Procesar resultados
                 text = result.get("text", "").strip()
                 language_detected = result.get("language", language)
                 
                 # Analizar calidad de audio
-                audio_quality = await self.analyze_audio_quality(temp_path)
+                if processed is not None:
+                    audio_quality = processed.quality
+                else:
+                    with time_stage("audio_quality"):
+                        audio_quality = await self.analyze_audio_quality(temp_path)
                 
                 # Calcular confianza
                 confidence = self.calculate_confidence(result, audio_quality)
@@ -209,27 +266,14 @@ class WhisperSTTService:
     async def analyze_audio_quality(self, audio_path: str) -> Dict[str, Any]:
         """Analizar calidad del audio de forma asíncrona"""
         try:
-            audio, sample_rate = sf.read(audio_path)
-            
-            # Calcular métricas básicas
-            duration = len(audio) / sample_rate
-            max_amplitude = np.max(np.abs(audio))
-            rms = np.sqrt(np.mean(audio**2))
+            import soundfile as sf
             
-            # Calcular SNR aproximado
-            noise_floor = np.percentile(np.abs(audio), 10)
-            snr = 20 * np.log10(rms / (noise_floor + 1e-10)) if noise_floor > 0 else 0
+            audio, sample_rate = sf.read(audio_path, dtype="float32", always_2d=True)
             
-            return {
-                "duration": float(duration),
-                "sample_rate": sample_rate,
-                "max_amplitude": float(max_amplitude),
-                "rms": float(rms),
-                "snr": float(snr),
-                "channels": 1 if len(audio.shape) == 1 else audio.shape[1],
-                "has_audio": duration > 0.1 and max_amplitude > 0.01,
-                "samples": len(audio)
-            }
+            # Mismas métricas que el preprocesado en memoria
+            quality = audio_quality_metrics(to_mono(audio), sample_rate)
+            quality["channels"] = audio.shape[1]
+            return quality
             
         except Exception as e:
             logger.warning(f"Error analizando calidad de audio: {e}")
@@ -323,26 +367,51 @@ class WhisperSTTService:
             "status": "running",
             "default_model": self.default_model,
             "device": self.device,
-            "models_loaded": list(self._models_pool.keys()),
+            "models_loaded": (get_inference_client().stats()["models_loaded"]
+                              if INFERENCE_SERVER_ADDRESS else list(self._models_pool.keys())),
+            "inference_server": INFERENCE_SERVER_ADDRESS,
             "max_models_in_memory": self.max_models,
             "supported_languages": ["es", "en", "fr", "de", "it", "pt", "ja", "zh", "auto"],
             "initialized": self._initialized,
             "timestamp": datetime.now().isoformat()
         }
 
+# Estado de arranque: warming -> ready | failed
+_startup_state = {"status": "warming", "error": None, "timings": {}}
+
+async def _load_service(app: FastAPI, lifespan_start: float):
+    """Cargar torch, whisper y el modelo sin bloquear el arranque del servidor"""
+    try:
+        app.state.whisper_service = await asyncio.to_thread(WhisperSTTService)
+        _startup_state["timings"].update(app.state.whisper_service.startup_timings)
+        _startup_state["status"] = "ready"
+        logger.info("✓ Whisper Service listo")
+    except Exception as e:
+        logger.error(f"Error cargando Whisper Service: {e}")
+        _startup_state["status"] = "failed"
+        _startup_state["error"] = str(e)
+    finally:
+        _startup_state["timings"]["ready_after"] = round(time.perf_counter() - lifespan_start, 3)
+
 # Lifespan management para FastAPI
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Administrar el ciclo de vida de la aplicación"""
-    # Startup
+    # Startup: el modelo se carga en segundo plano; /health responde desde ya
+    lifespan_start = time.perf_counter()
+    _startup_state["timings"]["import"] = round(lifespan_start - _IMPORT_START, 3)
     logger.info("Iniciando Whisper Service...")
-    app.state.whisper_service = WhisperSTTService()
-    logger.info("✓ Whisper Service listo")
+    app.state.whisper_service = None
+    loader = asyncio.create_task(_load_service(app, lifespan_start))
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    start_multiprocess_writer()  # no-op sin METRICS_MULTIPROC_DIR
     
     yield
     
     # Shutdown
     logger.info("Apagando Whisper Service...")
+    loader.cancel()
+    lag_monitor.cancel()
     # Limpiar recursos si es necesario
 
 # Crear aplicación FastAPI
@@ -362,6 +431,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def get_whisper_service() -> WhisperSTTService:
+    """Servicio cargado o 503 mientras se calienta"""
+    service = app.state.whisper_service
+    if service is None:
+        raise HTTPException(status_code=503, detail=f"Whisper Service no disponible ({_startup_state['status']})")
+    return service
+
 # Endpoints
 @app.get("/")
 async def root():
@@ -375,14 +451,29 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Verificar salud del servicio"""
+    """Verificar salud del servicio (responde también durante el calentamiento)"""
     service = app.state.whisper_service
     return {
-        "status": "healthy",
-        "service_info": service.get_service_info(),
+        "status": "healthy" if service is not None else _startup_state["status"],
+        "service_info": service.get_service_info() if service is not None else None,
+        "startup": _startup_state,
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ready")
+async def readiness():
+    """Readiness para balanceadores: 503 hasta que el modelo esté cargado"""
+    ready = app.state.whisper_service is not None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "startup": _startup_state}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
 @app.post("/api/transcribe")
 async def transcribe_audio(data: dict, background_tasks: BackgroundTasks):
     """
@@ -404,13 +495,13 @@ async def transcribe_audio(data: dict, background_tasks: BackgroundTasks):
         language = data.get("language", "es")
         task = data.get("task", "transcribe")
         
-        # Generar ID de solicitud para tracking
-        request_id = str(uuid.uuid4())[:8]
+        # ID de solicitud para tracking: el trace_id propagado por TraceMiddleware
+        request_id = current_request_id() or str(uuid.uuid4())[:8]
         
         logger.info(f"[{request_id}] Nueva solicitud de transcripción - Idioma: {language}")
         
         # Procesar transcripción
-        service = app.state.whisper_service
+        service = get_whisper_service()
         result = await service.transcribe_base64(audio_b64, language, request_id)
         
         # Convertir a dict para respuesta
@@ -451,7 +542,7 @@ async def transcribe_batch(data: dict):
         logger.info(f"Procesando lote de {len(audios)} audios")
         
         # Procesar en paralelo
-        service = app.state.whisper_service
+        service = get_whisper_service()
         tasks = [
             service.transcribe_base64(
                 audio.get("audio_base64", ""),
@@ -471,6 +562,8 @@ async def transcribe_batch(data: dict):
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en transcripción por lote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -492,7 +585,7 @@ async def switch_model(data: dict):
         if model_size not in ["tiny", "base", "small", "medium", "large"]:
             raise HTTPException(status_code=400, detail="Modelo no válido")
         
-        service = app.state.whisper_service
+        service = get_whisper_service()
         service.current_model = service.load_model(model_size)
         service.default_model = model_size
         
@@ -504,6 +597,8 @@ async def switch_model(data: dict):
             "model_info": service.get_service_info()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error cambiando modelo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -516,7 +611,7 @@ async def analyze_command(data: dict):
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
     
-    service = app.state.whisper_service
+    service = get_whisper_service()
     is_command = service.is_command_like(text)
     
     # Análisis detallado
@@ -544,7 +639,7 @@ async def analyze_command(data: dict):
 # Middleware para logging de requests
 @app.middleware("http")
 async def log_requests(request, call_next):
-    request_id = str(uuid.uuid4())[:8]
+    request_id = current_request_id() or str(uuid.uuid4())[:8]
     start_time = datetime.now()
     
     logger.info(f"[{request_id}] {request.method} {request.url.path}")
@@ -552,13 +647,25 @@ async def log_requests(request, call_next):
     response = await call_next(request)
     
     process_time = (datetime.now() - start_time).total_seconds()
+    HTTP_REQUEST_SECONDS.labels(
+        request.method, route_template(request), str(response.status_code)
+    ).observe(process_time)
     logger.info(f"[{request_id}] Completed in {process_time:.3f}s - Status: {response.status_code}")
     
-    response.headers["X-Request-ID"] = request_id
     response.headers["X-Process-Time"] = str(process_time)
     
     return response
 
+# cProfile de una petición con X-Profile: 1 (solo con PROFILING_TOKEN)
+app.add_middleware(RequestProfilerMiddleware)
+
+# Traza por petición (registrada al final para envolver a log_requests);
+# agrega traceparent y X-Request-ID a la respuesta
+app.add_middleware(TraceMiddleware, service="stt")
+
+# Perfil por muestreo bajo demanda: POST /admin/profile
+app.include_router(create_profiling_router())
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,272 @@
+"""
+Normalización de texto en español para TTS (números, dosis, horas, fechas y ordinales)
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# ========== NÚMEROS ==========
+UNIDADES = [
+    "cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve",
+    "diez", "once", "doce", "trece", "catorce", "quince", "dieciséis", "diecisiete",
+    "dieciocho", "diecinueve", "veinte", "veintiuno", "veintidós", "veintitrés",
+    "veinticuatro", "veinticinco", "veintiséis", "veintisiete", "veintiocho", "veintinueve"
+]
+DECENAS = {
+    3: "treinta", 4: "cuarenta", 5: "cincuenta", 6: "sesenta",
+    7: "setenta", 8: "ochenta", 9: "noventa"
+}
+CENTENAS = {
+    1: "ciento", 2: "doscientos", 3: "trescientos", 4: "cuatrocientos", 5: "quinientos",
+    6: "seiscientos", 7: "setecientos", 8: "ochocientos", 9: "novecientos"
+}
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+]
+ORDINALES = [
+    "", "primero", "segundo", "tercero", "cuarto", "quinto",
+    "sexto", "séptimo", "octavo", "noveno", "décimo"
+]
+
+# Sustantivos femeninos frecuentes tras un número ("una tableta", "veintiuna gotas")
+SUSTANTIVOS_FEMENINOS = {
+    "tableta", "tabletas", "pastilla", "pastillas", "cápsula", "cápsulas", "gota", "gotas",
+    "hora", "horas", "vez", "veces", "semana", "semanas", "dosis", "toma", "tomas",
+    "unidad", "unidades", "inyección", "inyecciones", "cucharada", "cucharadas",
+    "ampolla", "ampollas", "cucharadita", "cucharaditas"
+}
+# Palabras tras las que no se apocopa "uno" ("uno de ellos", "1 y medio")
+PALABRAS_FUNCIONALES = {"de", "del", "y", "o", "a", "al", "en", "por", "para", "con"}
+
+# Unidad -> (singular, plural, femenino)
+UNIDADES_MEDIDA = {
+    "mg": ("miligramo", "miligramos", False),
+    "mcg": ("microgramo", "microgramos", False),
+    "µg": ("microgramo", "microgramos", False),
+    "g": ("gramo", "gramos", False),
+    "gr": ("gramo", "gramos", False),
+    "kg": ("kilogramo", "kilogramos", False),
+    "ml": ("mililitro", "mililitros", False),
+    "cc": ("centímetro cúbico", "centímetros cúbicos", False),
+    "ui": ("unidad", "unidades", True),
+    "h": ("hora", "horas", True),
+    "hr": ("hora", "horas", True),
+    "hrs": ("hora", "horas", True),
+    "min": ("minuto", "minutos", False),
+    "°c": ("grado", "grados", False),
+    "°": ("grado", "grados", False)
+}
+
+SIMBOLOS = {
+    '&': ' y ',
+    '%': ' por ciento',
+    '$': ' dólares',
+    '#': 'número ',
+    '@': ' arroba '
+}
+
+# ========== REGLAS PRECOMPILADAS ==========
+FECHA_DMY_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})\b")
+FECHA_ISO_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+DIA_MES_RE = re.compile(r"\b(\d{1,2})(?=\s+de\s+(?:" + "|".join(MESES) + r")\b)", re.IGNORECASE)
+HORA_RE = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+ORDINAL_RE = re.compile(r"\b(\d{1,2})\.?(º|ª|er|ra|ro|da|do|ta|to|ma|mo|va|vo|na|no)(?!\w)", re.IGNORECASE)
+# Punto como separador de miles ("1.000", "12.500.000"); va antes de la regla decimal.
+# Sin cero inicial, para que "0.125" siga siendo decimal
+MILES = r"[1-9]\d{0,2}(?:\.\d{3})+(?!\d)"
+MILES_RE = re.compile(MILES)
+UNIDAD_RE = re.compile(
+    r"\b((?:" + MILES + r"|\d+)(?:[.,]\d+)?)\s*("
+    + "|".join(sorted(UNIDADES_MEDIDA, key=len, reverse=True)) + r")(?!\w)",
+    re.IGNORECASE
+)
+NUMERO_RE = re.compile(r"\b(" + MILES + r"|\d+)(?:[.,](\d+))?\b")
+SIGUIENTE_PALABRA_RE = re.compile(r"\s*([a-záéíóúüñ]+)", re.IGNORECASE)
+ARTICULO_FEMENINO_RE = re.compile(r"\b(la|las|una)\s*$", re.IGNORECASE)
+ESPACIOS_RE = re.compile(r"\s+")
+
+def _menor_que_mil(n: int) -> str:
+    if n < 30:
+        return UNIDADES[n]
+    if n < 100:
+        decena, unidad = divmod(n, 10)
+        return DECENAS[decena] if unidad == 0 else f"{DECENAS[decena]} y {UNIDADES[unidad]}"
+    if n == 100:
+        return "cien"
+    centena, resto = divmod(n, 100)
+    return CENTENAS[centena] if resto == 0 else f"{CENTENAS[centena]} {_menor_que_mil(resto)}"
+
+def _apocopar(palabras: str) -> str:
+    """'veintiuno' -> 'veintiún', 'treinta y uno' -> 'treinta y un'"""
+    if palabras.endswith("veintiuno"):
+        return palabras[:-len("veintiuno")] + "veintiún"
+    if palabras.endswith("uno"):
+        return palabras[:-1]
+    return palabras
+
+def _cardinal(n: int) -> str:
+    if n < 1000:
+        return _menor_que_mil(n)
+    if n < 1_000_000:
+        miles, resto = divmod(n, 1000)
+        prefijo = "mil" if miles == 1 else f"{_apocopar(_menor_que_mil(miles))} mil"
+        return prefijo if resto == 0 else f"{prefijo} {_menor_que_mil(resto)}"
+    millones, resto = divmod(n, 1_000_000)
+    prefijo = "un millón" if millones == 1 else f"{_apocopar(_cardinal(millones))} millones"
+    return prefijo if resto == 0 else f"{prefijo} {_cardinal(resto)}"
+
+@lru_cache(maxsize=4096)
+def number_to_words(n: int, gender: str = "") -> str:
+    """
+    Convertir un entero a palabras en español
+
+    Args:
+        n: Número entero no negativo
+        gender: "" (forma neutra: "uno"), "m" ("un") o "f" ("una")
+    """
+    palabras = _cardinal(n)
+    if gender == "m":
+        return _apocopar(palabras)
+    if gender == "f":
+        if palabras.endswith("uno"):
+            palabras = palabras[:-1] + "a"
+        if n < 1_000_000:
+            palabras = palabras.replace("ientos", "ientas")
+    return palabras
+
+def _decimal_to_words(entero: str, decimales: str) -> str:
+    """'2,5' -> 'dos coma cinco'; los ceros a la izquierda se leen dígito a dígito"""
+    if decimales.startswith("0"):
+        parte_decimal = " ".join(UNIDADES[int(d)] for d in decimales)
+    else:
+        parte_decimal = number_to_words(int(decimales))
+    return f"{number_to_words(int(entero))} coma {parte_decimal}"
+
+def _partes_numero(numero: str) -> Tuple[str, Optional[str]]:
+    """'1.000,5' -> ('1000', '5'), '2,5' -> ('2', '5'), '500' -> ('500', None)"""
+    miles = MILES_RE.match(numero)
+    if miles:
+        return miles.group(0).replace(".", ""), numero[miles.end() + 1:] or None
+    partes = re.split(r"[.,]", numero, maxsplit=1)
+    return partes[0], partes[1] if len(partes) > 1 else None
+
+# ========== EXPANSIONES ==========
+def _expandir_fecha(dia: int, mes: int, anio: int, original: str) -> str:
+    if not (1 <= mes <= 12 and 1 <= dia <= 31):
+        return original
+    dia_palabras = "primero" if dia == 1 else number_to_words(dia)
+    return f"{dia_palabras} de {MESES[mes - 1]} de {number_to_words(anio)}"
+
+def _fecha_dmy(match: re.Match) -> str:
+    anio = int(match.group(3))
+    if anio < 100:
+        anio += 2000
+    return _expandir_fecha(int(match.group(1)), int(match.group(2)), anio, match.group(0))
+
+def _fecha_iso(match: re.Match) -> str:
+    return _expandir_fecha(int(match.group(3)), int(match.group(2)), int(match.group(1)), match.group(0))
+
+def _dia_mes(match: re.Match) -> str:
+    dia = int(match.group(1))
+    return "primero" if dia == 1 else number_to_words(dia)
+
+def _hora(match: re.Match) -> str:
+    hora = number_to_words(int(match.group(1)), "f")
+    minutos = int(match.group(2))
+    if minutos == 0:
+        return f"{hora} en punto"
+    if minutos == 15:
+        return f"{hora} y cuarto"
+    if minutos == 30:
+        return f"{hora} y media"
+    return f"{hora} y {number_to_words(minutos)}"
+
+def _ordinal(match: re.Match) -> str:
+    n = int(match.group(1))
+    sufijo = match.group(2).lower()
+    if not 1 <= n < len(ORDINALES):
+        return number_to_words(n)
+    palabra = ORDINALES[n]
+    if sufijo in ("ª", "ra", "da", "ta", "ma", "va", "na"):
+        return palabra[:-1] + "a"
+    if sufijo == "er":
+        return palabra[:-1]  # primer, tercer
+    return palabra
+
+def _unidad(match: re.Match) -> str:
+    singular, plural, femenino = UNIDADES_MEDIDA[match.group(2).lower()]
+    numero, decimales = _partes_numero(match.group(1))
+    gender = "f" if femenino else "m"
+
+    if decimales is not None:
+        return f"{_decimal_to_words(numero, decimales)} {plural}"
+
+    valor = int(numero)
+    return f"{number_to_words(valor, gender)} {singular if valor == 1 else plural}"
+
+def _numero(match: re.Match) -> str:
+    entero, decimales = match.group(1).replace(".", ""), match.group(2)
+    if decimales is not None:
+        return _decimal_to_words(entero, decimales)
+
+    # Concordancia con la palabra siguiente o el artículo previo ("a la 1")
+    texto = match.string
+    gender = ""
+    siguiente = SIGUIENTE_PALABRA_RE.match(texto, match.end())
+    if siguiente:
+        palabra = siguiente.group(1).lower()
+        if palabra in SUSTANTIVOS_FEMENINOS:
+            gender = "f"
+        elif palabra not in PALABRAS_FUNCIONALES:
+            gender = "m"
+    if ARTICULO_FEMENINO_RE.search(texto, 0, match.start()):
+        gender = "f"
+
+    return number_to_words(int(entero), gender)
+
+@lru_cache(maxsize=2048)
+def normalize_text(text: str) -> str:
+    """
+    Expandir símbolos, fechas, horas, ordinales, unidades y números a palabras
+
+    Ejemplo:
+        "Tomar 500mg a las 08:00" -> "Tomar quinientos miligramos a las ocho en punto"
+    """
+    if not text:
+        return ""
+
+    for simbolo, reemplazo in SIMBOLOS.items():
+        text = text.replace(simbolo, reemplazo)
+
+    text = FECHA_DMY_RE.sub(_fecha_dmy, text)
+    text = FECHA_ISO_RE.sub(_fecha_iso, text)
+    text = DIA_MES_RE.sub(_dia_mes, text)
+    text = HORA_RE.sub(_hora, text)
+    text = ORDINAL_RE.sub(_ordinal, text)
+    text = UNIDAD_RE.sub(_unidad, text)
+    text = NUMERO_RE.sub(_numero, text)
+
+    return ESPACIOS_RE.sub(" ", text).strip()
+
+if __name__ == "__main__":
+    # Casos de ejemplo: (entrada, salida esperada)
+    casos = [
+        ("Tomar 500mg a las 08:00", "Tomar quinientos miligramos a las ocho en punto"),
+        ("1 tableta cada 8 horas", "una tableta cada ocho horas"),
+        ("2,5 ml", "dos coma cinco mililitros"),
+        ("0.125 mg", "cero coma ciento veinticinco miligramos"),
+        ("1.000 mg", "mil miligramos"),
+        ("2.500 UI", "dos mil quinientas unidades"),
+        ("1.000,5 mg", "mil coma cinco miligramos"),
+        ("12.500.000 personas", "doce millones quinientos mil personas"),
+        ("1.500 pacientes", "mil quinientos pacientes"),
+        ("el 15/03/2024", "el quince de marzo de dos mil veinticuatro")
+    ]
+    fallos = 0
+    for entrada, esperado in casos:
+        salida = normalize_text(entrada)
+        ok = salida == esperado
+        fallos += not ok
+        print(f"{'✓' if ok else '✗'} {entrada!r} -> {salida!r}" + ("" if ok else f" (esperado {esperado!r})"))
+    print(f"\n{len(casos) - fallos}/{len(casos)} casos correctos")
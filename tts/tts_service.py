@@ -3,14 +3,77 @@ Servicio TTS con Coqui y fallback a pyttsx3
 """
 import os
 import sys
+import json
+import time
+import hashlib
 from pathlib import Path
 import logging
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Dict
 import tempfile
 import threading
+from contextlib import nullcontext
+
+try:
+    from tts.text_normalizer import normalize_text
+except ImportError:  # Ejecutado como script desde tts/
+    from text_normalizer import normalize_text
+
+try:
+    from common.metrics import record_cache, time_stage
+except ImportError:  # Ejecutado como script desde tts/
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from common.metrics import record_cache, time_stage
+
+from common.model_cache import get_model_cache
 
 logger = logging.getLogger(__name__)
 
+# Configuración del modelo Coqui
+# TTS_MODEL_PATH/TTS_CONFIG_PATH fijan un checkpoint local y evitan consultar el catálogo
+# (sin TTS_CONFIG_PATH se usa el config.json junto al checkpoint, como lo descarga Coqui)
+TTS_MODEL_NAME = os.getenv("TTS_MODEL_NAME")
+TTS_MODEL_PATH = os.getenv("TTS_MODEL_PATH")
+TTS_CONFIG_PATH = os.getenv("TTS_CONFIG_PATH")
+TTS_MANIFEST_TTL = int(os.getenv("TTS_MANIFEST_TTL", str(7 * 24 * 3600)))
+TTS_MANIFEST_CACHE = Path(__file__).parent / "models" / "manifest_cache.json"
+
+# Modelos en español por orden de preferencia
+SPANISH_MODELS = [
+    "tts_models/es/css10/vits",
+    "tts_models/es/mai/tacotron2-DDC",
+    "tts_models/es/mai/fast_pitch"
+]
+FALLBACK_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
+
+# Ajustes de inferencia torch (0 = valor por defecto de torch)
+# Coqui comparte núcleos con Whisper en el mismo contenedor
+TTS_TORCH_THREADS = int(os.getenv("TTS_TORCH_THREADS", "0"))
+TTS_TORCH_INTEROP_THREADS = int(os.getenv("TTS_TORCH_INTEROP_THREADS", "0"))
+TTS_INFERENCE_MODE = os.getenv("TTS_INFERENCE_MODE", "1") == "1"
+TTS_VOCODER_OPTIMIZATION = os.getenv("TTS_VOCODER_OPTIMIZATION", "none")  # none | trace | compile
+
+# Formato de salida: wav (sin comprimir), ogg (Opus) o mp3
+TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "wav")
+TTS_AUDIO_BITRATE = os.getenv("TTS_AUDIO_BITRATE", "24k")
+TTS_CACHE_DIR = Path(__file__).parent.parent / "audio" / "cache"
+# Tamaño máximo de la caché de frases; se expulsa lo usado hace más tiempo (mtime). 0 = sin límite
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+# Parámetros de exportación para pydub/ffmpeg
+AUDIO_FORMATS = {
+    "wav": {"extension": "wav"},
+    "ogg": {"extension": "ogg", "format": "ogg", "codec": "libopus", "parameters": ["-application", "voip"]},
+    "opus": {"extension": "ogg", "format": "ogg", "codec": "libopus", "parameters": ["-application", "voip"]},
+    "mp3": {"extension": "mp3", "format": "mp3", "codec": "libmp3lame", "parameters": []}
+}
+
+# Frases representativas para calentar el motor antes de recibir tráfico
+WARMUP_PHRASES = [
+    "Hola, soy tu asistente de medicamentos.",
+    "Es hora de tomar paracetamol de quinientos miligramos.",
+    "Tu recordatorio quedó programado cada ocho horas por siete días."
+]
+
 # Intentar importar Coqui TTS
 COQUI_AVAILABLE = False
 PYTTSX3_AVAILABLE = False
@@ -30,30 +93,140 @@ try:
 except ImportError as e:
     logger.warning(f"pyttsx3 no disponible: {e}")
 
+PYDUB_AVAILABLE = False
+
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"pydub no disponible, solo salida WAV: {e}")
+
+def _read_coqui_manifest() -> List[str]:
+    """Leer el catálogo local de Coqui (.models.json) sin instanciar TTS"""
+    with open(TTS.get_models_file_path(), "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+
+    models = []
+    for model_type, languages in catalog.items():
+        for language, datasets in languages.items():
+            for dataset, names in datasets.items():
+                for name in names:
+                    models.append(f"{model_type}/{language}/{dataset}/{name}")
+    return models
+
+def load_model_manifest(refresh: bool = False) -> List[str]:
+    """
+    Obtener la lista de modelos Coqui usando una caché en disco
+
+    Args:
+        refresh: Ignorar la caché y volver a leer el catálogo
+
+    Returns:
+        Lista de nombres de modelos disponibles
+    """
+    if not refresh and TTS_MANIFEST_CACHE.exists():
+        try:
+            cached = json.loads(TTS_MANIFEST_CACHE.read_text(encoding="utf-8"))
+            if time.time() - cached.get("created_at", 0) < TTS_MANIFEST_TTL:
+                return cached["models"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Caché de modelos TTS inválida: {e}")
+
+    models = _read_coqui_manifest()
+
+    try:
+        TTS_MANIFEST_CACHE.parent.mkdir(exist_ok=True, parents=True)
+        TTS_MANIFEST_CACHE.write_text(
+            json.dumps({"created_at": time.time(), "models": models}),
+            encoding="utf-8"
+        )
+    except OSError as e:
+        logger.warning(f"No se pudo guardar la caché de modelos TTS: {e}")
+
+    return models
+
+def select_model_name() -> str:
+    """Modelo Coqui configurado: TTS_MODEL_NAME o el primero en español del catálogo"""
+    if TTS_MODEL_NAME:
+        return TTS_MODEL_NAME
+    
+    available_models = load_model_manifest()
+    logger.info(f"{len(available_models)} modelos TTS en catálogo")
+    
+    for model in SPANISH_MODELS:
+        if model in available_models:
+            return model
+    
+    logger.warning("No se encontró modelo español, usando inglés")
+    return FALLBACK_MODEL
+
+def apply_torch_tuning() -> Dict[str, int]:
+    """
+    Fijar hilos intra/inter-op de torch según la configuración
+
+    set_num_interop_threads solo puede llamarse una vez por proceso,
+    antes de cualquier trabajo paralelo; si ya es tarde se conserva el valor actual.
+    """
+    if TTS_TORCH_THREADS > 0:
+        torch.set_num_threads(TTS_TORCH_THREADS)
+    
+    if TTS_TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(TTS_TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            logger.warning(f"No se pudieron fijar hilos inter-op: {e}")
+    
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads()
+    }
+
+def encode_audio(wav_path: str,
+                 output_path: str,
+                 audio_format: str = "ogg",
+                 bitrate: str = TTS_AUDIO_BITRATE) -> str:
+    """
+    Comprimir un WAV a Opus (OGG) o MP3
+
+    Args:
+        wav_path: WAV de entrada
+        output_path: Ruta del archivo comprimido
+        audio_format: ogg, opus o mp3
+        bitrate: Bitrate de ffmpeg (ej. "24k")
+
+    Returns:
+        Ruta al archivo comprimido
+    """
+    if audio_format not in AUDIO_FORMATS or audio_format == "wav":
+        raise ValueError(f"Formato de audio no soportado para compresión: {audio_format}")
+    if not PYDUB_AVAILABLE:
+        raise RuntimeError("pydub no está disponible para comprimir audio")
+
+    options = AUDIO_FORMATS[audio_format]
+    segment = AudioSegment.from_wav(wav_path)
+    segment.export(
+        output_path,
+        format=options["format"],
+        codec=options["codec"],
+        bitrate=bitrate,
+        parameters=options["parameters"]
+    )
+    return str(output_path)
+
 class BaseTTS:
     """Clase base para servicios TTS"""
     def __init__(self):
         self.output_dir = Path(__file__).parent.parent / "audio"
         self.output_dir.mkdir(exist_ok=True)
     
-    def synthesize(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+    def synthesize(self, text: str, output_path: Optional[str] = None,
+                   normalized: bool = False) -> Optional[str]:
+        """normalized=True si el texto ya pasó por normalize_text (TTSService)"""
         raise NotImplementedError
     
     def _sanitize_text(self, text: str) -> str:
-        """Limpiar texto para TTS"""
-        # Reemplazar caracteres problemáticos
-        replacements = {
-            '&': 'y',
-            '%': 'por ciento',
-            '$': 'dólares',
-            '#': 'número',
-            '@': 'arroba'
-        }
-        
-        for char, replacement in replacements.items():
-            text = text.replace(char, replacement)
-        
-        return text.strip()
+        """Limpiar y normalizar texto para TTS (símbolos, unidades, horas, fechas)"""
+        return normalize_text(text)
 
 class CoquiTTS(BaseTTS):
     """Implementación con Coqui TTS"""
@@ -78,32 +251,43 @@ class CoquiTTS(BaseTTS):
             raise RuntimeError("Coqui TTS no está disponible")
         
         try:
-            # Listar modelos disponibles
-            available_models = TTS().list_models()
-            logger.info(f"Modelos TTS disponibles: {available_models}")
+            timings = {}
+            start = time.perf_counter()
             
-            # Seleccionar modelo en español
-            spanish_models = [
-                "tts_models/es/css10/vits",
-                "tts_models/es/mai/tacotron2-DDC",
-                "tts_models/es/mai/fast_pitch"
-            ]
-            
-            self.model_name = None
-            for model in spanish_models:
-                if model in available_models:
-                    self.model_name = model
-                    break
+            # Resolver modelo (sin recorrer el catálogo si está fijado)
+            phase_start = time.perf_counter()
+            self.model_name, self.model_path = self._resolve_model()
+            self.local_paths = self._local_paths()
+            timings["resolve_model"] = time.perf_counter() - phase_start
             
-            if not self.model_name:
-                logger.warning("No se encontró modelo español, usando inglés")
-                self.model_name = "tts_models/en/ljspeech/tacotron2-DDC"
+            # Ajustes de torch antes de cargar pesos
+            self.tuning = apply_torch_tuning()
+            self.tuning["inference_mode"] = TTS_INFERENCE_MODE
             
             # Inicializar TTS
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Inicializando TTS modelo {self.model_name} en {self.device}")
             
-            self.tts = TTS(self.model_name, gpu=(self.device == "cuda"))
+            phase_start = time.perf_counter()
+            if self.local_paths:
+                self.tts = TTS(
+                    model_path=self.local_paths["model"],
+                    config_path=self.local_paths.get("config"),
+                    vocoder_path=self.local_paths.get("vocoder"),
+                    vocoder_config_path=self.local_paths.get("vocoder_config"),
+                    gpu=(self.device == "cuda")
+                )
+            else:
+                self.tts = TTS(self.model_name, gpu=(self.device == "cuda"))
+            timings["load_weights"] = time.perf_counter() - phase_start
+            
+            phase_start = time.perf_counter()
+            self.tuning["vocoder_optimization"] = self._optimize_vocoder(TTS_VOCODER_OPTIMIZATION)
+            timings["optimize_vocoder"] = time.perf_counter() - phase_start
+            timings["total"] = time.perf_counter() - start
+            
+            self.startup_timings = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+            logger.info(f"Tiempos de arranque TTS: {self.startup_timings}")
             
             logger.info("✓ Coqui TTS inicializado exitosamente")
             self._initialized = True
@@ -112,7 +296,89 @@ class CoquiTTS(BaseTTS):
             logger.error(f"Error inicializando Coqui TTS: {e}")
             raise
     
-    def synthesize(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+    def _resolve_model(self) -> Tuple[str, Optional[str]]:
+        """Determinar el modelo a cargar: ruta local, nombre fijado o catálogo cacheado"""
+        if TTS_MODEL_PATH:
+            if not Path(TTS_MODEL_PATH).exists():
+                raise FileNotFoundError(f"No existe el modelo TTS local: {TTS_MODEL_PATH}")
+            logger.info(f"Usando modelo TTS local: {TTS_MODEL_PATH}")
+            return TTS_MODEL_NAME or Path(TTS_MODEL_PATH).stem, TTS_MODEL_PATH
+        
+        return select_model_name(), None
+    
+    def _local_paths(self) -> Optional[Dict[str, str]]:
+        """Archivos locales del modelo: TTS_MODEL_PATH o la caché de prefetch_models.py"""
+        if self.model_path:
+            config_path = TTS_CONFIG_PATH or str(Path(self.model_path).parent / "config.json")
+            if not Path(config_path).exists():
+                raise FileNotFoundError(
+                    f"No existe la configuración del modelo TTS local: {config_path} "
+                    f"(define TTS_CONFIG_PATH junto con TTS_MODEL_PATH)"
+                )
+            return {"model": self.model_path, "config": config_path}
+        
+        # None = no está en caché y se permite que Coqui lo descargue
+        cached = get_model_cache().resolve("coqui", self.model_name)
+        if cached is None:
+            return None
+        logger.info(f"Usando modelo TTS de la caché: {cached['model']}")
+        return {role: str(path) for role, path in cached.items()}
+    
+    def _find_vocoder(self):
+        """Localizar el vocoder: modelo separado o decodificador de forma de onda (VITS)"""
+        synthesizer = getattr(self.tts, "synthesizer", None)
+        vocoder = getattr(synthesizer, "vocoder_model", None)
+        if vocoder is None:
+            vocoder = getattr(getattr(synthesizer, "tts_model", None), "waveform_decoder", None)
+        return vocoder
+    
+    def _optimize_vocoder(self, mode: str) -> str:
+        """
+        Trazar (TorchScript) o compilar (torch.compile) el forward del vocoder
+        
+        Returns:
+            Modo efectivamente aplicado ("none" si no fue posible)
+        """
+        if mode == "none":
+            return "none"
+        
+        vocoder = self._find_vocoder()
+        if vocoder is None:
+            logger.warning("Modelo TTS sin vocoder optimizable")
+            return "none"
+        
+        try:
+            eager_forward = vocoder.forward
+            
+            if mode == "compile":
+                vocoder.forward = torch.compile(eager_forward, dynamic=True)
+            
+            elif mode == "trace":
+                example = torch.randn(1, vocoder.conv_pre.in_channels, 32, device=self.device)
+                with torch.no_grad():
+                    traced = torch.jit.trace(vocoder, example, check_trace=False)
+                
+                def traced_forward(x, g=None):
+                    # La traza no cubre el condicionamiento por hablante
+                    if g is not None:
+                        return eager_forward(x, g=g)
+                    return traced(x)
+                
+                vocoder.forward = traced_forward
+            
+            else:
+                logger.warning(f"Optimización de vocoder desconocida: {mode}")
+                return "none"
+            
+            logger.info(f"✓ Vocoder optimizado con {mode}")
+            return mode
+            
+        except Exception as e:
+            logger.warning(f"No se pudo optimizar el vocoder ({mode}): {e}")
+            return "none"
+    
+    def synthesize(self, text: str, output_path: Optional[str] = None,
+                   normalized: bool = False) -> Optional[str]:
         """Convertir texto a voz con Coqui"""
         if not self._initialized:
             raise RuntimeError("Coqui TTS no inicializado")
@@ -123,7 +389,8 @@ class CoquiTTS(BaseTTS):
         
         try:
             # Limpiar texto
-            text = self._sanitize_text(text)
+            if not normalized:
+                text = self._sanitize_text(text)
             
             # Definir ruta de salida
             if output_path is None:
@@ -137,12 +404,13 @@ class CoquiTTS(BaseTTS):
             logger.info(f"Generando audio para texto de {len(text)} caracteres")
             
             # Generar audio
-            self.tts.tts_to_file(
-                text=text,
-                file_path=str(output_path),
-                speaker=self.tts.speakers[0] if hasattr(self.tts, 'speakers') and self.tts.speakers else None,
-                language=self.tts.languages[0] if hasattr(self.tts, 'languages') and self.tts.languages else None
-            )
+            with torch.inference_mode() if TTS_INFERENCE_MODE else nullcontext():
+                self.tts.tts_to_file(
+                    text=text,
+                    file_path=str(output_path),
+                    speaker=self.tts.speakers[0] if hasattr(self.tts, 'speakers') and self.tts.speakers else None,
+                    language=self.tts.languages[0] if hasattr(self.tts, 'languages') and self.tts.languages else None
+                )
             
             if output_path.exists():
                 logger.info(f"Audio generado: {output_path}")
@@ -189,13 +457,15 @@ class PyTTSX3TTS(BaseTTS):
             logger.error(f"Error inicializando pyttsx3: {e}")
             raise
     
-    def synthesize(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+    def synthesize(self, text: str, output_path: Optional[str] = None,
+                   normalized: bool = False) -> Optional[str]:
         """Convertir texto a voz con pyttsx3"""
         if not text or len(text.strip()) == 0:
             return None
         
         try:
-            text = self._sanitize_text(text)
+            if not normalized:
+                text = self._sanitize_text(text)
             
             if output_path is None:
                 output_path = self.output_dir / "output_fallback.wav"
@@ -244,21 +514,159 @@ class TTSService:
         
         if self.coqui is None and self.pyttsx3 is None:
             logger.error("Ningún motor TTS disponible")
+        
+        # Bytes en la caché de frases (None = aún sin medir)
+        self._cache_bytes: Optional[int] = None
+        self._cache_lock = threading.Lock()
     
-    def synthesize(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
-        """Convertir texto a voz usando el mejor motor disponible"""
+    def synthesize(self,
+                   text: str,
+                   output_path: Optional[str] = None,
+                   audio_format: Optional[str] = None,
+                   bitrate: Optional[str] = None) -> Optional[str]:
+        """
+        Convertir texto a voz usando el mejor motor disponible
+        
+        Sin output_path el audio se guarda en la caché de frases: el WAV crudo
+        y cada versión comprimida se reutilizan para textos repetidos, con un
+        tope de TTS_CACHE_MAX_MB (LRU por mtime).
+        """
+        # Normalizar una sola vez: clave de caché y texto que reciben los motores
+        text = normalize_text(text) if text else text
         if not text:
             return None
         
-        # Intentar Coqui primero
+        audio_format = (audio_format or TTS_AUDIO_FORMAT).lower()
+        bitrate = bitrate or TTS_AUDIO_BITRATE
+        if audio_format not in AUDIO_FORMATS:
+            logger.error(f"Formato de audio no soportado: {audio_format}")
+            return None
+        
+        if output_path is not None:
+            if audio_format == "wav":
+                return self._synthesize_wav(text, output_path)
+            
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                wav_path = self._synthesize_wav(text, os.path.join(tmp_dir, "raw.wav"))
+                return self._encode(wav_path, output_path, audio_format, bitrate) if wav_path else None
+        
+        # Caché: <clave>.wav y <clave>_<bitrate>.<ext> en el mismo directorio
+        key = self._cache_key(text)
+        TTS_CACHE_DIR.mkdir(exist_ok=True, parents=True)
+        wav_path = TTS_CACHE_DIR / f"{key}.wav"
+        
+        record_cache("tts_phrase", wav_path.exists())
+        if not wav_path.exists():
+            tmp_path = TTS_CACHE_DIR / f"{key}.{threading.get_ident()}.tmp.wav"
+            if not self._synthesize_wav(text, str(tmp_path)):
+                return None
+            os.replace(tmp_path, wav_path)
+            self._cache_added(wav_path)
+        else:
+            logger.info(f"Audio TTS desde caché: {wav_path.name}")
+            self._touch(wav_path)
+        
+        if audio_format == "wav":
+            return str(wav_path)
+        
+        extension = AUDIO_FORMATS[audio_format]["extension"]
+        encoded_path = TTS_CACHE_DIR / f"{key}_{bitrate}.{extension}"
+        if encoded_path.exists():
+            self._touch(encoded_path)
+            return str(encoded_path)
+        
+        tmp_path = TTS_CACHE_DIR / f"{key}_{bitrate}.{threading.get_ident()}.tmp.{extension}"
+        if not self._encode(str(wav_path), str(tmp_path), audio_format, bitrate):
+            logger.warning("Usando WAV sin comprimir como respaldo")
+            return str(wav_path)
+        os.replace(tmp_path, encoded_path)
+        self._cache_added(encoded_path)
+        return str(encoded_path)
+    
+    def _cache_key(self, normalized_text: str) -> str:
+        """Clave de caché por motor/modelo y texto ya normalizado"""
+        engine = self.coqui.model_name if self.coqui else ("pyttsx3" if self.pyttsx3 else "none")
+        return hashlib.sha1(f"{engine}|{normalized_text.lower()}".encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _touch(path: Path):
+        """Marcar uso reciente: la expulsión es por mtime"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # expulsado por otro worker entre medias
+    
+    def _cache_added(self, path: Path):
+        """Contabilizar un archivo nuevo y podar si se supera TTS_CACHE_MAX_MB"""
+        if TTS_CACHE_MAX_MB <= 0:
+            return
+        limit = int(TTS_CACHE_MAX_MB * 1024 * 1024)
+        with self._cache_lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = self._prune_cache(limit)
+                return
+            try:
+                self._cache_bytes += path.stat().st_size
+            except OSError:
+                return
+            # El contador es de este proceso; la poda vuelve a medir el directorio compartido
+            if self._cache_bytes > limit:
+                self._cache_bytes = self._prune_cache(limit)
+    
+    def _prune_cache(self, limit: int) -> int:
+        """Borrar los archivos usados hace más tiempo hasta bajar al 90 % del límite; devuelve el total"""
+        files = []
+        for path in TTS_CACHE_DIR.iterdir():
+            if ".tmp." in path.name:
+                continue  # síntesis en curso
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in files)
+        if total <= limit:
+            return total
+        
+        target = limit * 0.9
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info(f"🧹 Caché TTS podada: {removed} archivos eliminados, {total / 1e6:.1f} MB restantes")
+        return total
+    
+    def _encode(self, wav_path: str, output_path: str, audio_format: str, bitrate: str) -> Optional[str]:
+        """Comprimir audio sin propagar errores de ffmpeg"""
+        try:
+            with time_stage("tts_encode"):
+                return encode_audio(wav_path, output_path, audio_format, bitrate)
+        except Exception as e:
+            logger.error(f"Error comprimiendo audio a {audio_format}: {e}")
+            return None
+    
+    def _synthesize_wav(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+        """Sintetizar WAV con Coqui y fallback a pyttsx3 (texto ya normalizado)"""
+        with time_stage("tts_synthesis"):
+            return self._synthesize_wav_untimed(text, output_path)
+    
+    def _synthesize_wav_untimed(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+        # Intentar Coqui primero (el texto llega ya normalizado)
         if self.coqui:
-            result = self.coqui.synthesize(text, output_path)
+            result = self.coqui.synthesize(text, output_path, normalized=True)
             if result:
                 return result
         
         # Fallback a pyttsx3
         if self.pyttsx3:
-            result = self.pyttsx3.synthesize(text, output_path)
+            result = self.pyttsx3.synthesize(text, output_path, normalized=True)
             if result:
                 logger.info("Usando TTS de respaldo (pyttsx3)")
                 return result
@@ -266,38 +674,118 @@ class TTSService:
         logger.error("No se pudo generar audio")
         return None
     
+    def warmup(self, phrases: Optional[List[str]] = None) -> Dict[str, float]:
+        """
+        Sintetizar frases representativas para inicializar torch y el grafo del modelo
+
+        Returns:
+            Tiempo de síntesis por frase en segundos
+
+        Raises:
+            RuntimeError: Alguna frase no produjo audio
+        """
+        timings = {}
+        failed = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, phrase in enumerate(phrases or WARMUP_PHRASES):
+                start = time.perf_counter()
+                wav_path = os.path.join(tmp_dir, f"warmup_{i}.wav")
+                if self._synthesize_wav(normalize_text(phrase), wav_path) is None:
+                    failed.append(phrase)
+                timings[phrase] = round(time.perf_counter() - start, 3)
+        
+        if failed:
+            raise RuntimeError(f"La síntesis de calentamiento no produjo audio: {failed}")
+        logger.info(f"Calentamiento TTS completado: {timings}")
+        return timings
+    
     def get_status(self) -> dict:
         """Obtener estado del servicio TTS"""
         return {
             "coqui_available": self.coqui is not None,
             "pyttsx3_available": self.pyttsx3 is not None,
-            "engine": "coqui" if self.coqui else ("pyttsx3" if self.pyttsx3 else "none")
+            "engine": "coqui" if self.coqui else ("pyttsx3" if self.pyttsx3 else "none"),
+            "model": self.coqui.model_name if self.coqui else None,
+            "audio_format": TTS_AUDIO_FORMAT,
+            "audio_bitrate": TTS_AUDIO_BITRATE,
+            "compression_available": PYDUB_AVAILABLE,
+            "startup_timings": self.coqui.startup_timings if self.coqui else {},
+            "tuning": self.coqui.tuning if self.coqui else {}
         }
 
 # Instancia global
 _tts_service = None
+_tts_service_lock = threading.Lock()
+
+# Estado de calentamiento: cold -> warming -> ready | failed
+_warmup_state = {"status": "cold", "error": None, "timings": {}, "duration": None}
+_warmup_thread = None
 
 def get_tts_service() -> TTSService:
     """Obtener instancia del servicio TTS"""
     global _tts_service
     if _tts_service is None:
-        _tts_service = TTSService()
+        with _tts_service_lock:
+            if _tts_service is None:
+                _tts_service = TTSService()
     return _tts_service
 
-def text_to_speech(text: str, output_path: Optional[str] = None) -> Optional[str]:
+def _run_warmup():
+    """Construir el motor TTS y sintetizar frases de calentamiento"""
+    start = time.perf_counter()
+    try:
+        service = get_tts_service()
+        if service.coqui is None and service.pyttsx3 is None:
+            raise RuntimeError("Ningún motor TTS disponible")
+        
+        _warmup_state["timings"] = service.warmup()
+        _warmup_state["status"] = "ready"
+    except Exception as e:
+        logger.error(f"Error en calentamiento TTS: {e}")
+        _warmup_state["status"] = "failed"
+        _warmup_state["error"] = str(e)
+    finally:
+        _warmup_state["duration"] = round(time.perf_counter() - start, 3)
+
+def start_tts_warmup() -> threading.Thread:
+    """Iniciar el calentamiento del TTS en segundo plano (idempotente)"""
+    global _warmup_thread
+    with _tts_service_lock:
+        if _warmup_thread is None:
+            _warmup_state["status"] = "warming"
+            _warmup_thread = threading.Thread(
+                target=_run_warmup,
+                name="tts-warmup",
+                daemon=True
+            )
+            _warmup_thread.start()
+    return _warmup_thread
+
+def is_tts_ready() -> bool:
+    """Indicar si el motor TTS está calentado y listo para recibir tráfico"""
+    return _warmup_state["status"] == "ready"
+
+def get_tts_readiness() -> dict:
+    """Obtener estado de calentamiento del TTS"""
+    return dict(_warmup_state)
+
+def text_to_speech(text: str,
+                   output_path: Optional[str] = None,
+                   audio_format: Optional[str] = None) -> Optional[str]:
     """
     Función simplificada para síntesis de voz
     
     Args:
         text: Texto a convertir
         output_path: Ruta opcional para guardar audio
+        audio_format: wav, ogg (Opus) o mp3; por defecto TTS_AUDIO_FORMAT
     
     Returns:
         Ruta al archivo de audio o None si falla
     """
     try:
         service = get_tts_service()
-        return service.synthesize(text, output_path)
+        return service.synthesize(text, output_path, audio_format)
     except Exception as e:
         logger.error(f"Error en text_to_speech: {e}")
         return None